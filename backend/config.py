@@ -1,5 +1,6 @@
 import logging
 import os
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 
@@ -9,8 +10,9 @@ logger = logging.getLogger("moneyrag.config")
 class Settings(BaseSettings):
     SUPABASE_URL: str
     SUPABASE_KEY: str
-    QDRANT_URL: str
-    QDRANT_API_KEY: str
+    # Only needed with VECTOR_DB_STACK=qdrant (checked below)
+    QDRANT_URL: str | None = None
+    QDRANT_API_KEY: str | None = None
     DATABASE_URL: str
     POSTGRESSQL_STACK: str = "supabase"
     DATABRICKS_SERVER_HOSTNAME: str | None = None
@@ -21,6 +23,12 @@ class Settings(BaseSettings):
     ACTIAN_ADDRESS: str | None = None
     ACTIAN_API_KEY: str | None = None
 
+    @model_validator(mode="after")
+    def _check_vector_stack(self):
+        if self.VECTOR_DB_STACK.lower() == "qdrant" and not self.QDRANT_URL:
+            raise ValueError("QDRANT_URL is required when VECTOR_DB_STACK=qdrant")
+        return self
+
     class Config:
         env_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env")
         env_file_encoding = "utf-8"
@@ -0,0 +1,46 @@
+"""
+Per-user data version tokens.
+
+Anything that changes a user's transactions (ingestion, manual entry, file
+deletion) bumps their version, and caches keyed on it stop serving stale
+results. The token lives in a small file per user so the API process, the
+ingestion worker subprocess and stdio MCP servers on the same host agree.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger("moneyrag.data_version")
+
+DATA_VERSION_DIR = os.environ.get(
+    "DATA_VERSION_DIR", os.path.join(tempfile.gettempdir(), "moneyrag-data-versions")
+)
+
+
+def _version_path(user_id: str) -> str:
+    return os.path.join(DATA_VERSION_DIR, hashlib.sha256(user_id.encode()).hexdigest())
+
+
+def get_data_version(user_id: str) -> str:
+    """Current version token for the user ("0" if their data never changed here)."""
+    try:
+        with open(_version_path(user_id)) as f:
+            return f.read().strip() or "0"
+    except FileNotFoundError:
+        return "0"
+
+
+def bump_data_version(user_id: str) -> str:
+    """Mark the user's data as changed. Returns the new token."""
+    os.makedirs(DATA_VERSION_DIR, exist_ok=True)
+    version = f"{time.time_ns()}-{os.getpid()}"
+    path = _version_path(user_id)
+    # Write-then-rename so concurrent readers never see a partial token
+    fd, tmp_path = tempfile.mkstemp(dir=DATA_VERSION_DIR)
+    with os.fdopen(fd, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, path)
+    logger.debug("Bumped data version for user_id=%s to %s", user_id, version)
+    return version
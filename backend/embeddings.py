@@ -0,0 +1,469 @@
+"""
+Shared embedding clients and embedding caches.
+
+Embedding clients are created once per process for each provider / model /
+API key and reused by ingestion and the search tools; the
+EMBEDDING_CLIENT_CACHE_SIZE most recently used are kept.
+
+Vectors are cached content-addressed by (provider, model, kind, sha256(text))
+in a persistent store shared by every user and process on the host: SQLite
+by default, or Redis when EMBEDDING_CACHE_BACKEND=redis. Identical texts
+("Starbucks (Dining) — coffee shop chain") are therefore embedded once, and
+only the cache misses of a batch go to the provider, in a single call. Query
+vectors additionally sit in a small in-memory LRU in front of the store, so
+repeated searches like "subscriptions" or "fast food" never leave the process.
+"""
+import abc
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger("moneyrag.embeddings")
+
+EMBEDDING_CLIENT_CACHE_SIZE = int(os.environ.get("EMBEDDING_CLIENT_CACHE_SIZE", "32"))
+EMBEDDING_QUERY_CACHE_SIZE = int(os.environ.get("EMBEDDING_QUERY_CACHE_SIZE", "1024"))
+# "sqlite" (default), "redis", or "none" to disable the persistent store
+EMBEDDING_CACHE_BACKEND = os.environ.get("EMBEDDING_CACHE_BACKEND", "sqlite").lower()
+EMBEDDING_CACHE_PATH = os.environ.get(
+    "EMBEDDING_CACHE_PATH", os.path.join(tempfile.gettempdir(), "moneyrag-embeddings.sqlite3")
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+EMBEDDING_CACHE_REDIS_URL = os.environ.get("EMBEDDING_CACHE_REDIS_URL", "redis://localhost:6379/0")
+EMBEDDING_CACHE_TTL_S = int(os.environ.get("EMBEDDING_CACHE_TTL_S", str(30 * 24 * 3600)))
+
+_API_KEY_ENV = {"google": "GOOGLE_API_KEY", "openai": "OPENAI_API_KEY"}
+
+
+def normalize_provider(provider: str) -> str:
+    """MoneyRAG treats every provider other than Google as OpenAI."""
+    return "google" if provider.lower() in ("google", "google_genai") else "openai"
+
+
+def _key_fingerprint(api_key: Optional[str]) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16] if api_key else ""
+
+
+# LRU: every user key that ever searched would otherwise keep a client (and its HTTP pool) alive
+_clients: "OrderedDict[tuple, Embeddings]" = OrderedDict()
+_clients_lock = threading.Lock()
+
+
+def get_embeddings(provider: str, model: str, api_key: Optional[str] = None) -> Embeddings:
+    """Process-wide embedding client for provider/model (and API key, so users never share credentials)."""
+    provider = normalize_provider(provider)
+    api_key = api_key or os.environ.get(_API_KEY_ENV[provider])
+    key = (provider, model, _key_fingerprint(api_key))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is not None:
+            _clients.move_to_end(key)
+            return client
+        if provider == "google":
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+            client = GoogleGenerativeAIEmbeddings(model=model, google_api_key=api_key)
+        else:
+            from langchain_openai import OpenAIEmbeddings
+            client = OpenAIEmbeddings(model=model, api_key=api_key)
+        _clients[key] = client
+        while len(_clients) > EMBEDDING_CLIENT_CACHE_SIZE:
+            _clients.popitem(last=False)
+        logger.info("Created embedding client provider=%s model=%s", provider, model)
+    return client
+
+
+def embedding_namespace(model: Embeddings) -> str:
+    """Cache namespace of an embedding client: provider, model and output size."""
+    module = type(model).__module__
+    if module.startswith("langchain_google_genai"):
+        provider = "google"
+    elif module.startswith("langchain_openai"):
+        provider = "openai"
+    else:
+        provider = f"{module.split('.')[0]}.{type(model).__name__}"
+    name = str(getattr(model, "model", "") or "").removeprefix("models/")
+    dims = getattr(model, "dimensions", None) or getattr(model, "output_dimensionality", None) or getattr(model, "size", None)
+    return f"{provider}:{name}" + (f":{dims}" if dims else "")
+
+
+def normalize_query(text: str) -> str:
+    """Query cache key text: case and spacing variants of a search share one entry."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def cache_key(namespace: str, kind: str, text: str) -> str:
+    # Query and document vectors differ for some providers (task types), hence kind
+    return hashlib.sha256(f"{namespace}\x00{kind}\x00{text}".encode()).hexdigest()
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    return array("f", blob).tolist()
+
+
+class EmbeddingStore(abc.ABC):
+    """Persistent key -> vector store; subclasses implement _get_many/_put_many."""
+
+    backend = "none"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "errors": 0}
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+        try:
+            found = self._get_many(keys)
+        except Exception as e:
+            logger.warning("Embedding cache read failed (%s): %s", self.backend, e)
+            self.counters["errors"] += 1
+            found = {}
+        self.counters["hits"] += len(found)
+        self.counters["misses"] += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        try:
+            self._put_many(items)
+            self.counters["writes"] += len(items)
+        except Exception as e:
+            logger.warning("Embedding cache write failed (%s): %s", self.backend, e)
+            self.counters["errors"] += 1
+
+    @abc.abstractmethod
+    def _get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Vectors of the keys that are stored; may raise, get_many logs and counts the error."""
+
+    @abc.abstractmethod
+    def _put_many(self, items: Dict[str, List[float]]) -> None:
+        """Store the vectors; may raise, put_many logs and counts the error."""
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "backend": self.backend,
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+        }
+
+
+class SQLiteEmbeddingStore(EmbeddingStore):
+    """Single-file store shared by the API, ingestion workers and MCP servers; LRU-evicts beyond max_entries."""
+
+    backend = "sqlite"
+    _CHUNK = 500  # stay under SQLite's bound-parameter limit
+    # last_used only orders eviction, so hits refresh it at most this often instead of writing on every read
+    _TOUCH_INTERVAL_S = 3600
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._db.commit()
+        self._approx_entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @classmethod
+    def _chunks(cls, items: List) -> Iterable[List]:
+        for start in range(0, len(items), cls._CHUNK):
+            yield items[start:start + cls._CHUNK]
+
+    def _get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        now = int(time.time())
+        stale = []
+        with self._lock:
+            for chunk in self._chunks(keys):
+                marks = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT key, vector, last_used FROM embeddings WHERE key IN ({marks})", chunk
+                ).fetchall()
+                for key, blob, last_used in rows:
+                    found[key] = _unpack(blob)
+                    if last_used < now - self._TOUCH_INTERVAL_S:
+                        stale.append(key)
+            if stale:
+                for chunk in self._chunks(stale):
+                    self._db.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({','.join('?' * len(chunk))})",
+                        [now, *chunk],
+                    )
+                self._db.commit()
+        return found
+
+    def _put_many(self, items: Dict[str, List[float]]) -> None:
+        now = int(time.time())
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, _pack(vector), now) for key, vector in items.items()],
+            )
+            self._db.commit()
+            self._approx_entries += len(items)
+            if self._approx_entries > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        # Trim to 90% so eviction runs once per batch of inserts, not on every write
+        total = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = total - int(self.max_entries * 0.9)
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            self._db.commit()
+            self.counters["evictions"] += excess
+            logger.info("Evicted %d least recently used embeddings from %s", excess, self.path)
+        self._approx_entries = total - max(excess, 0)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "entries": self._approx_entries, "max_entries": self.max_entries}
+
+
+class RedisEmbeddingStore(EmbeddingStore):
+    """Store shared across hosts. Entries expire after ttl_s; size is bounded by Redis' maxmemory policy."""
+
+    backend = "redis"
+    _PREFIX = "moneyrag:emb:"
+
+    def __init__(self, url: str = EMBEDDING_CACHE_REDIS_URL, ttl_s: int = EMBEDDING_CACHE_TTL_S):
+        super().__init__()
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self.ttl_s = ttl_s
+
+    def _get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        blobs = self._redis.mget([self._PREFIX + key for key in keys])
+        return {key: _unpack(blob) for key, blob in zip(keys, blobs) if blob is not None}
+
+    def _put_many(self, items: Dict[str, List[float]]) -> None:
+        pipe = self._redis.pipeline(transaction=False)
+        for key, vector in items.items():
+            pipe.set(self._PREFIX + key, _pack(vector), ex=self.ttl_s)
+        pipe.execute()
+
+
+_store: Optional[EmbeddingStore] = None
+_store_lock = threading.Lock()
+
+
+def get_embedding_store() -> Optional[EmbeddingStore]:
+    """The process-wide persistent store for EMBEDDING_CACHE_BACKEND, or None if disabled/unavailable."""
+    global _store
+    if EMBEDDING_CACHE_BACKEND == "none":
+        return None
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = RedisEmbeddingStore() if EMBEDDING_CACHE_BACKEND == "redis" else SQLiteEmbeddingStore()
+            except Exception as e:
+                logger.warning("Embedding cache unavailable (%s): %s", EMBEDDING_CACHE_BACKEND, e)
+                return None
+    return _store
+
+
+class QueryEmbeddingCache:
+    """In-memory LRU of query cache keys -> vectors, in front of the persistent store."""
+
+    def __init__(self, max_entries: int = EMBEDDING_QUERY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, List[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0}
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return vector
+
+    def put(self, key: str, vector: List[float]):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "entries": len(self._entries),
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+        }
+
+
+query_embedding_cache = QueryEmbeddingCache()
+
+
+def _query_task(base: Embeddings) -> dict:
+    """embed_documents kwargs that make it embed like embed_query (Gemini embeds the two differently)."""
+    if type(base).__module__.startswith("langchain_google_genai"):
+        return {"task_type": getattr(base, "task_type", None) or "RETRIEVAL_QUERY"}
+    return {}
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that consults the caches before the provider.
+
+    embed_documents looks every text up in the persistent store and sends only
+    the distinct misses to the provider, in one embed_documents call.
+    """
+
+    def __init__(self, base: Embeddings, namespace: Optional[str] = None, store: Optional[EmbeddingStore] = None,
+                 query_cache: QueryEmbeddingCache = query_embedding_cache):
+        self.base = base
+        self.namespace = namespace or embedding_namespace(base)
+        self.store = store
+        self.query_cache = query_cache
+        self.counters = {"documents": 0, "documents_cached": 0, "provider_calls": 0}
+
+    def _lookup(self, texts: List[str]) -> tuple[List[str], Dict[str, List[float]], Dict[str, str]]:
+        """(key per text, cached vectors, distinct missing key -> text)."""
+        keys = [cache_key(self.namespace, "document", text) for text in texts]
+        found = self.store.get_many(list(set(keys))) if self.store else {}
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        self.counters["documents"] += len(texts)
+        self.counters["documents_cached"] += sum(1 for key in keys if key in found)
+        if missing:
+            self.counters["provider_calls"] += 1
+        return keys, found, missing
+
+    def _complete(self, keys: List[str], found: Dict[str, List[float]], missing: Dict[str, str],
+                  vectors: List[List[float]]) -> List[List[float]]:
+        fresh = dict(zip(missing.keys(), vectors))
+        if self.store:
+            self.store.put_many(fresh)
+        found.update(fresh)
+        if keys:
+            logger.debug("Embedded %d texts for %s — %d distinct sent to provider", len(keys), self.namespace, len(missing))
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._lookup(texts)
+        vectors = self.base.embed_documents(list(missing.values())) if missing else []
+        return self._complete(keys, found, missing, vectors)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = await asyncio.to_thread(self._lookup, texts)
+        vectors = await self.base.aembed_documents(list(missing.values())) if missing else []
+        return await asyncio.to_thread(self._complete, keys, found, missing, vectors)
+
+    def _stored_query(self, key: str) -> Optional[List[float]]:
+        vector = self.store.get_many([key]).get(key) if self.store else None
+        if vector is not None:
+            self.query_cache.put(key, vector)
+        return vector
+
+    def _remember_query(self, key: str, vector: List[float]) -> None:
+        if self.store:
+            self.store.put_many({key: vector})
+        self.query_cache.put(key, vector)
+
+    def embed_query(self, text: str) -> List[float]:
+        # Normalised for the key only: the provider embeds what was actually asked
+        key = cache_key(self.namespace, "query", normalize_query(text))
+        vector = self.query_cache.get(key) or self._stored_query(key)
+        if vector is None:
+            vector = self.base.embed_query(text)
+            self._remember_query(key, vector)
+        return vector
+
+    def _lookup_queries(self, texts: List[str]) -> tuple[List[str], Dict[str, List[float]], Dict[str, str]]:
+        """(key per query, cached vectors, distinct missing key -> query as given)."""
+        keys = [cache_key(self.namespace, "query", normalize_query(text)) for text in texts]
+        found = {}
+        for key in dict.fromkeys(keys):
+            vector = self.query_cache.get(key)
+            if vector is not None:
+                found[key] = vector
+        unknown = [key for key in dict.fromkeys(keys) if key not in found]
+        if unknown and self.store:
+            stored = self.store.get_many(unknown)
+            for key, vector in stored.items():
+                self.query_cache.put(key, vector)
+            found.update(stored)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            self.counters["provider_calls"] += 1
+        return keys, found, missing
+
+    def _complete_queries(self, keys: List[str], found: Dict[str, List[float]], missing: Dict[str, str],
+                          vectors: List[List[float]]) -> List[List[float]]:
+        fresh = dict(zip(missing.keys(), vectors))
+        if self.store and fresh:
+            self.store.put_many(fresh)
+        for key, vector in fresh.items():
+            self.query_cache.put(key, vector)
+        found.update(fresh)
+        return [found[key] for key in keys]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """embed_query for several texts; the uncached ones go to the provider in one embed_documents call."""
+        keys, found, missing = self._lookup_queries(texts)
+        vectors = self.base.embed_documents(list(missing.values()), **_query_task(self.base)) if missing else []
+        return self._complete_queries(keys, found, missing, vectors)
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = await asyncio.to_thread(self._lookup_queries, texts)
+        vectors = await self.base.aembed_documents(list(missing.values()), **_query_task(self.base)) if missing else []
+        return await asyncio.to_thread(self._complete_queries, keys, found, missing, vectors)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = cache_key(self.namespace, "query", normalize_query(text))
+        vector = self.query_cache.get(key) or await asyncio.to_thread(self._stored_query, key)
+        if vector is None:
+            vector = await self.base.aembed_query(text)
+            await asyncio.to_thread(self._remember_query, key, vector)
+        return vector
+
+
+def with_embedding_cache(model: Embeddings) -> Embeddings:
+    """Wrap an embedding client in CachedEmbeddings (no-op if it already is one)."""
+    if isinstance(model, CachedEmbeddings):
+        return model
+    return CachedEmbeddings(model, store=get_embedding_store())
+
+
+def get_query_embeddings(provider: str, model: str, api_key: Optional[str] = None) -> CachedEmbeddings:
+    """Shared client for provider/model whose query vectors are cached."""
+    return CachedEmbeddings(get_embeddings(provider, model, api_key), store=get_embedding_store())
+
+
+def embedding_cache_stats() -> dict:
+    return {
+        "query_lru": query_embedding_cache.stats(),
+        "store": _store.stats() if _store else {"backend": EMBEDDING_CACHE_BACKEND, "initialized": False},
+    }
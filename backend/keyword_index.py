@@ -0,0 +1,132 @@
+"""
+Per-user BM25 keyword index over the text of a user's vectors.
+
+semantic_search's hybrid mode searches it next to the vector store. A document
+is a vector's page_content (merchant name, category and enriched info) plus the
+transaction's raw bank description, so exact lookups like "Walmart", "Uber" or
+"SQ *BLUE BOTTLE" match tokens here without an embedding call. Indexes are built from the stored payloads on first
+use and cached per user until their data version changes.
+"""
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("moneyrag.keyword_index")
+
+KEYWORD_INDEX_CACHE_SIZE = int(os.environ.get("KEYWORD_INDEX_CACHE_SIZE", "64"))
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN = re.compile(r"[^\W_]+")
+# Question words the agent's queries carry that would otherwise stop lookups from being exact
+STOPWORDS = frozenset(
+    "a an and at by did do for from how i in is it many me much my of on or spend spent the to what where with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with apostrophes folded ("McDonald's" -> "mcdonalds")."""
+    return _TOKEN.findall(text.lower().replace("'", "").replace("’", ""))
+
+
+class KeywordIndex:
+    """Inverted index with BM25 scoring over one user's documents (payload dicts with 'page_content')."""
+
+    def __init__(self, payloads: List[Dict[str, Any]]):
+        self.payloads = payloads
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        lengths = np.zeros(len(payloads), dtype=np.float32)
+        for doc, payload in enumerate(payloads):
+            # The merchant name is in page_content too; repeating it ranks merchant matches above the
+            # same words in an item description. Only transactions carry the raw bank description.
+            tokens = tokenize(
+                f"{payload.get('page_content') or ''} {payload.get('merchant_name') or ''} {payload.get('description') or ''}"
+            )
+            lengths[doc] = len(tokens)
+            for token, tf in Counter(tokens).items():
+                docs, tfs = postings.setdefault(token, ([], []))
+                docs.append(doc)
+                tfs.append(tf)
+        self._postings = {
+            token: (np.asarray(docs, dtype=np.int64), np.asarray(tfs, dtype=np.float32))
+            for token, (docs, tfs) in postings.items()
+        }
+        # Length normalisation is per document, so it is folded in once here rather than per query
+        avg_length = float(lengths.mean()) if len(payloads) else 0.0
+        self._norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_length) if avg_length else lengths
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    def search(self, query: str, limit: int,
+               where: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[Tuple[int, float, bool]]:
+        """
+        Best (doc, score, exact) matches for the query, highest score first.
+
+        exact means the document contains every query token (stopwords aside).
+        where, if given, keeps only documents whose payload it accepts.
+        """
+        tokens = [t for t in dict.fromkeys(tokenize(query)) if t not in STOPWORDS]
+        if not tokens or not self.payloads:
+            return []
+        scores = np.zeros(len(self.payloads), dtype=np.float32)
+        matched = np.zeros(len(self.payloads), dtype=np.int32)
+        n = len(self.payloads)
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            docs, tfs = posting
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tfs * (BM25_K1 + 1) / (tfs + self._norm[docs])
+            matched[docs] += 1
+        candidates = np.flatnonzero(matched)
+        if where is not None:
+            keep = np.fromiter((where(self.payloads[i]) for i in candidates), dtype=bool, count=len(candidates))
+            candidates = candidates[keep]
+        exact = matched[candidates] == len(tokens)
+        # Documents holding every token first, then by score (stable, so ties keep stored order)
+        order = np.lexsort((-scores[candidates], ~exact))[:limit]
+        return [(int(candidates[i]), float(scores[candidates[i]]), bool(exact[i])) for i in order]
+
+
+class KeywordIndexCache:
+    """LRU of per-user indexes, each valid for the data version it was built at."""
+
+    def __init__(self, max_entries: int = KEYWORD_INDEX_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, KeywordIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "builds": 0}
+
+    def get(self, user_id: str, version: str, build: Callable[[], KeywordIndex]) -> KeywordIndex:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(user_id)
+                self.counters["hits"] += 1
+                return entry[1]
+        # Built outside the lock: fetching a user's payloads is a network round trip per page
+        index = build()
+        with self._lock:
+            self._entries[user_id] = (version, index)
+            self._entries.move_to_end(user_id)
+            self.counters["builds"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        logger.debug("Built keyword index for user_id=%s (%d documents)", user_id, len(index))
+        return index
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"users": len(self._entries), **self.counters}
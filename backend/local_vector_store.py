@@ -0,0 +1,522 @@
+"""
+In-process vector store for VECTOR_DB_STACK=local.
+
+Each user's vectors are one L2-normalised float32 matrix, so cosine top-k is a
+single matrix-vector product. Tenants are persisted under LOCAL_VECTOR_DIR as
+a JSON manifest (ids + payloads) and a .npy matrix that is memory-mapped on
+load. Writes go to a new generation of files and the manifest is swapped in
+last, so the API process and stdio MCP servers on the same host can share the
+directory: readers notice a newer manifest and reload. A per-tenant flock is
+held shared while loading and exclusive while writing; a writer whose tenant was
+rewritten by another process since it loaded replays its changes on top of the
+newer generation instead of overwriting it.
+
+Tenants with at least LOCAL_VECTOR_ANN_MIN vectors are also searched through an
+inverted-file index (k-means cells, LOCAL_VECTOR_NPROBE probed per query) built
+on first search after a change; smaller ones are always searched exactly.
+
+With quantization="float16" or "int8" the store keeps a low-precision copy of
+each tenant in memory to shortlist oversampling * top_k candidates, and only
+those are rescored against the full-precision matrix, which after a flush is
+read from the memory-mapped file rather than held in process memory.
+"""
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single process per vector directory
+    fcntl = None
+
+logger = logging.getLogger("moneyrag.local_vectors")
+
+LOCAL_VECTOR_DIR = os.environ.get(
+    "LOCAL_VECTOR_DIR", os.path.join(tempfile.gettempdir(), "moneyrag-vectors")
+)
+LOCAL_VECTOR_ANN_MIN = int(os.environ.get("LOCAL_VECTOR_ANN_MIN", "20000"))
+LOCAL_VECTOR_NPROBE = int(os.environ.get("LOCAL_VECTOR_NPROBE", "8"))
+
+QUANTIZATIONS = ("none", "float16", "int8")
+# Rows converted back to float32 at a time when scoring a quantized matrix (small enough to stay in cache)
+_SCORE_CHUNK = 512
+
+_COLLECTION_FILE = "collection.json"
+_MANIFEST_FILE = "manifest.json"
+_LOCK_FILE = "lock"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    if k < len(scores):
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def _write_atomic(path: str, write) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+@contextlib.contextmanager
+def _tenant_lock(path: str, exclusive: bool):
+    """flock on a tenant directory: shared to read a generation, exclusive to write one."""
+    with open(os.path.join(path, _LOCK_FILE), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+
+class _IVFIndex:
+    """Coarse k-means partition of a tenant's rows; a query scores only the rows in its nearest cells."""
+
+    def __init__(self, matrix: np.ndarray, iterations: int = 6, seed: int = 0):
+        n = len(matrix)
+        n_cells = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        sample = matrix[rng.choice(n, size=min(n, n_cells * 32), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_cells, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(n_cells):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+        self.centroids = centroids
+        assign = np.concatenate([
+            np.argmax(matrix[start:start + 8192] @ centroids.T, axis=1) for start in range(0, n, 8192)
+        ])
+        order = np.argsort(assign, kind="stable")
+        self.rows = order
+        self.offsets = np.searchsorted(assign[order], np.arange(n_cells + 1))
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        cells = _top_k(self.centroids @ query, min(nprobe, len(self.centroids)))
+        return np.concatenate([self.rows[self.offsets[c]:self.offsets[c + 1]] for c in cells])
+
+
+class _Quantized:
+    """Low-precision copy of a tenant's vectors: float16, or int8 with a per-dimension scale."""
+
+    def __init__(self, vectors: np.ndarray, kind: str):
+        if kind == "float16":
+            self.scale = None
+            self.matrix = vectors.astype(np.float16)
+        else:
+            # Symmetric per-dimension scale: normalised vectors rarely use the full [-1, 1] range in any one dimension
+            max_abs = np.abs(vectors).max(axis=0) if len(vectors) else np.ones(vectors.shape[1], dtype=np.float32)
+            self.scale = (np.where(max_abs == 0, 1, max_abs) / 127).astype(np.float32)
+            self.matrix = np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate cosine scores of every row (or the given rows)."""
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        q = query if self.scale is None else query * self.scale
+        out = np.empty(len(matrix), dtype=np.float32)
+        buffer = np.empty((min(_SCORE_CHUNK, len(matrix)), matrix.shape[1]), dtype=np.float32)
+        for start in range(0, len(matrix), _SCORE_CHUNK):
+            block = buffer[:len(matrix[start:start + _SCORE_CHUNK])]
+            block[...] = matrix[start:start + _SCORE_CHUNK]
+            out[start:start + len(block)] = block @ q
+        return out
+
+
+class _Tenant:
+    """One user's vectors: ids, payloads and a matrix with spare capacity for appends."""
+
+    def __init__(self, dim: int):
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.payloads: List[Dict[str, Any]] = []
+        self.matrix = np.empty((0, dim), dtype=np.float32)
+        self.generation = 0
+        self.loaded_stamp: Optional[Tuple[int, int]] = None
+        self.dirty = False
+        # Ids upserted or deleted since the last write, replayed if another process wrote in between
+        self.changed: set = set()
+        self.index: Optional[_IVFIndex] = None
+        self.quantized: Optional[_Quantized] = None
+        self.columns: Dict[Tuple[str, bool], np.ndarray] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    def vectors(self) -> np.ndarray:
+        return self.matrix[:self.size]
+
+    def column(self, key: str, numeric: bool = False) -> np.ndarray:
+        """One payload field for every row: floats (NaN if missing) or strings ("" if missing)."""
+        column = self.columns.get((key, numeric))
+        if column is None:
+            values = [p.get(key) for p in self.payloads]
+            if numeric:
+                column = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            else:
+                column = np.array(["" if v is None else str(v) for v in values], dtype=str)
+            self.columns[(key, numeric)] = column
+        return column
+
+    def _reserve(self, extra: int) -> None:
+        needed = self.size + extra
+        if needed <= len(self.matrix) and self.matrix.flags.writeable:
+            return
+        # Geometric growth keeps a chunked sync linear; the first write also copies a read-only memmap into RAM
+        capacity = max(needed, 2 * len(self.matrix), 64)
+        matrix = np.empty((capacity, self.matrix.shape[1]), dtype=np.float32)
+        matrix[:self.size] = self.matrix[:self.size]
+        self.matrix = matrix
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, payloads: List[Dict[str, Any]]) -> None:
+        self._reserve(len(ids))
+        for vid, vector, payload in zip(ids, vectors, payloads):
+            row = self.rows.get(vid)
+            if row is None:
+                row = self.rows[vid] = self.size
+                self.ids.append(vid)
+                self.payloads.append(payload)
+            else:
+                self.payloads[row] = payload
+            self.matrix[row] = vector
+        self.changed.update(ids)
+        self.dirty = True
+        self.index = None
+        self.quantized = None
+        self.columns = {}
+
+    def delete(self, ids) -> int:
+        rows = sorted((self.rows[vid] for vid in ids if vid in self.rows), reverse=True)
+        if not rows:
+            return 0
+        self._reserve(0)
+        for row in rows:
+            vid = self.ids[row]
+            # Move the last row into the hole so the matrix stays dense
+            last = self.size - 1
+            if row != last:
+                self.matrix[row] = self.matrix[last]
+                self.ids[row] = self.ids[last]
+                self.payloads[row] = self.payloads[last]
+                self.rows[self.ids[row]] = row
+            del self.rows[vid]
+            self.ids.pop()
+            self.payloads.pop()
+            self.changed.add(vid)
+        self.dirty = True
+        self.index = None
+        self.quantized = None
+        self.columns = {}
+        return len(rows)
+
+
+class LocalVectorStore:
+    """Per-user vector matrices on local disk, with the operations VectorDBClient needs."""
+
+    def __init__(self, root: str = LOCAL_VECTOR_DIR, quantization: str = "none", oversampling: float = 4.0):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown vector quantization '{quantization}'; expected one of {', '.join(QUANTIZATIONS)}")
+        self.root = root
+        self.quantization = quantization
+        self.oversampling = oversampling
+        self._tenants: Dict[str, _Tenant] = {}
+        self._lock = threading.RLock()
+        self.counters = {
+            "loads": 0, "flushes": 0, "searches": 0, "exact_searches": 0, "index_builds": 0, "quantizations": 0,
+            "filtered_searches": 0,
+        }
+
+    # -- collection -------------------------------------------------------
+
+    def dimension(self) -> Optional[int]:
+        """Vector size the store was created with; None before the first sync."""
+        try:
+            with open(os.path.join(self.root, _COLLECTION_FILE)) as f:
+                return json.load(f)["dim"]
+        except FileNotFoundError:
+            return None
+
+    def create_collection(self, dim: int) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        if self.dimension() is None:
+            _write_atomic(os.path.join(self.root, _COLLECTION_FILE), lambda f: f.write(json.dumps({"dim": dim}).encode()))
+
+    # -- tenants ----------------------------------------------------------
+
+    def _tenant_dir(self, user_id: str) -> str:
+        return os.path.join(self.root, hashlib.sha256(user_id.encode()).hexdigest())
+
+    def _manifest_stamp(self, user_id: str) -> Optional[Tuple[int, int]]:
+        """Changes whenever the manifest is replaced (the inode too, as mtimes can tie within a clock tick)."""
+        try:
+            stat = os.stat(os.path.join(self._tenant_dir(user_id), _MANIFEST_FILE))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino
+
+    def _is_stored_generation(self, user_id: str, generation: int) -> bool:
+        """
+        Whether generation is still the one on disk; the caller holds the tenant lock.
+
+        Every write removes the previous generation's matrix under that lock, so its
+        file exists exactly until someone writes the next one.
+        """
+        path = self._tenant_dir(user_id)
+        if generation == 0:
+            return not os.path.exists(os.path.join(path, _MANIFEST_FILE))
+        return os.path.exists(os.path.join(path, f"vectors-{generation}.npy"))
+
+    def _load(self, user_id: str) -> Optional[_Tenant]:
+        path = self._tenant_dir(user_id)
+        if not os.path.isdir(path):
+            return None
+        # Shared lock: no writer can swap generations between reading the manifest and its matrix
+        with _tenant_lock(path, exclusive=False):
+            return self._read(user_id)
+
+    def _read(self, user_id: str) -> Optional[_Tenant]:
+        """The tenant as stored on disk; the caller holds its lock."""
+        path = self._tenant_dir(user_id)
+        stamp = self._manifest_stamp(user_id)
+        if stamp is None:
+            return None
+        with open(os.path.join(path, _MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        matrix = np.load(os.path.join(path, f"vectors-{manifest['generation']}.npy"), mmap_mode="r")
+        tenant = _Tenant(matrix.shape[1])
+        tenant.ids = manifest["ids"]
+        tenant.payloads = manifest["payloads"]
+        tenant.rows = {vid: i for i, vid in enumerate(tenant.ids)}
+        tenant.matrix = matrix
+        tenant.generation = manifest["generation"]
+        tenant.loaded_stamp = stamp
+        self.counters["loads"] += 1
+        return tenant
+
+    def _tenant(self, user_id: str, create: bool = False) -> Optional[_Tenant]:
+        """The user's tenant, reloaded if another process wrote a newer one since we read it."""
+        tenant = self._tenants.get(user_id)
+        if tenant is None or not tenant.dirty:
+            stamp = self._manifest_stamp(user_id)
+            if tenant is None or (stamp is not None and stamp != tenant.loaded_stamp):
+                tenant = self._load(user_id) if stamp is not None else None
+                if tenant is not None:
+                    self._tenants[user_id] = tenant
+        if tenant is None and create:
+            dim = self.dimension()
+            if dim is None:
+                raise RuntimeError("Local vector collection has not been created yet.")
+            tenant = self._tenants[user_id] = _Tenant(dim)
+        return tenant
+
+    def _user_ids(self) -> List[str]:
+        """Users with vectors on disk or pending in memory."""
+        users = set(self._tenants)
+        if os.path.isdir(self.root):
+            on_disk = {entry for entry in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, entry))}
+            for entry in on_disk:
+                try:
+                    with open(os.path.join(self.root, entry, _MANIFEST_FILE)) as f:
+                        users.add(json.load(f)["user_id"])
+                except (FileNotFoundError, KeyError, ValueError):
+                    continue
+        return sorted(users)
+
+    # -- reads and writes ---------------------------------------------------
+
+    def payloads(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        """point id -> payload of every vector stored for the user."""
+        with self._lock:
+            tenant = self._tenant(user_id)
+            return dict(zip(tenant.ids, tenant.payloads)) if tenant else {}
+
+    def upsert(self, ids: List[str], vectors: List[List[float]], payloads: List[Dict[str, Any]]) -> None:
+        """Insert or replace vectors; each payload's user_id decides the tenant."""
+        matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+        by_user: Dict[str, List[int]] = {}
+        for i, payload in enumerate(payloads):
+            by_user.setdefault(payload["user_id"], []).append(i)
+        with self._lock:
+            for user_id, rows in by_user.items():
+                self._tenant(user_id, create=True).upsert(
+                    [ids[i] for i in rows], matrix[rows], [payloads[i] for i in rows]
+                )
+
+    def delete(self, user_id: str, ids: List[str]) -> int:
+        with self._lock:
+            tenant = self._tenant(user_id)
+            return tenant.delete(ids) if tenant else 0
+
+    def delete_where(self, key: str, value: Any, user_id: Optional[str] = None) -> int:
+        """Delete vectors whose payload[key] == value, for one user or (slowly) all of them."""
+        deleted = 0
+        with self._lock:
+            for uid in [user_id] if user_id is not None else self._user_ids():
+                tenant = self._tenant(uid)
+                if tenant:
+                    deleted += tenant.delete([vid for vid, p in zip(tenant.ids, tenant.payloads) if p.get(key) == value])
+        return deleted
+
+    def search(self, user_id: str, query: List[float], top_k: int,
+               where: Optional[Callable[[Callable[..., np.ndarray]], np.ndarray]] = None) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        (cosine score, payload) of the user's top_k nearest vectors, best first.
+
+        where(column) narrows the search to the rows whose mask is True; column(key,
+        numeric=False) returns that payload field for every row as an array.
+        Filtered searches score the matching rows exactly, without the IVF index.
+        """
+        return self.search_many(user_id, [query], top_k, where)[0]
+
+    def search_many(self, user_id: str, queries: List[List[float]], top_k: int,
+                    where: Optional[Callable[[Callable[..., np.ndarray]], np.ndarray]] = None
+                    ) -> List[List[Tuple[float, Dict[str, Any]]]]:
+        """
+        search for several queries, one result list per query.
+
+        The where mask is evaluated once for all of them, and exact full-precision
+        searches score every query in a single pass over the matrix.
+        """
+        if not len(queries):
+            return []
+        q_all = _normalize(np.asarray(queries, dtype=np.float32))
+        with self._lock:
+            tenant = self._tenant(user_id)
+            if tenant is None or tenant.size == 0 or top_k <= 0:
+                return [[] for _ in queries]
+            self.counters["searches"] += len(queries)
+            vectors = tenant.vectors()
+            rows = None
+            if where is not None:
+                self.counters["filtered_searches"] += len(queries)
+                rows = np.flatnonzero(where(tenant.column))
+                if len(rows) == 0:
+                    return [[] for _ in queries]
+            elif tenant.size >= LOCAL_VECTOR_ANN_MIN:
+                if tenant.index is None:
+                    tenant.index = _IVFIndex(vectors)
+                    self.counters["index_builds"] += 1
+                return [
+                    self._search_rows(tenant, vectors, q, tenant.index.candidates(q, LOCAL_VECTOR_NPROBE), top_k)
+                    for q in q_all
+                ]
+            else:
+                self.counters["exact_searches"] += len(queries)
+
+            if self.quantization != "none":
+                return [self._search_rows(tenant, vectors, q, rows, top_k) for q in q_all]
+            scores = q_all @ (vectors if rows is None else vectors[rows]).T
+            results = []
+            for row_scores in scores:
+                best = _top_k(row_scores, min(top_k, len(row_scores)))
+                results.append([
+                    (float(row_scores[i]), tenant.payloads[i if rows is None else rows[i]]) for i in best
+                ])
+            return results
+
+    def _search_rows(self, tenant: _Tenant, vectors: np.ndarray, q: np.ndarray, rows: Optional[np.ndarray],
+                     top_k: int) -> List[Tuple[float, Dict[str, Any]]]:
+        """One query's top_k among rows (None: every row), through the quantized copy if there is one."""
+        if self.quantization != "none":
+            # Shortlist on the quantized copy, then rescore the shortlist at full precision
+            if tenant.quantized is None:
+                tenant.quantized = _Quantized(vectors, self.quantization)
+                self.counters["quantizations"] += 1
+            approx = tenant.quantized.scores(q, rows)
+            shortlist = _top_k(approx, min(max(top_k, int(top_k * self.oversampling)), len(approx)))
+            rows = shortlist if rows is None else rows[shortlist]
+        if rows is None:
+            scores = vectors @ q
+            best = _top_k(scores, min(top_k, tenant.size))
+            return [(float(scores[i]), tenant.payloads[i]) for i in best]
+        scores = vectors[rows] @ q
+        best = _top_k(scores, min(top_k, len(rows)))
+        return [(float(scores[i]), tenant.payloads[rows[i]]) for i in best]
+
+    def flush(self) -> None:
+        """Persist every tenant changed since the last flush."""
+        with self._lock:
+            for user_id, tenant in self._tenants.items():
+                if tenant.dirty:
+                    self._write(user_id, tenant)
+
+    def _write(self, user_id: str, tenant: _Tenant) -> None:
+        path = self._tenant_dir(user_id)
+        os.makedirs(path, exist_ok=True)
+        with _tenant_lock(path, exclusive=True):
+            if not self._is_stored_generation(user_id, tenant.generation):
+                # Another process wrote this tenant since we loaded it: keep its changes and apply ours on top
+                tenant = self._tenants[user_id] = self._merge(self._read(user_id), tenant)
+            self._write_generation(user_id, tenant)
+
+    @staticmethod
+    def _merge(stored: Optional[_Tenant], ours: _Tenant) -> _Tenant:
+        """stored with the ids ours changed set to their value in ours (or deleted)."""
+        if stored is None:
+            return ours
+        deleted = [vid for vid in ours.changed if vid not in ours.rows]
+        upserted = [vid for vid in ours.changed if vid in ours.rows]
+        stored.delete(deleted)
+        if upserted:
+            rows = [ours.rows[vid] for vid in upserted]
+            stored.upsert(upserted, ours.matrix[rows], [ours.payloads[row] for row in rows])
+        return stored
+
+    def _write_generation(self, user_id: str, tenant: _Tenant) -> None:
+        path = self._tenant_dir(user_id)
+        old_generation = tenant.generation
+        generation = old_generation + 1
+        vectors = tenant.vectors()
+        _write_atomic(os.path.join(path, f"vectors-{generation}.npy"), lambda f: np.save(f, vectors))
+        manifest = {"user_id": user_id, "generation": generation, "ids": tenant.ids, "payloads": tenant.payloads}
+        _write_atomic(os.path.join(path, _MANIFEST_FILE), lambda f: f.write(json.dumps(manifest, default=str).encode()))
+        tenant.generation = generation
+        tenant.loaded_stamp = self._manifest_stamp(user_id)
+        tenant.dirty = False
+        tenant.changed = set()
+        # Full-precision vectors are only read for rescoring: hand them back to the page cache
+        tenant.matrix = np.load(os.path.join(path, f"vectors-{generation}.npy"), mmap_mode="r")
+        try:
+            os.unlink(os.path.join(path, f"vectors-{old_generation}.npy"))
+        except FileNotFoundError:
+            pass
+        self.counters["flushes"] += 1
+        logger.debug("Wrote %d local vectors for user_id=%s (generation %d)", tenant.size, user_id, generation)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tenants_loaded": len(self._tenants),
+                "vectors_loaded": sum(t.size for t in self._tenants.values()),
+                "quantization": self.quantization,
+                # Process memory held by vectors (memory-mapped matrices live in the page cache instead)
+                "vector_bytes": sum(
+                    (0 if isinstance(t.matrix, np.memmap) else t.matrix.nbytes)
+                    + (t.quantized.matrix.nbytes if t.quantized else 0)
+                    for t in self._tenants.values()
+                ),
+                **self.counters,
+            }
+
+    def close(self) -> None:
+        self.flush()
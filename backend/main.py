@@ -1,4 +1,5 @@
 import logging
+import sys
 import time
 from contextlib import asynccontextmanager
 from pathlib import Path
@@ -46,9 +47,14 @@ logger = logging.getLogger("moneyrag.main")
 async def lifespan(app: FastAPI):
     logger.info("MoneyRAG API starting up")
     logger.debug("Registered routers: auth, config, files, chat")
+    rag_manager.mcp_pool.start_reaper()
     yield
     logger.info("MoneyRAG API shutting down — cleaning up RAG instances")
     await rag_manager.cleanup_all()
+    vector_db_client = sys.modules.get("backend.vector_db_client")
+    if vector_db_client is not None:
+        await vector_db_client.close_async_vector_client()
+        vector_db_client.close_vector_client()
     logger.info("Shutdown complete")
 
 
@@ -115,6 +121,20 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/api/v1/metrics")
+async def metrics():
+    """Process-level performance counters (no user data)."""
+    result = {"rag": rag_manager.stats()}
+    # Tool-layer counters live in this process only when chat tools run in-process
+    mcp_server = sys.modules.get("mcp_server")
+    if mcp_server is not None:
+        result["tools"] = mcp_server.tool_metrics()
+    vector_db_client = sys.modules.get("backend.vector_db_client")
+    if vector_db_client is not None:
+        result["vector_db"] = vector_db_client.vector_client_stats()
+    return result
+
+
 @app.get("/api/v1/public-config")
 async def public_config():
     """Return public (non-secret) config for the frontend."""
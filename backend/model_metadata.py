@@ -0,0 +1,113 @@
+"""
+Embedding model metadata: the output dimension of each provider/model.
+
+Common models are listed below. Anything else is learned from the first real
+embedding it returns and persisted to MODEL_METADATA_PATH, so vector sync can
+create or verify the collection without paying for a probe request. The same
+file records the vector size of collections on stacks that can't report it
+(Actian), so a model switch is caught before the first upsert.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Optional
+
+from langchain_core.embeddings import Embeddings
+
+from backend.embeddings import embedding_namespace
+
+logger = logging.getLogger("moneyrag.model_metadata")
+
+MODEL_METADATA_PATH = os.environ.get(
+    "MODEL_METADATA_PATH", os.path.join(tempfile.gettempdir(), "moneyrag-model-metadata.json")
+)
+
+# Default output sizes, keyed by embedding_namespace() without an explicit size
+KNOWN_DIMENSIONS = {
+    "google:gemini-embedding-001": 3072,
+    "google:text-embedding-004": 768,
+    "google:text-embedding-005": 768,
+    "google:embedding-001": 768,
+    "openai:text-embedding-3-small": 1536,
+    "openai:text-embedding-3-large": 3072,
+    "openai:text-embedding-ada-002": 1536,
+}
+
+_learned: Optional[dict] = None
+_lock = threading.Lock()
+
+
+def _namespace(model: Embeddings) -> str:
+    # CachedEmbeddings carries the namespace of the client it wraps
+    return getattr(model, "namespace", None) or embedding_namespace(model)
+
+
+def _explicit_dimension(model: Embeddings) -> Optional[int]:
+    model = getattr(model, "base", model)
+    for attr in ("dimensions", "output_dimensionality", "size"):
+        value = getattr(model, attr, None)
+        if isinstance(value, int) and value > 0:
+            return value
+    return None
+
+
+def _load_learned() -> dict:
+    global _learned
+    if _learned is None:
+        try:
+            with open(MODEL_METADATA_PATH) as f:
+                _learned = json.load(f)
+        except FileNotFoundError:
+            _learned = {}
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable model metadata at %s: %s", MODEL_METADATA_PATH, e)
+            _learned = {}
+    return _learned
+
+
+def embedding_dimension(model: Embeddings) -> Optional[int]:
+    """Output dimension of the model if configured, learned or known; None if never seen."""
+    explicit = _explicit_dimension(model)
+    if explicit:
+        return explicit
+    namespace = _namespace(model)
+    with _lock:
+        learned = _load_learned().get(namespace)
+    return learned or KNOWN_DIMENSIONS.get(namespace)
+
+
+def record_embedding_dimension(model: Embeddings, dim: int) -> None:
+    """Remember the dimension a model actually returned (no-op if it matches what we knew)."""
+    if embedding_dimension(model) == dim:
+        return
+    _remember(_namespace(model), dim)
+
+
+def collection_dimension(collection: str) -> Optional[int]:
+    """Vector size recorded for a collection by record_collection_dimension; None if never recorded on this host."""
+    with _lock:
+        return _load_learned().get(f"collection:{collection}")
+
+
+def record_collection_dimension(collection: str, dim: int) -> None:
+    if collection_dimension(collection) != dim:
+        _remember(f"collection:{collection}", dim)
+
+
+def _remember(key: str, dim: int) -> None:
+    global _learned
+    with _lock:
+        learned = dict(_load_learned())
+        learned[key] = dim
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(MODEL_METADATA_PATH)), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(MODEL_METADATA_PATH)))
+            with os.fdopen(fd, "w") as f:
+                json.dump(learned, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, MODEL_METADATA_PATH)
+        except OSError as e:
+            logger.warning("Could not persist model metadata to %s: %s", MODEL_METADATA_PATH, e)
+        _learned = learned
+    logger.info("Learned vector dimension %d for %s", dim, key)
@@ -29,14 +29,34 @@ async def chat(body: ChatRequest, user: dict = Depends(get_current_user)):
     rag = await rag_manager.get_or_create(user, config)
     logger.debug("RAG instance ready for user_id=%s", user["id"])
 
+    tools_start = time.perf_counter()
+    try:
+        tools = await rag_manager.get_tools(user["id"])
+    except Exception as e:
+        logger.error("Failed to load chat tools for user_id=%s: %s", user["id"], e, exc_info=True)
+        raise HTTPException(status_code=503, detail=f"Tool server unavailable: {e}")
+    logger.debug(
+        "Chat tools ready for user_id=%s — %d tools in %.1fms",
+        user["id"], len(tools), (time.perf_counter() - tools_start) * 1000,
+    )
+
     async def event_generator():
         event_count = 0
         start = time.perf_counter()
         try:
             logger.debug("Starting SSE stream for user_id=%s", user["id"])
-            async for event in rag.chat(body.message):
+            first_token_ms = None
+            async for event in rag.chat(body.message, tools=tools):
                 event_count += 1
                 event_type = event.get("type", "unknown")
+
+                if event_type == "token":
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - start) * 1000
+                        logger.debug("First token for user_id=%s after %.1fms", user["id"], first_token_ms)
+                    yield f"event: token\ndata: {json.dumps({'content': event['content']})}\n\n"
+                    continue
+
                 logger.debug(
                     "SSE event #%d type=%s for user_id=%s",
                     event_count, event_type, user["id"],
@@ -44,71 +64,22 @@ async def chat(body: ChatRequest, user: dict = Depends(get_current_user)):
 
                 if event["type"] == "final":
                     content = event.get("content", "")
+                    charts = event.get("charts", [])
+                    images = event.get("images", [])
+                    pending_transactions = event.get("pendingTransactions", [])
                     logger.debug(
-                        "Final event — content length=%d chars for user_id=%s",
-                        len(content), user["id"],
-                    )
-                    charts = []
-                    # Extract chart JSON from ===CHART===...===ENDCHART=== markers
-                    while "===CHART===" in content:
-                        pre, rest = content.split("===CHART===", 1)
-                        if "===ENDCHART===" in rest:
-                            chart_json, after = rest.split("===ENDCHART===", 1)
-                            charts.append(chart_json.strip())
-                            content = pre + after
-                            logger.debug("Extracted chart JSON (%d chars)", len(chart_json))
-                        else:
-                            content = pre + rest
-                            logger.warning("Found ===CHART=== without matching ===ENDCHART===")
-                            break
-
-                    images = []
-                    # Extract image URLs from ===IMAGES===...===ENDIMAGES=== markers
-                    while "===IMAGES===" in content:
-                        pre, rest = content.split("===IMAGES===", 1)
-                        if "===ENDIMAGES===" in rest:
-                            images_json, after = rest.split("===ENDIMAGES===", 1)
-                            content = pre + after
-                            try:
-                                urls = json.loads(images_json.strip())
-                                images.extend(urls)
-                                logger.debug("Extracted %d image URLs", len(urls))
-                            except json.JSONDecodeError:
-                                logger.warning("Failed to parse images JSON")
-                        else:
-                            content = pre + rest
-                            logger.warning("Found ===IMAGES=== without matching ===ENDIMAGES===")
-                            break
-
-                    pending_transactions = []
-                    while "===CONFIRM_TX===" in content:
-                        pre, rest = content.split("===CONFIRM_TX===", 1)
-                        if "===ENDCONFIRM_TX===" in rest:
-                            tx_json, after = rest.split("===ENDCONFIRM_TX===", 1)
-                            content = pre + after
-                            try:
-                                tx_data = json.loads(tx_json.strip())
-                                pending_transactions.append(tx_data)
-                                logger.debug("Extracted pending transaction: %s", tx_data)
-                            except json.JSONDecodeError:
-                                logger.warning("Failed to parse pending transaction JSON")
-                        else:
-                            content = pre + rest
-                            logger.warning("Found ===CONFIRM_TX=== without matching ===ENDCONFIRM_TX===")
-                            break
-
-                    logger.debug(
-                        "Final response: %d charts, %d images, %d pending_tx extracted, content length=%d",
-                        len(charts), len(images), len(pending_transactions), len(content.strip()),
+                        "Final response: %d charts, %d images, %d pending_tx, content length=%d",
+                        len(charts), len(images), len(pending_transactions), len(content),
                     )
-                    yield f"event: final\ndata: {json.dumps({'content': content.strip(), 'charts': charts, 'images': images, 'pendingTransactions': pending_transactions})}\n\n"
+                    yield f"event: final\ndata: {json.dumps({'content': content, 'charts': charts, 'images': images, 'pendingTransactions': pending_transactions})}\n\n"
                 else:
                     yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
 
             elapsed_ms = (time.perf_counter() - start) * 1000
             logger.info(
-                "SSE stream complete for user_id=%s — %d events in %.1fms",
+                "SSE stream complete for user_id=%s — %d events in %.1fms (first token %s)",
                 user["id"], event_count, elapsed_ms,
+                f"{first_token_ms:.1f}ms" if first_token_ms is not None else "n/a",
             )
             yield "event: done\ndata: {}\n\n"
         except Exception as e:
@@ -116,6 +87,8 @@ async def chat(body: ChatRequest, user: dict = Depends(get_current_user)):
                 "SSE stream error for user_id=%s: %s", user["id"], e, exc_info=True,
             )
             yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            await rag_manager.release_tools(user["id"], tools)
 
     return StreamingResponse(
         event_generator(),
@@ -2,6 +2,7 @@ import hashlib
 import logging
 
 from fastapi import APIRouter, Depends, HTTPException
+from backend.data_version import bump_data_version
 from backend.dependencies import get_current_user, get_supabase
 from backend.schemas.transactions import TransactionCreate, TransactionResponse
 
@@ -42,6 +43,7 @@ async def create_transaction(
     try:
         sb = get_supabase(access_token=user.get("access_token"))
         result = sb.table("Transaction").upsert([record], on_conflict="content_hash").execute()
+        bump_data_version(user_id)
 
         if result.data:
             row = result.data[0]
@@ -5,6 +5,7 @@ import os
 import sys
 import time
 from typing import List
+from backend.data_version import bump_data_version
 from backend.dependencies import get_supabase
 from backend.db_client import get_db_client
 from backend.services.rag_manager import rag_manager
@@ -249,10 +250,11 @@ async def delete_file(user: dict, file_id: str, file_type: str):
         logger.debug("Using RAG instance to delete file data for file_id=%s", file_id)
         rag = await rag_manager.get_or_create(user, config)
         await rag.delete_file(file_id, file_type)
-        logger.debug("RAG delete_file complete for file_id=%s", file_id)
+        logger.debug("RAG delete_file complete for file_id=%s (vectors purging in the background)", file_id)
     else:
         logger.debug("No config — using fallback DB delete for file_id=%s", file_id)
         await asyncio.to_thread(_delete_fallback_sync, user["access_token"], file_id, file_type)
+        bump_data_version(user["id"])
         logger.debug("Fallback delete complete for file_id=%s", file_id)
 
     logger.info("File '%s' (id=%s) fully deleted for user_id=%s", filename, file_id, user["id"])
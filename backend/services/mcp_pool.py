@@ -0,0 +1,267 @@
+"""
+Warm, per-user MCP tool-server sessions.
+
+Spawning mcp_server.py over stdio costs a fresh Python interpreter plus the
+fastmcp / MCP SDK imports before the first tool can run. The pool
+keeps one server per user alive across chat turns, pings it before reuse and
+shuts it down once it has been idle for MCP_IDLE_TIMEOUT_S seconds. A session
+counts as idle only after the chat turn that acquired it releases it, and a
+session closed while turns still use it (e.g. on invalidation) leaves the pool
+at once but only shuts down when the last of them releases it.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+from langchain_core.tools import BaseTool
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
+
+logger = logging.getLogger("moneyrag.services.mcp_pool")
+
+MCP_SERVER_NAME = "money_rag"
+MCP_IDLE_TIMEOUT_S = float(os.environ.get("MCP_IDLE_TIMEOUT_S", "600"))
+MCP_PING_TIMEOUT_S = float(os.environ.get("MCP_PING_TIMEOUT_S", "5"))
+MCP_REAPER_INTERVAL_S = float(os.environ.get("MCP_REAPER_INTERVAL_S", "60"))
+# An acquired session is only evicted past this, in case a chat stream never got to release it
+MCP_MAX_TURN_S = float(os.environ.get("MCP_MAX_TURN_S", "1800"))
+
+
+class MCPSession:
+    """One running mcp_server.py subprocess and the LangChain tools bound to it.
+
+    The stdio transport is opened and closed inside a dedicated task because
+    anyio cancel scopes must be exited by the same task that entered them.
+    """
+
+    def __init__(self, user_id: str, connection: dict):
+        self.user_id = user_id
+        self._connection = connection
+        self.tools: list[BaseTool] = []
+        self.session = None
+        self.last_used = time.monotonic()
+        self.in_use = 0
+        self.startup_ms = 0.0
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._error: BaseException | None = None
+
+    async def start(self):
+        start = time.perf_counter()
+        self._task = asyncio.create_task(self._run(), name=f"mcp-session-{self.user_id}")
+        await self._ready.wait()
+        if self._error is not None:
+            raise RuntimeError(f"MCP server failed to start: {self._error}") from self._error
+        self.startup_ms = (time.perf_counter() - start) * 1000
+        logger.info(
+            "MCP session started for user_id=%s — %d tools in %.1fms",
+            self.user_id, len(self.tools), self.startup_ms,
+        )
+
+    async def _run(self):
+        client = MultiServerMCPClient({MCP_SERVER_NAME: self._connection})
+        try:
+            async with client.session(MCP_SERVER_NAME) as session:
+                self.session = session
+                self.tools = await load_mcp_tools(session)
+                self._ready.set()
+                await self._stop.wait()
+        except Exception as e:
+            self._error = e
+            logger.warning("MCP session for user_id=%s terminated: %s", self.user_id, e)
+        finally:
+            self.session = None
+            self._ready.set()
+
+    @property
+    def alive(self) -> bool:
+        return self._task is not None and not self._task.done() and self.session is not None
+
+    async def ping(self) -> bool:
+        if not self.alive:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=MCP_PING_TIMEOUT_S)
+            return True
+        except Exception as e:
+            logger.warning("MCP ping failed for user_id=%s: %s", self.user_id, e)
+            return False
+
+    async def close(self):
+        self._stop.set()
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._task, timeout=10)
+        except Exception as e:
+            logger.warning("MCP session close failed for user_id=%s: %s", self.user_id, e)
+            self._task.cancel()
+
+
+class MCPSessionPool:
+    """Keeps one warm MCPSession per user and tracks how much spawning it saves."""
+
+    def __init__(self, idle_timeout_s: float = MCP_IDLE_TIMEOUT_S):
+        self.idle_timeout_s = idle_timeout_s
+        self._sessions: dict[str, MCPSession] = {}
+        # user_id -> [lock, tasks holding or waiting for it]; an entry goes once nobody needs it
+        self._locks: dict[str, list] = {}
+        # Sessions taken out of the pool while chat turns still held them
+        self._retired: list[MCPSession] = []
+        self._reaper: asyncio.Task | None = None
+        self.counters = {
+            "cold_starts": 0,
+            "warm_hits": 0,
+            "health_check_failures": 0,
+            "idle_evictions": 0,
+            "cold_start_ms_total": 0.0,
+            "saved_ms_total": 0.0,
+        }
+
+    @asynccontextmanager
+    async def _user_lock(self, user_id: str):
+        entry = self._locks.setdefault(user_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[user_id]
+
+    def _avg_cold_start_ms(self) -> float:
+        starts = self.counters["cold_starts"]
+        return self.counters["cold_start_ms_total"] / starts if starts else 0.0
+
+    async def acquire(self, user_id: str, connection: dict) -> list[BaseTool]:
+        """Return tools bound to the user's warm server, starting one if needed.
+
+        The session stays in use, and is never evicted as idle, until release(user_id, tools).
+        """
+        async with self._user_lock(user_id):
+            start = time.perf_counter()
+            session = self._sessions.get(user_id)
+            if session is not None:
+                if await session.ping():
+                    session.last_used = time.monotonic()
+                    session.in_use += 1
+                    saved_ms = max(self._avg_cold_start_ms() - (time.perf_counter() - start) * 1000, 0.0)
+                    self.counters["warm_hits"] += 1
+                    self.counters["saved_ms_total"] += saved_ms
+                    logger.debug(
+                        "Reusing warm MCP session for user_id=%s — saved ~%.1fms vs cold start",
+                        user_id, saved_ms,
+                    )
+                    return session.tools
+                self.counters["health_check_failures"] += 1
+                logger.info("MCP session for user_id=%s failed health check — restarting", user_id)
+                await self._close(user_id)
+
+            session = MCPSession(user_id, connection)
+            await session.start()
+            session.in_use += 1
+            self._sessions[user_id] = session
+            self.counters["cold_starts"] += 1
+            self.counters["cold_start_ms_total"] += session.startup_ms
+            return session.tools
+
+    async def _close(self, user_id: str):
+        session = self._sessions.pop(user_id, None)
+        if session is not None:
+            await session.close()
+
+    async def release(self, user_id: str, tools: list[BaseTool]):
+        """Mark the chat turn that acquired tools as finished; the idle clock starts now."""
+        session = self._sessions.get(user_id)
+        # A session restarted since tools were acquired has its own count
+        if session is not None and session.tools is tools:
+            session.in_use = max(session.in_use - 1, 0)
+            session.last_used = time.monotonic()
+            return
+        for session in self._retired:
+            if session.tools is tools:
+                session.in_use -= 1
+                if session.in_use <= 0:
+                    self._retired.remove(session)
+                    logger.info("Closing retired MCP session for user_id=%s after its last turn", user_id)
+                    await session.close()
+                return
+
+    async def close(self, user_id: str):
+        """Shut down the user's server, e.g. when their RAG instance is invalidated.
+
+        The next acquire starts a new server at once; turns still using the old
+        one keep it until they release it.
+        """
+        async with self._user_lock(user_id):
+            session = self._sessions.pop(user_id, None)
+            if session is None:
+                return
+            if session.in_use:
+                logger.info(
+                    "Retiring MCP session for user_id=%s — closing after %d turns in use finish", user_id, session.in_use,
+                )
+                self._retired.append(session)
+                return
+            logger.info("Closing MCP session for user_id=%s", user_id)
+            await session.close()
+
+    def _evictable(self, session: MCPSession, now: float) -> bool:
+        idle_s = now - session.last_used
+        return idle_s > self.idle_timeout_s and (not session.in_use or idle_s > MCP_MAX_TURN_S)
+
+    async def evict_idle(self):
+        # Retired sessions whose turns never released them
+        for session in [s for s in self._retired if time.monotonic() - s.last_used > MCP_MAX_TURN_S]:
+            self._retired.remove(session)
+            await session.close()
+        for user_id, session in list(self._sessions.items()):
+            if not self._evictable(session, time.monotonic()):
+                continue
+            # acquire holds this lock while it pings and hands out the session
+            async with self._user_lock(user_id):
+                session = self._sessions.get(user_id)
+                now = time.monotonic()
+                if session is None or not self._evictable(session, now):
+                    continue
+                logger.info(
+                    "Evicting idle MCP session for user_id=%s (idle %.0fs, %d turns in use)",
+                    user_id, now - session.last_used, session.in_use,
+                )
+                self.counters["idle_evictions"] += 1
+                await self._close(user_id)
+
+    async def _reap_forever(self, interval_s: float):
+        while True:
+            await asyncio.sleep(interval_s)
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                logger.warning("MCP idle eviction failed: %s", e, exc_info=True)
+
+    def start_reaper(self, interval_s: float = MCP_REAPER_INTERVAL_S):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_forever(interval_s))
+
+    async def close_all(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for user_id in list(self._sessions):
+            await self._close(user_id)
+        retired, self._retired = self._retired, []
+        for session in retired:
+            await session.close()
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "active_sessions": len(self._sessions),
+            "sessions_in_use": sum(1 for session in self._sessions.values() if session.in_use),
+            "retired_sessions": len(self._retired),
+            "avg_cold_start_ms": round(self._avg_cold_start_ms(), 1),
+        }
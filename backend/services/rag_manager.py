@@ -8,6 +8,7 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 from money_rag import MoneyRAG
+from backend.services.mcp_pool import MCPSessionPool
 
 logger = logging.getLogger("moneyrag.services.rag_manager")
 
@@ -17,6 +18,7 @@ class RAGManager:
 
     def __init__(self):
         self._instances: dict[str, MoneyRAG] = {}
+        self.mcp_pool = MCPSessionPool()
         logger.debug("RAGManager initialized — empty instance cache")
 
     async def get_or_create(self, user: dict, config: dict) -> MoneyRAG:
@@ -43,7 +45,20 @@ class RAGManager:
         logger.debug("Active RAG instances: %d", len(self._instances))
         return self._instances[user_id]
 
+    async def get_tools(self, user_id: str) -> list:
+        """Chat tools for the user: in-process functions, or their warm MCP server."""
+        rag = self._instances[user_id]
+        if rag.tool_transport == "inprocess":
+            return rag.inprocess_tools()
+        return await self.mcp_pool.acquire(user_id, rag.mcp_connection())
+
+    async def release_tools(self, user_id: str, tools: list):
+        """Hand back tools from get_tools once the chat turn using them is over."""
+        await self.mcp_pool.release(user_id, tools)
+
     async def invalidate(self, user_id: str):
+        # The warm server was spawned with the API key this instance exported
+        await self.mcp_pool.close(user_id)
         if user_id in self._instances:
             logger.info("Invalidating RAG instance for user_id=%s", user_id)
             try:
@@ -60,7 +75,24 @@ class RAGManager:
         logger.info("Cleaning up all RAG instances — %d active", len(self._instances))
         for uid in list(self._instances):
             await self.invalidate(uid)
+        await self.mcp_pool.close_all()
         logger.info("All RAG instances cleaned up")
 
+    def stats(self) -> dict:
+        agent = {"agent_builds": 0, "agent_reuses": 0, "agent_build_ms_total": 0.0}
+        for rag in self._instances.values():
+            for key in agent:
+                agent[key] += rag.perf_counters[key]
+        builds = agent["agent_builds"]
+        # Each reuse skips one create_agent() compile — estimate from the average build
+        avg_build_ms = agent["agent_build_ms_total"] / builds if builds else 0.0
+        agent["avg_agent_build_ms"] = round(avg_build_ms, 1)
+        agent["saved_ms_total"] = round(avg_build_ms * agent["agent_reuses"], 1)
+        return {
+            "active_instances": len(self._instances),
+            "agent": agent,
+            "mcp_sessions": self.mcp_pool.stats(),
+        }
+
 
 rag_manager = RAGManager()
@@ -1,17 +1,273 @@
+import asyncio
+import datetime as dt
+import hashlib
+import json
+import logging
 import os
+import threading
+import uuid
+import weakref
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Any, Optional
+from contextlib import contextmanager
+from dataclasses import astuple, dataclass
+from typing import Callable, Iterable, List, Dict, Any, Optional, Tuple
 
 from langchain_core.embeddings import Embeddings
 from backend.config import get_settings
+from backend.data_version import bump_data_version, get_data_version
+from backend.embeddings import with_embedding_cache
+from backend.keyword_index import KeywordIndex, KeywordIndexCache
+from backend import model_metadata
+from backend.model_metadata import (
+    collection_dimension, embedding_dimension, record_collection_dimension, record_embedding_dimension,
+)
+
+logger = logging.getLogger("moneyrag.vector_db")
+
+# Records fetched per Actian query when reading a user's vectors page by page
+ACTIAN_QUERY_PAGE = int(os.environ.get("ACTIAN_QUERY_PAGE", "1000"))
+# Ids fetched and deleted per round when purging a file's vectors from Actian
+VECTOR_DELETE_BATCH = int(os.environ.get("VECTOR_DELETE_BATCH", "1000"))
+QDRANT_SCROLL_PAGE = 1000
+QDRANT_UPSERT_BATCH = int(os.environ.get("QDRANT_UPSERT_BATCH", "256"))
+# Texts per embedding request (Gemini's batch limit is 100) and requests in flight during sync
+EMBED_CHUNK_SIZE = int(os.environ.get("EMBED_CHUNK_SIZE", "100"))
+EMBED_CONCURRENCY = int(os.environ.get("EMBED_CONCURRENCY", "4"))
+# QdrantVectorStore wrappers kept per embedding client (each one validates the collection when built)
+VECTOR_STORE_CACHE_SIZE = int(os.environ.get("VECTOR_STORE_CACHE_SIZE", "32"))
+# none | float16 | int8 for the local store and for Qdrant collections created from now on;
+# quantized searches rescore VECTOR_RESCORE_OVERSAMPLING * top_k candidates at full precision
+VECTOR_QUANTIZATION = os.environ.get("VECTOR_QUANTIZATION", "none").lower()
+VECTOR_RESCORE_OVERSAMPLING = float(os.environ.get("VECTOR_RESCORE_OVERSAMPLING", "4"))
+# Actian filters are pushed down for exact matches only; ranges are checked on this many times top_k results
+ACTIAN_FILTER_OVERSAMPLING = int(os.environ.get("ACTIAN_FILTER_OVERSAMPLING", "10"))
+VECTOR_TYPES = ("transaction", "line_item")
+# Hybrid search: keyword (BM25) and vector rankings fused by reciprocal rank, each cut to HYBRID_CANDIDATES
+HYBRID_SEARCH = os.environ.get("HYBRID_SEARCH", "true").lower() in ("1", "true", "yes")
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", "20"))
+HYBRID_RRF_K = 60
+
+
+@dataclass
+class SyncStats:
+    """Outcome of a delta sync: rows re-embedded, left as they were, and vectors removed."""
+    embedded: int = 0
+    skipped: int = 0
+    deleted: int = 0
+
+
+@dataclass
+class SearchFilters:
+    """
+    Optional narrowing of a semantic search, applied inside the vector DB where possible.
+
+    Dates are ISO 'YYYY-MM-DD' strings and every range is inclusive at both ends.
+    source_file_id matches vectors from an uploaded CSV or a bill with that id.
+    """
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    category: Optional[str] = None
+    vector_type: Optional[str] = None
+    source_file_id: Optional[str] = None
+
+    def __post_init__(self):
+        for name in ("date_from", "date_to"):
+            value = getattr(self, name)
+            if value:
+                setattr(self, name, dt.date.fromisoformat(value[:10]).isoformat())
+        if self.vector_type is not None and self.vector_type not in VECTOR_TYPES:
+            raise ValueError(f"vector_type must be one of {', '.join(VECTOR_TYPES)}, not '{self.vector_type}'")
+
+    def is_empty(self) -> bool:
+        return all(value in (None, "") for value in astuple(self))
+
+    def equalities(self) -> Dict[str, str]:
+        """Exact-match conditions as payload key -> value."""
+        return {key: value for key, value in (("category", self.category), ("vector_type", self.vector_type)) if value}
+
+    def only_equalities(self) -> bool:
+        """True when equalities() is the whole filter (no ranges or source file)."""
+        return not (self.date_from or self.date_to or self.source_file_id
+                    or self.min_amount is not None or self.max_amount is not None)
+
+    def matches(self, payload: Dict[str, Any]) -> bool:
+        """Whether a stored payload satisfies every condition."""
+        if any(payload.get(key) != value for key, value in self.equalities().items()):
+            return False
+        date = str(payload.get("transaction_date") or "")[:10]
+        if (self.date_from and not (date and date >= self.date_from)) or (self.date_to and not (date and date <= self.date_to)):
+            return False
+        amount = payload.get("amount")
+        if self.min_amount is not None and not (amount is not None and float(amount) >= self.min_amount):
+            return False
+        if self.max_amount is not None and not (amount is not None and float(amount) <= self.max_amount):
+            return False
+        if self.source_file_id and self.source_file_id not in (payload.get("source_csv_id"), payload.get("bill_file_id")):
+            return False
+        return True
+
+    def mask(self, column: Callable[..., np.ndarray]) -> np.ndarray:
+        """The same conditions over the local store's payload columns."""
+        mask = np.ones(len(column("user_id")), dtype=bool)
+        for key, value in self.equalities().items():
+            mask &= column(key) == value
+        if self.date_from or self.date_to:
+            dates = column("transaction_date").astype("U10")
+            mask &= dates != ""
+            if self.date_from:
+                mask &= dates >= self.date_from
+            if self.date_to:
+                mask &= dates <= self.date_to
+        # NaN (no amount) compares False, so such rows drop out of amount ranges
+        if self.min_amount is not None:
+            mask &= column("amount", numeric=True) >= self.min_amount
+        if self.max_amount is not None:
+            mask &= column("amount", numeric=True) <= self.max_amount
+        if self.source_file_id:
+            mask &= (column("source_csv_id") == self.source_file_id) | (column("bill_file_id") == self.source_file_id)
+        return mask
+
+
+class _ProgressPrinter:
+    """Default sync progress: a line per 10% rather than per chunk (of a total that grows as pages stream in)."""
+
+    def __init__(self):
+        self.last_done = 0
+
+    def __call__(self, done: int, total: int) -> None:
+        if done - self.last_done >= total / 10:
+            self.last_done = done
+            print(f"   🧠 Embedded {done}/{total} documents")
+
+
+def sync_hash(payload: Dict[str, Any]) -> str:
+    """Fingerprint of everything a vector stores (text + metadata); a change means re-embed."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _str_column(frame: pd.DataFrame, col: str, default: str = "") -> pd.Series:
+    """Column as strings with missing values (or a missing column) replaced by default."""
+    if col not in frame:
+        return pd.Series(default, index=frame.index, dtype=object)
+    values = frame[col]
+    return values.where(values.notna(), default).astype(str)
+
+
+def _records(frame: pd.DataFrame, optional: tuple = ()) -> List[Dict[str, Any]]:
+    """Row dicts, leaving out optional keys whose value is missing."""
+    # zip over column lists: DataFrame.to_dict boxes every cell individually and is several times slower
+    columns = list(frame.columns)
+    records = [dict(zip(columns, values)) for values in zip(*(frame[c].tolist() for c in columns))]
+    for c in optional:
+        if c in frame:
+            for i in np.flatnonzero(frame[c].isna().to_numpy()):
+                del records[i][c]
+    return records
+
+
+def build_sync_payloads(df: pd.DataFrame, details_df: pd.DataFrame, user_id: str) -> tuple[List[str], List[Dict], List[str]]:
+    """
+    Texts, payloads and ids for the user's transactions followed by their line items.
+
+    Built column-wise; line items get their parent's fields through one indexed
+    join instead of a frame scan per item.
+    """
+    # 1. Parent transaction payloads
+    merchant = _str_column(df, 'merchant_name')
+    merchant = merchant.where(merchant != "", _str_column(df, 'description'))
+    base_text = merchant + " (" + _str_column(df, 'category', 'Uncategorized') + ")"
+    enriched = _str_column(df, 'enriched_info')
+    tx_texts = base_text.where(enriched == "", base_text + " — " + enriched)
+
+    meta_cols = [
+        c for c in ('id', 'amount', 'category', 'merchant_name', 'description', 'source_csv_id', 'source_bill_file_id')
+        if c in df
+    ]
+    tx_meta = df[meta_cols].rename(columns={'source_bill_file_id': 'bill_file_id'})
+    tx_meta['user_id'] = user_id
+    tx_meta['transaction_date'] = _str_column(df, 'trans_date')
+    tx_meta['vector_type'] = 'transaction'
+    # For Actian compatibility, ensure we save the raw page_content in the payload
+    tx_meta['page_content'] = tx_texts
+    metadatas = _records(
+        tx_meta, optional=('id', 'amount', 'category', 'merchant_name', 'description', 'source_csv_id', 'bill_file_id')
+    )
+    texts = tx_texts.tolist()
+    vector_ids = df['id'].astype(str).tolist()
+
+    # 2. Line item payloads
+    if details_df.empty:
+        return texts, metadatas, vector_ids
+
+    parents = pd.DataFrame({
+        'p_merchant': merchant,
+        'p_category': df['category'] if 'category' in df else 'Uncategorized',
+        'p_date': _str_column(df, 'trans_date'),
+        'source_csv_id': df['source_csv_id'] if 'source_csv_id' in df else None,
+        'bill_file_id': df['source_bill_file_id'] if 'source_bill_file_id' in df else None,
+    }).set_axis(df['id'].astype(str)).loc[lambda p: ~p.index.duplicated()]
+    items = details_df.assign(transaction_id=details_df['transaction_id'].astype(str)).join(
+        parents, on='transaction_id', how='inner'
+    )
+
+    item_texts = (
+        "Line item from " + items['p_merchant'] + ": " + _str_column(items, 'item_description')
+        + " — " + _str_column(items, 'enriched_info')
+    )
+    price = items['item_total_price'] if 'item_total_price' in items else pd.Series(0.0, index=items.index)
+    item_meta = pd.DataFrame({
+        'id': items['transaction_id'],
+        'detail_id': items['id'].astype(str),
+        'amount': pd.to_numeric(price, errors='coerce').fillna(0).astype(float),
+        'category': items['p_category'],
+        'user_id': user_id,
+        'transaction_date': items['p_date'],
+        'vector_type': 'line_item',
+        'merchant_name': items['p_merchant'],
+        'source_csv_id': items['source_csv_id'],
+        'bill_file_id': items['bill_file_id'],
+        'page_content': item_texts,
+    })
+    texts += item_texts.tolist()
+    metadatas += _records(item_meta, optional=('source_csv_id', 'bill_file_id'))
+    vector_ids += item_meta['detail_id'].tolist()
+    return texts, metadatas, vector_ids
+
 
 class VectorDBClient:
-    """Abstract interface for Vector Database Operations."""
+    """
+    Abstract interface for Vector Database Operations.
+
+    Meant to live for the whole process (see get_vector_client): the connection,
+    the collection check / index setup and the LangChain store wrappers are all
+    paid for once and reused by every sync and search.
+    """
     
     def __init__(self):
         self.settings = get_settings()
         self.stack = self.settings.VECTOR_DB_STACK.lower()
         self.collection_name = "transactions"
+        self._verified_dim: Optional[int] = None
+        self._collection_known = False
+        if VECTOR_QUANTIZATION not in ("none", "float16", "int8"):
+            raise ValueError(f"VECTOR_QUANTIZATION must be none, float16 or int8, not '{VECTOR_QUANTIZATION}'")
+        self._actian_conn = None
+        self._lock = threading.Lock()
+        self._setup_lock = threading.Lock()
+        self._stores: Dict[int, tuple] = {}
+        self._keyword_indexes = KeywordIndexCache()
+        self.counters = {
+            "collection_checks": 0,
+            "collection_setups": 0,
+            "setup_skips": 0,
+            "store_builds": 0,
+            "store_reuses": 0,
+            "keyword_only_searches": 0,
+            "hybrid_searches": 0,
+        }
         
         if self.stack == "actian":
             try:
@@ -22,6 +278,11 @@ class VectorDBClient:
                 )
             except ImportError:
                 raise RuntimeError("Actian Cortex SDK ('actiancortex') is not installed.")
+        elif self.stack == "local":
+            from backend.local_vector_store import LocalVectorStore
+            self.local_store = LocalVectorStore(
+                quantization=VECTOR_QUANTIZATION, oversampling=VECTOR_RESCORE_OVERSAMPLING
+            )
         else:
             # Setup Qdrant
             from qdrant_client import QdrantClient
@@ -33,183 +294,894 @@ class VectorDBClient:
     def is_actian(self) -> bool:
         return self.stack == "actian"
 
-    def sync_transactions(self, df: pd.DataFrame, details_df: pd.DataFrame, user_id: str, embeddings_model: Embeddings) -> None:
+    def is_local(self) -> bool:
+        return self.stack == "local"
+
+    @contextmanager
+    def _actian(self):
+        """The Cortex connection, opened on first use and kept open until close()."""
+        with self._lock:
+            if self._actian_conn is None:
+                self._actian_conn = self.actian_client.__enter__()
+        yield self._actian_conn
+
+    def _has_collection(self) -> bool:
+        """Whether the collection exists; once it does, that is remembered rather than asked again."""
+        if self._collection_known:
+            return True
+        self.counters["collection_checks"] += 1
+        if self.is_actian():
+            with self._actian() as client:
+                exists = client.has_collection(self.collection_name)
+        elif self.is_local():
+            exists = self.local_store.dimension() is not None
+        else:
+            exists = self.qdrant_client.collection_exists(self.collection_name)
+        self._collection_known = exists
+        return exists
+
+    def _vector_store(self, embeddings_model: Embeddings):
+        """QdrantVectorStore for the embedding client, built once and reused across searches."""
+        from langchain_qdrant import QdrantVectorStore
+
+        key = id(getattr(embeddings_model, "base", embeddings_model))
+        with self._lock:
+            entry = self._stores.pop(key, None)
+            if entry is not None:
+                self._stores[key] = entry  # most recently used goes last
+                self.counters["store_reuses"] += 1
+                return entry[1]
+        store = QdrantVectorStore(client=self.qdrant_client, collection_name=self.collection_name, embedding=embeddings_model)
+        with self._lock:
+            # Keep the model referenced alongside its store so its id can't be reused by another client
+            self._stores[key] = (embeddings_model, store)
+            self.counters["store_builds"] += 1
+            while len(self._stores) > VECTOR_STORE_CACHE_SIZE:
+                self._stores.pop(next(iter(self._stores)))
+        return store
+
+    def stats(self) -> dict:
+        stats = {
+            "stack": self.stack,
+            "cached_stores": len(self._stores),
+            "keyword_indexes": self._keyword_indexes.stats(),
+            **self.counters,
+        }
+        if self.is_local():
+            stats["local"] = self.local_store.stats()
+        return stats
+
+    def close(self) -> None:
+        """Release the connection; the client must not be used afterwards."""
+        if self.is_actian():
+            with self._lock:
+                if self._actian_conn is not None:
+                    self.actian_client.__exit__(None, None, None)
+                    self._actian_conn = None
+        elif self.is_local():
+            self.local_store.close()
+        else:
+            self.qdrant_client.close()
+
+    def sync_transactions(self, df: pd.DataFrame, details_df: pd.DataFrame, user_id: str, embeddings_model: Embeddings) -> SyncStats:
+        """Blocking wrapper around sync_transactions_async for callers without an event loop."""
+        return asyncio.run(self.sync_transactions_async(df, details_df, user_id, embeddings_model))
+
+    async def sync_transactions_async(self, df: pd.DataFrame, details_df: pd.DataFrame, user_id: str,
+                                      embeddings_model: Embeddings,
+                                      progress: Optional[Callable[[int, int], None]] = None) -> SyncStats:
+        """
+        Bring the user's vectors in line with their transactions and line items.
+
+        Only rows whose text or metadata changed since the last sync (tracked by a
+        sync_hash stored in each payload) are embedded and upserted; vectors whose
+        row no longer exists are deleted. progress(done, total) is called after
+        each upserted chunk.
         """
-        Embed and ingest transactions and line items into the vector database.
-        Returns the initialized Langchain VectorStore (for Qdrant) or None (for Actian, which is managed directly).
+        return await self.sync_transaction_pages([(df, details_df)], user_id, embeddings_model, progress)
+
+    async def sync_transaction_pages(self, pages: Iterable[Tuple[pd.DataFrame, Optional[pd.DataFrame]]], user_id: str,
+                                     embeddings_model: Embeddings,
+                                     progress: Optional[Callable[[int, int], None]] = None) -> SyncStats:
         """
-        if df.empty:
+        sync_transactions_async over (transactions, line items) pages instead of whole frames.
+
+        Each page is diffed, embedded and upserted before the next one is used,
+        and the next page is fetched (in a worker thread, so pages may come from
+        blocking DB reads) while the current one embeds. Memory holds one page
+        plus the id -> sync_hash map of stored vectors, however long the history.
+        Line items must arrive in the same page as their transaction. A page's
+        line items are None when they could not be read: stored line-item
+        vectors are then kept rather than deleted as stale.
+        progress(done, total) counts changed rows seen so far.
+        """
+        embeddings_model = with_embedding_cache(embeddings_model)
+        cached_before = embeddings_model.counters['documents_cached']
+        existing, existing_items = await asyncio.to_thread(self._existing_hashes, user_id)
+        items_unread = False
+        seen = set()
+        stats = SyncStats()
+        report = progress or _ProgressPrinter()
+        rows = 0
+
+        pages = iter(pages)
+        next_page = asyncio.create_task(asyncio.to_thread(next, pages, None))
+        try:
+            while (page := await next_page) is not None:
+                next_page = asyncio.create_task(asyncio.to_thread(next, pages, None))
+                df, details_df = page
+                if details_df is None:
+                    items_unread = True
+                    details_df = pd.DataFrame()
+                if df.empty:
+                    continue
+                rows += len(df)
+                texts, metadatas, vector_ids = await asyncio.to_thread(build_sync_payloads, df, details_df, user_id)
+
+                # Diff against what is already stored
+                for meta in metadatas:
+                    meta['sync_hash'] = sync_hash(meta)
+                point_ids = [self._point_id(vid) for vid in vector_ids]
+                seen.update(point_ids)
+                changed = [i for i, pid in enumerate(point_ids) if existing.get(pid) != metadatas[i]['sync_hash']]
+                stats.skipped += len(texts) - len(changed)
+                if not changed:
+                    continue
+
+                if not stats.embedded:
+                    print(f"   🧠 Embedding changed documents into {self.stack}...")
+                # Known dimension: verify/create the collection before paying for any embedding.
+                # Unknown: _embed_and_upsert learns it from the first chunk, still before any upsert.
+                embedding_dim = embedding_dimension(embeddings_model)
+                if embedding_dim:
+                    await asyncio.to_thread(self._prepare_collection, embedding_dim)
+                done_before, total = stats.embedded, stats.embedded + len(changed)
+                stats.embedded = total
+                await self._embed_and_upsert(
+                    [texts[i] for i in changed], [metadatas[i] for i in changed], [vector_ids[i] for i in changed],
+                    embeddings_model, embedding_dim, lambda done, _: report(done_before + done, total),
+                )
+        finally:
+            next_page.cancel()
+
+        if not rows:
             raise ValueError("No transactions found in database for this user. Please upload files first.")
-            
-        sample_embedding = embeddings_model.embed_query("test")
-        embedding_dim = len(sample_embedding)
-        
-        texts = []
-        metadatas = []
-        vector_ids = []
-        
-        # 1. Build parent transaction payloads
-        for _, row in df.iterrows():
-            merchant = row.get('merchant_name', '') or row.get('description', '')
-            category = row.get('category', 'Uncategorized')
-            enriched = row.get('enriched_info', '')
-            base_text = f"{merchant} ({category})"
-            texts.append(f"{base_text} — {enriched}" if enriched else base_text)
-
-            meta_cols = ['id', 'amount', 'category', 'trans_date']
-            if 'merchant_name' in row: meta_cols.append('merchant_name')
-            if 'source_csv_id' in row: meta_cols.append('source_csv_id')
-                
-            meta = {k: row[k] for k in meta_cols if k in row and pd.notna(row[k])}
-            if 'source_bill_file_id' in row and pd.notna(row['source_bill_file_id']):
-                meta['bill_file_id'] = row['source_bill_file_id']
-                
-            meta['user_id'] = user_id
-            meta['transaction_date'] = str(meta.pop('trans_date'))
-            meta['vector_type'] = 'transaction'
-            # For Actian compatibility, ensure we save the raw page_content in the payload
-            meta['page_content'] = texts[-1] 
-            
-            metadatas.append(meta)
-            vector_ids.append(str(row['id']))
-
-        # 2. Build line item payloads
-        if not details_df.empty:
-            for _, d_row in details_df.iterrows():
-                parent_row = df[df['id'] == d_row['transaction_id']].iloc[0]
-                merchant = parent_row.get('merchant_name', parent_row.get('description', ''))
-                texts.append(f"Line item from {merchant}: {d_row['item_description']} — {d_row.get('enriched_info', '')}")
-                
-                meta = {
-                    'id': str(parent_row['id']),
-                    'detail_id': str(d_row['id']),
-                    'amount': float(d_row['item_total_price'] if pd.notna(d_row.get('item_total_price')) else 0),
-                    'category': parent_row.get('category', 'Uncategorized'),
-                    'user_id': user_id,
-                    'transaction_date': str(parent_row['trans_date']),
-                    'vector_type': 'line_item',
-                    'merchant_name': str(merchant)
-                }
-                if 'source_csv_id' in parent_row and pd.notna(parent_row['source_csv_id']):
-                    meta['source_csv_id'] = parent_row['source_csv_id']
-                if 'source_bill_file_id' in parent_row and pd.notna(parent_row['source_bill_file_id']):
-                    meta['bill_file_id'] = parent_row['source_bill_file_id']
-                    
-                meta['page_content'] = texts[-1]
-                metadatas.append(meta)
-                vector_ids.append(str(d_row['id']))
-
-        # Generate actual embeddings
-        print(f"   🧠 Embedding {len(texts)} documents into {self.stack}...")
-        vectors = embeddings_model.embed_documents(texts)
+        if stats.embedded:
+            cached = embeddings_model.counters['documents_cached'] - cached_before
+            print(f"   💾 {cached} of {stats.embedded} embeddings served from cache")
+
+        stale = set(existing) - seen
+        if items_unread:
+            stale -= existing_items
+        stale = list(stale)
+        stats.deleted = len(stale)
+        if stale:
+            await asyncio.to_thread(self._delete_points, stale, user_id)
+        if self.is_local() and (stats.embedded or stale):
+            await asyncio.to_thread(self.local_store.flush)
+        if stats.embedded or stale:
+            self._vectors_changed(user_id)
+
+        print(f"   🔁 Vector sync: {stats.embedded} embedded, {stats.skipped} unchanged, {stats.deleted} deleted")
+        logger.info("Vector sync for user_id=%s — %s", user_id, stats)
+        return stats
+
+    def _point_id(self, vector_id: str):
+        # Actian expects integer IDs, but our DB uses UUID strings.
+        # We map strings to integer IDs deterministically via hashing for Actian.
+        # Qdrant reports UUID ids in canonical form, so compare in that form too (the local store follows suit).
+        return int(uuid.UUID(vector_id).int >> 64) if self.is_actian() else str(uuid.UUID(vector_id))
 
+    def _existing_hashes(self, user_id: str) -> Tuple[Dict[Any, Optional[str]], set]:
+        """
+        point id -> sync_hash of every vector stored for the user (None for pre-delta
+        vectors), and the ids among them that are line items.
+        """
+        payloads = self._user_payloads(user_id, ["sync_hash", "vector_type"])
+        hashes = {pid: payload.get("sync_hash") for pid, payload in payloads.items()}
+        return hashes, {pid for pid, payload in payloads.items() if payload.get("vector_type") == "line_item"}
+
+    def _user_payloads(self, user_id: str, keys: Optional[List[str]] = None) -> Dict[Any, Dict[str, Any]]:
+        """
+        point id -> payload (the search result metadata) of every vector stored for the user.
+
+        keys limits the payload fields Qdrant sends back; the other stacks return them all.
+        """
         if self.is_actian():
-            self._sync_actian(vectors, metadatas, vector_ids, embedding_dim)
-            return None
-        else:
-            return self._sync_qdrant(texts, metadatas, vector_ids, embedding_dim, embeddings_model)
+            from cortex import Filter, Field
 
-    def _sync_actian(self, vectors: List[List[float]], metadatas: List[Dict], vector_ids: List[str], dim: int):
-        from cortex import DistanceMetric
-        import uuid
-        
-        with self.actian_client as client:
-            client.get_or_create_collection(
-                name=self.collection_name,
-                dimension=dim,
-                distance_metric=DistanceMetric.COSINE
+            if not self._has_collection():
+                return {}
+            f = Filter().must(Field("user_id").eq(user_id))
+            payloads = {}
+            offset = 0
+            previous = None
+            while True:
+                with self._actian() as client:
+                    records = client.query(self.collection_name, filter=f, limit=ACTIAN_QUERY_PAGE, offset=offset)
+                ids = [r.id for r in records]
+                if ids and ids == previous:
+                    raise RuntimeError("Actian returned the same page of vectors twice while reading past the first page")
+                payloads.update((r.id, r.payload or {}) for r in records)
+                if len(records) < ACTIAN_QUERY_PAGE:
+                    return payloads
+                previous = ids
+                offset += len(records)
+
+        if self.is_local():
+            return self.local_store.payloads(user_id)
+
+        from qdrant_client.http import models
+
+        if not self._has_collection():
+            return {}
+        q_filter = models.Filter(
+            must=[models.FieldCondition(key="metadata.user_id", match=models.MatchValue(value=user_id))]
+        )
+        payloads = {}
+        offset = None
+        while True:
+            points, offset = self.qdrant_client.scroll(
+                self.collection_name,
+                scroll_filter=q_filter,
+                limit=QDRANT_SCROLL_PAGE,
+                offset=offset,
+                with_payload=[f"metadata.{k}" for k in keys] if keys else ["metadata"],
+                with_vectors=False,
             )
-            
-            # Actian expects integer IDs, but our DB uses UUID strings.
-            # We map strings to integer IDs deterministically via hashing for Actian.
-            int_ids = [int(uuid.UUID(vid).int >> 64) for vid in vector_ids]
-            
-            client.batch_upsert(
+            for p in points:
+                payload = (p.payload or {}).get("metadata") or {}
+                if not keys:
+                    # As QdrantVectorStore reports them in search results
+                    payload = {**payload, "_id": p.id, "_collection_name": self.collection_name}
+                payloads[str(p.id)] = payload
+            if offset is None:
+                return payloads
+
+    def _delete_points(self, point_ids: list, user_id: str) -> None:
+        if self.is_actian():
+            with self._actian() as client:
+                client.batch_delete(self.collection_name, ids=point_ids)
+        elif self.is_local():
+            self.local_store.delete(user_id, point_ids)
+        else:
+            from qdrant_client.http import models
+            self.qdrant_client.delete(
                 collection_name=self.collection_name,
-                ids=int_ids,
-                vectors=vectors,
-                payloads=metadatas
+                points_selector=models.PointIdsList(points=point_ids),
             )
 
-    def _sync_qdrant(self, texts, metadatas, vector_ids, dim, embeddings_model):
+    def _collection_dimension(self) -> Optional[int]:
+        """Vector size of the existing collection; None if it doesn't exist (or was never recorded, on Actian)."""
+        if self.is_actian():
+            # Cortex doesn't report it through the APIs we use: check against what this host created or synced with
+            return collection_dimension(self._actian_collection_key())
+        if self.is_local():
+            return self.local_store.dimension()
+        if not self._has_collection():
+            return None
+        vectors = self.qdrant_client.get_collection(self.collection_name).config.params.vectors
+        return vectors.size if hasattr(vectors, "size") else None
+
+    def _actian_collection_key(self) -> str:
+        return f"actian:{self.settings.ACTIAN_ADDRESS}/{self.collection_name}"
+
+    def _prepare_collection(self, dim: int) -> None:
+        """
+        Ensure the collection exists and stores dim-sized vectors; fails before any upsert otherwise.
+
+        Runs once per process and dimension: later syncs skip straight to upserting.
+        """
+        with self._setup_lock:
+            if self._verified_dim == dim:
+                self.counters["setup_skips"] += 1
+                return
+            existing = self._collection_dimension()
+            if existing is not None and existing != dim:
+                raise ValueError(
+                    f"Vector collection '{self.collection_name}' stores {existing}-dimensional vectors, but the "
+                    f"embedding model produces {dim}-dimensional ones. Use the model the collection was built "
+                    f"with, or re-create the collection"
+                    + (f" and drop its entry from {model_metadata.MODEL_METADATA_PATH}." if self.is_actian() else ".")
+                )
+            self._ensure_collection(dim)
+            self._verified_dim = dim
+            self._collection_known = True
+            self.counters["collection_setups"] += 1
+
+    def _ensure_collection(self, dim: int) -> None:
+        """Create the collection (and Qdrant payload indexes) before the first upsert."""
+        if self.is_actian():
+            from cortex import DistanceMetric
+
+            with self._actian() as client:
+                client.get_or_create_collection(
+                    name=self.collection_name,
+                    dimension=dim,
+                    distance_metric=DistanceMetric.COSINE
+                )
+            record_collection_dimension(self._actian_collection_key(), dim)
+            return
+        if self.is_local():
+            self.local_store.create_collection(dim)
+            return
+
         from qdrant_client.http import models as qdrant_models
-        from langchain_qdrant import QdrantVectorStore
-        
-        if not self.qdrant_client.collection_exists(self.collection_name):
+
+        if not self._has_collection():
+            vectors_config = qdrant_models.VectorParams(size=dim, distance=qdrant_models.Distance.COSINE)
+            quantization_config = None
+            if VECTOR_QUANTIZATION == "int8":
+                # Quantized vectors in RAM for the search, originals kept on disk for rescoring
+                vectors_config.on_disk = True
+                quantization_config = qdrant_models.ScalarQuantization(
+                    scalar=qdrant_models.ScalarQuantizationConfig(
+                        type=qdrant_models.ScalarType.INT8, quantile=0.99, always_ram=True
+                    )
+                )
+            elif VECTOR_QUANTIZATION == "float16":
+                # Qdrant has no float16 quantization; storing float16 halves the collection with no copy to rescore from
+                vectors_config.datatype = qdrant_models.Datatype.FLOAT16
             self.qdrant_client.create_collection(
                 collection_name=self.collection_name,
-                vectors_config=qdrant_models.VectorParams(size=dim, distance=qdrant_models.Distance.COSINE),
+                vectors_config=vectors_config,
+                quantization_config=quantization_config,
             )
-            
-        self.qdrant_client.create_payload_index(self.collection_name, "metadata.user_id", qdrant_models.PayloadSchemaType.KEYWORD)
-        self.qdrant_client.create_payload_index(self.collection_name, "metadata.source_csv_id", qdrant_models.PayloadSchemaType.KEYWORD)
-        self.qdrant_client.create_payload_index(self.collection_name, "metadata.bill_file_id", qdrant_models.PayloadSchemaType.KEYWORD)
-        
-        vs = QdrantVectorStore(client=self.qdrant_client, collection_name=self.collection_name, embedding=embeddings_model)
-        vs.add_texts(texts=texts, metadatas=metadatas, ids=vector_ids)
-        return vs
 
-    def semantic_search(self, query: str, user_id: str, top_k: int = 5, embeddings_model: Optional[Embeddings] = None) -> List[Dict]:
-        """Search the vector database, returning a list of dicts with 'page_content' and 'metadata'."""
+        # Every field semantic_search can filter on (existing collections pick up new ones on their next sync)
+        for field_name, schema in (
+            ("metadata.user_id", qdrant_models.PayloadSchemaType.KEYWORD),
+            ("metadata.source_csv_id", qdrant_models.PayloadSchemaType.KEYWORD),
+            ("metadata.bill_file_id", qdrant_models.PayloadSchemaType.KEYWORD),
+            ("metadata.category", qdrant_models.PayloadSchemaType.KEYWORD),
+            ("metadata.vector_type", qdrant_models.PayloadSchemaType.KEYWORD),
+            ("metadata.amount", qdrant_models.PayloadSchemaType.FLOAT),
+            ("metadata.transaction_date", qdrant_models.PayloadSchemaType.DATETIME),
+        ):
+            self.qdrant_client.create_payload_index(self.collection_name, field_name, schema)
+
+    def _upsert(self, vectors: List[List[float]], texts: List[str], metadatas: List[Dict], vector_ids: List[str]) -> None:
         if self.is_actian():
-            if not embeddings_model:
-                raise ValueError("Actian search requires passing the embeddings_model to generated query vectors.")
-            
-            query_vector = embeddings_model.embed_query(query)
-            from cortex import Filter, Field
-            
-            f = Filter().must(Field("user_id").eq(user_id))
-            
-            with self.actian_client as client:
-                if not client.has_collection(self.collection_name):
-                    return []
-                results = client.search(
+            with self._actian() as client:
+                client.batch_upsert(
                     collection_name=self.collection_name,
-                    query=query_vector,
-                    top_k=top_k,
-                    filter=f,
-                    with_payload=True
+                    ids=[self._point_id(vid) for vid in vector_ids],
+                    vectors=vectors,
+                    payloads=metadatas
                 )
-            
-            return [{"page_content": r.payload.get("page_content", ""), "metadata": r.payload} for r in results]
-            
-        else:
-            from qdrant_client.http import models
-            from langchain_qdrant import QdrantVectorStore
-            
-            q_filter = models.Filter(
-                must=[models.FieldCondition(key="metadata.user_id", match=models.MatchValue(value=user_id))]
+            return
+        if self.is_local():
+            self.local_store.upsert([self._point_id(vid) for vid in vector_ids], vectors, metadatas)
+            return
+
+        from qdrant_client.http import models as qdrant_models
+
+        # Upsert the vectors we already computed, in the payload layout QdrantVectorStore
+        # reads back ({"page_content", "metadata"}); add_texts would embed everything again.
+        for start in range(0, len(vector_ids), QDRANT_UPSERT_BATCH):
+            end = start + QDRANT_UPSERT_BATCH
+            self.qdrant_client.upsert(
+                collection_name=self.collection_name,
+                points=[
+                    qdrant_models.PointStruct(
+                        id=self._point_id(vid),
+                        vector=vector,
+                        payload={"page_content": text, "metadata": meta},
+                    )
+                    for vid, vector, text, meta in zip(vector_ids[start:end], vectors[start:end], texts[start:end], metadatas[start:end])
+                ],
             )
-            
-            vs = QdrantVectorStore(client=self.qdrant_client, collection_name=self.collection_name, embedding=embeddings_model)
-            results = vs.similarity_search(query, k=top_k, filter=q_filter)
-            return [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in results]
 
-    def delete_file_vectors(self, file_id: str, file_type: str) -> None:
-        """Deletes all vectors originating from a specific file."""
+    async def _embed_and_upsert(self, texts: List[str], metadatas: List[Dict], vector_ids: List[str],
+                                embeddings_model: Embeddings, prepared_dim: Optional[int] = None,
+                                progress: Optional[Callable[[int, int], None]] = None) -> None:
+        """
+        Embed texts in EMBED_CHUNK_SIZE chunks, EMBED_CONCURRENCY at a time, upserting each chunk as soon as it is ready.
+
+        Only the chunks in flight hold vectors, so memory stays bounded however
+        many rows changed. Upserts run in a worker thread, one at a time.
+        """
+        total = len(texts)
+        starts = iter(range(0, total, EMBED_CHUNK_SIZE))
+        upsert_lock = asyncio.Lock()
+        report = progress or _ProgressPrinter()
+        done = 0
+
+        async def worker():
+            nonlocal done, prepared_dim
+            for start in starts:
+                end = start + EMBED_CHUNK_SIZE
+                vectors = await embeddings_model.aembed_documents(texts[start:end])
+                async with upsert_lock:
+                    if vectors and len(vectors[0]) != prepared_dim:
+                        # First sight of this model, or the registry was wrong: learn, then check the collection
+                        record_embedding_dimension(embeddings_model, len(vectors[0]))
+                        await asyncio.to_thread(self._prepare_collection, len(vectors[0]))
+                        prepared_dim = len(vectors[0])
+                    await asyncio.to_thread(self._upsert, vectors, texts[start:end], metadatas[start:end], vector_ids[start:end])
+                    done += len(vectors)
+                    report(done, total)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(EMBED_CONCURRENCY, -(-total // EMBED_CHUNK_SIZE)))]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            # Don't keep paying for embeddings once one chunk has failed
+            for task in workers:
+                task.cancel()
+            raise
+
+    def semantic_search(self, query: str, user_id: str, top_k: int = 5, embeddings_model: Optional[Embeddings] = None,
+                        filters: Optional[SearchFilters] = None, hybrid: Optional[bool] = None) -> List[Dict]:
+        """
+        Search the vector database, returning a list of dicts with 'page_content' and 'metadata'.
+
+        filters narrows the search to matching vectors before the top_k are taken.
+        hybrid (default HYBRID_SEARCH) also searches the user's keyword index and
+        fuses both rankings; if the best top_k keyword hits all contain every
+        query token (an exact merchant lookup), they are returned without
+        embedding the query at all.
+        """
+        embeddings_model, filters = self._search_args(embeddings_model, filters)
+        keyword = self._keyword_hits(query, user_id, top_k, filters) if self._hybrid(hybrid) else []
+        exact = self._exact_hits(keyword, top_k)
+        if exact is not None:
+            return exact
+        depth = max(top_k, HYBRID_CANDIDATES) if keyword else top_k
+        return self._fuse(self._vector_search(query, user_id, depth, embeddings_model, filters), keyword, top_k)
+
+    def _vector_search(self, query: str, user_id: str, top_k: int, embeddings_model: Embeddings,
+                       filters: Optional[SearchFilters]) -> List[Dict]:
+        if self.is_actian() or self.is_local():
+            return self._search_vector(embeddings_model.embed_query(query), user_id, top_k, filters)
+
+        if not self._has_collection():
+            return []
+        results = self._vector_store(embeddings_model).similarity_search(
+            query, k=top_k, filter=self._qdrant_filter(user_id, filters), search_params=self._qdrant_search_params()
+        )
+        return [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in results]
+
+    def semantic_search_many(self, queries: List[str], user_id: str, top_k: int = 5,
+                             embeddings_model: Optional[Embeddings] = None, filters: Optional[SearchFilters] = None,
+                             hybrid: Optional[bool] = None) -> List[List[Dict]]:
+        """
+        semantic_search for several queries, returning one result list per query.
+
+        Queries the keyword index answers alone are not embedded; the others are
+        embedded in one embed_documents call and searched in one batch (Qdrant's
+        query_batch_points, the local store's search_many; Cortex has no batch
+        search, so there they run one after another on the shared connection).
+        """
+        embeddings_model, filters = self._search_args(embeddings_model, filters)
+        results, keyword = self._keyword_pass(queries, user_id, top_k, filters, hybrid)
+        pending = [i for i, found in enumerate(results) if found is None]
+        if pending:
+            if embeddings_model is None:
+                raise ValueError("semantic_search_many requires the embeddings_model to generate query vectors.")
+            query_vectors = embeddings_model.embed_queries([queries[i] for i in pending])
+            depth = max(top_k, HYBRID_CANDIDATES) if any(keyword[i] for i in pending) else top_k
+            for i, found in zip(pending, self._search_vectors(query_vectors, user_id, depth, filters)):
+                results[i] = self._fuse(found, keyword[i], top_k)
+        return results
+
+    def _keyword_pass(self, queries: List[str], user_id: str, top_k: int, filters: Optional[SearchFilters],
+                      hybrid: Optional[bool]) -> Tuple[List[Optional[List[Dict]]], List[List[Tuple[Dict, bool]]]]:
+        """Per query: the results if keyword hits alone answer it (else None), and its keyword hits."""
+        if not self._hybrid(hybrid):
+            return [None] * len(queries), [[] for _ in queries]
+        keyword = [self._keyword_hits(query, user_id, top_k, filters) for query in queries]
+        return [self._exact_hits(hits, top_k) for hits in keyword], keyword
+
+    def _search_vectors(self, query_vectors: List[List[float]], user_id: str, top_k: int,
+                        filters: Optional[SearchFilters]) -> List[List[Dict]]:
+        """Results per already embedded query, searched as one batch where the stack allows (blocking)."""
+        if self.is_local():
+            found = self.local_store.search_many(user_id, query_vectors, top_k, where=filters.mask if filters else None)
+            return [[{"page_content": payload.get("page_content", ""), "metadata": payload} for _, payload in results]
+                    for results in found]
+        if self.is_actian():
+            return [self._search_vector(vector, user_id, top_k, filters) for vector in query_vectors]
+
+        if not self._has_collection():
+            return [[] for _ in query_vectors]
+        responses = self.qdrant_client.query_batch_points(
+            self.collection_name, requests=self._qdrant_requests(query_vectors, user_id, top_k, filters)
+        )
+        return [[self._qdrant_result(point) for point in response.points] for response in responses]
+
+    def _qdrant_requests(self, query_vectors: List[List[float]], user_id: str, top_k: int,
+                         filters: Optional[SearchFilters]) -> list:
+        from qdrant_client.http import models
+
+        q_filter = self._qdrant_filter(user_id, filters)
+        search_params = self._qdrant_search_params()
+        return [
+            models.QueryRequest(query=vector, filter=q_filter, params=search_params, limit=top_k, with_payload=True)
+            for vector in query_vectors
+        ]
+
+    def _qdrant_result(self, point) -> Dict:
+        """The result QdrantVectorStore would have built from a scored point."""
+        return {
+            "page_content": point.payload.get("page_content", ""),
+            "metadata": {**(point.payload.get("metadata") or {}), "_id": point.id, "_collection_name": self.collection_name},
+        }
+
+    @staticmethod
+    def _hybrid(hybrid: Optional[bool]) -> bool:
+        return HYBRID_SEARCH if hybrid is None else hybrid
+
+    def _keyword_hits(self, query: str, user_id: str, top_k: int,
+                      filters: Optional[SearchFilters]) -> List[Tuple[Dict, bool]]:
+        """(result, contains every query token) for the user's best keyword matches (blocking)."""
+        index = self._keyword_indexes.get(
+            user_id, get_data_version(user_id), lambda: KeywordIndex(list(self._user_payloads(user_id).values()))
+        )
+        hits = index.search(query, max(top_k, HYBRID_CANDIDATES), where=filters.matches if filters else None)
+        return [
+            ({"page_content": index.payloads[doc].get("page_content", ""), "metadata": index.payloads[doc]}, exact)
+            for doc, _, exact in hits
+        ]
+
+    def _exact_hits(self, keyword: List[Tuple[Dict, bool]], top_k: int) -> Optional[List[Dict]]:
+        """The keyword results, if they alone answer the search."""
+        if len(keyword) < top_k or not all(exact for _, exact in keyword[:top_k]):
+            return None
+        self.counters["keyword_only_searches"] += 1
+        return [result for result, _ in keyword[:top_k]]
+
+    def _fuse(self, vector: List[Dict], keyword: List[Tuple[Dict, bool]], top_k: int) -> List[Dict]:
+        """Reciprocal rank fusion of the vector and keyword rankings (just the vector results without keyword hits)."""
+        if not keyword:
+            return vector[:top_k]
+        self.counters["hybrid_searches"] += 1
+        scores: Dict[tuple, float] = {}
+        results: Dict[tuple, Dict] = {}
+        for ranking in (vector, [result for result, _ in keyword]):
+            for rank, result in enumerate(ranking):
+                meta = result["metadata"]
+                key = (meta.get("vector_type"), str(meta.get("detail_id") or meta.get("id")))
+                scores[key] = scores.get(key, 0.0) + 1.0 / (HYBRID_RRF_K + rank + 1)
+                results.setdefault(key, result)
+        return [results[key] for key in sorted(scores, key=scores.get, reverse=True)[:top_k]]
+
+    def _search_args(self, embeddings_model: Optional[Embeddings], filters: Optional[SearchFilters]):
+        """Validate and normalise semantic_search's arguments (shared with AsyncVectorDBClient)."""
+        if embeddings_model is not None:
+            embeddings_model = with_embedding_cache(embeddings_model)
+        elif self.is_actian():
+            raise ValueError("Actian search requires passing the embeddings_model to generated query vectors.")
+        elif self.is_local():
+            raise ValueError("Local search requires passing the embeddings_model to generate query vectors.")
+        if filters is not None and filters.is_empty():
+            filters = None
+        return embeddings_model, filters
+
+    def _search_vector(self, query_vector: List[float], user_id: str, top_k: int,
+                       filters: Optional[SearchFilters]) -> List[Dict]:
+        """Actian / local search for an already embedded query (blocking)."""
+        if self.is_local():
+            results = self.local_store.search(user_id, query_vector, top_k, where=filters.mask if filters else None)
+            return [{"page_content": payload.get("page_content", ""), "metadata": payload} for _, payload in results]
+
+        from cortex import Filter, Field
+
+        f = Filter().must(Field("user_id").eq(user_id))
+        limit = top_k
+        if filters:
+            for key, value in filters.equalities().items():
+                f = f.must(Field(key).eq(value))
+            if not filters.only_equalities():
+                limit = top_k * ACTIAN_FILTER_OVERSAMPLING
+
+        if not self._has_collection():
+            return []
+        with self._actian() as client:
+            results = client.search(
+                collection_name=self.collection_name,
+                query=query_vector,
+                top_k=limit,
+                filter=f,
+                with_payload=True
+            )
+        if filters:
+            results = [r for r in results if filters.matches(r.payload)][:top_k]
+
+        return [{"page_content": r.payload.get("page_content", ""), "metadata": r.payload} for r in results]
+
+    @staticmethod
+    def _qdrant_search_params():
+        """With int8 vectors, rescore an oversampled shortlist against the full-precision originals."""
+        from qdrant_client.http import models
+
+        if VECTOR_QUANTIZATION != "int8":
+            return None
+        return models.SearchParams(
+            quantization=models.QuantizationSearchParams(rescore=True, oversampling=VECTOR_RESCORE_OVERSAMPLING)
+        )
+
+    @staticmethod
+    def _qdrant_filter(user_id: str, filters: Optional[SearchFilters]):
+        from qdrant_client.http import models
+
+        must = [models.FieldCondition(key="metadata.user_id", match=models.MatchValue(value=user_id))]
+        if filters:
+            for key, value in filters.equalities().items():
+                must.append(models.FieldCondition(key=f"metadata.{key}", match=models.MatchValue(value=value)))
+            if filters.min_amount is not None or filters.max_amount is not None:
+                must.append(models.FieldCondition(
+                    key="metadata.amount", range=models.Range(gte=filters.min_amount, lte=filters.max_amount)
+                ))
+            if filters.date_from or filters.date_to:
+                # Stored dates may carry a time of day, so the inclusive end is "before the next day"
+                date_to = filters.date_to and dt.date.fromisoformat(filters.date_to) + dt.timedelta(days=1)
+                must.append(models.FieldCondition(
+                    key="metadata.transaction_date",
+                    range=models.DatetimeRange(gte=filters.date_from or None, lt=date_to or None),
+                ))
+            if filters.source_file_id:
+                must.append(models.Filter(should=[
+                    models.FieldCondition(key=f"metadata.{key}", match=models.MatchValue(value=filters.source_file_id))
+                    for key in ("source_csv_id", "bill_file_id")
+                ]))
+        return models.Filter(must=must)
+
+    @staticmethod
+    def _qdrant_file_filter(filter_key: str, file_id: str, user_id: Optional[str]):
+        from qdrant_client.http import models
+
+        must = [models.FieldCondition(key=f"metadata.{filter_key}", match=models.MatchValue(value=file_id))]
+        if user_id is not None:
+            must.append(models.FieldCondition(key="metadata.user_id", match=models.MatchValue(value=user_id)))
+        return models.Filter(must=must)
+
+    def delete_file_vectors(self, file_id: str, file_type: str, user_id: Optional[str] = None) -> int:
+        """
+        Deletes all vectors originating from a specific file; returns how many were removed.
+
+        Passing user_id restricts the delete to that user's vectors (and lets the
+        local store skip every other tenant).
+        """
+        filter_key = "source_csv_id" if file_type == 'csv' else "bill_file_id"
         if self.is_actian():
             from cortex import Filter, Field
-            filter_key = "source_csv_id" if file_type == 'csv' else "bill_file_id"
             f = Filter().must(Field(filter_key).eq(file_id))
+            if user_id is not None:
+                f = f.must(Field("user_id").eq(user_id))
             
-            with self.actian_client as client:
-                if not client.has_collection(self.collection_name): return
-                
-                # Actian batch_delete requires IDs, so we query to find matching IDs first
-                records = client.query(self.collection_name, filter=f, limit=10000)
-                ids_to_delete = [r.id for r in records]
-                
-                if ids_to_delete:
+            if not self._has_collection(): return 0
+            deleted = 0
+            previous = None
+            while True:
+                # Actian batch_delete requires IDs and query has no cursor: take a bounded batch of
+                # what still matches and delete it, until nothing does
+                with self._actian() as client:
+                    records = client.query(self.collection_name, filter=f, limit=VECTOR_DELETE_BATCH)
+                    ids_to_delete = [r.id for r in records]
+                    if not ids_to_delete:
+                        break
+                    if ids_to_delete == previous:
+                        raise RuntimeError(f"Actian still returns vectors of file {file_id} after deleting them")
                     client.batch_delete(self.collection_name, ids=ids_to_delete)
+                previous = ids_to_delete
+                deleted += len(ids_to_delete)
+                if len(ids_to_delete) < VECTOR_DELETE_BATCH:
+                    break
+        elif self.is_local():
+            deleted = self.local_store.delete_where(filter_key, file_id, user_id)
+            self.local_store.flush()
         else:
-            filter_key = "metadata.source_csv_id" if file_type == 'csv' else "metadata.bill_file_id"
-            from qdrant_client.http import models
-            self.qdrant_client.delete(
-                collection_name=self.collection_name,
-                points_selector=models.Filter(
-                    must=[models.FieldCondition(key=filter_key, match=models.MatchValue(value=file_id))]
-                )
+            if not self._has_collection(): return 0
+            q_filter = self._qdrant_file_filter(filter_key, file_id, user_id)
+            # Delete-by-filter runs entirely server-side; the count is only for reporting
+            deleted = self.qdrant_client.count(self.collection_name, count_filter=q_filter, exact=True).count
+            if deleted:
+                self.qdrant_client.delete(collection_name=self.collection_name, points_selector=q_filter, wait=True)
+        logger.info("Deleted %d vectors of %s file %s", deleted, file_type, file_id)
+        if deleted:
+            self._vectors_changed(user_id)
+        return deleted
+
+    def _vectors_changed(self, user_id: Optional[str]) -> None:
+        """Retire keyword indexes built from the old vectors, here and in other processes."""
+        if user_id is None:
+            self._keyword_indexes.clear()
+        else:
+            # The data version was bumped when the rows changed, but possibly before this
+            # sync / delete finished: an index built in between must not outlive it
+            bump_data_version(user_id)
+
+class AsyncVectorDBClient:
+    """
+    VectorDBClient for coroutines: the same search / delete / sync methods,
+    awaited without blocking the event loop.
+
+    Wraps a VectorDBClient and shares its collection state. On Qdrant, searches
+    and deletes go through an AsyncQdrantClient and query vectors through
+    aembed_query; Cortex and the local store have no async API, so their calls
+    run in a worker thread. The async HTTP connections belong to the loop that
+    opened them, hence one instance per event loop (see get_async_vector_client).
+    """
+
+    def __init__(self, client: VectorDBClient):
+        self.client = client
+        self.stack = client.stack
+        self.collection_name = client.collection_name
+        self.counters = {"native_calls": 0, "thread_calls": 0}
+        if not (client.is_actian() or client.is_local()):
+            from qdrant_client import AsyncQdrantClient
+            self.qdrant_client = AsyncQdrantClient(
+                url=client.settings.QDRANT_URL,
+                api_key=client.settings.QDRANT_API_KEY
+            )
+
+    def _uses_threads(self) -> bool:
+        return self.client.is_actian() or self.client.is_local()
+
+    async def _offload(self, fn, *args):
+        self.counters["thread_calls"] += 1
+        return await asyncio.to_thread(fn, *args)
+
+    async def _has_collection(self) -> bool:
+        client = self.client
+        if client._collection_known:
+            return True
+        client.counters["collection_checks"] += 1
+        exists = await self.qdrant_client.collection_exists(self.collection_name)
+        client._collection_known = exists
+        return exists
+
+    async def sync_transactions_async(self, df: pd.DataFrame, details_df: pd.DataFrame, user_id: str,
+                                      embeddings_model: Embeddings,
+                                      progress: Optional[Callable[[int, int], None]] = None) -> SyncStats:
+        return await self.client.sync_transactions_async(df, details_df, user_id, embeddings_model, progress)
+
+    async def sync_transaction_pages(self, pages: Iterable[Tuple[pd.DataFrame, Optional[pd.DataFrame]]], user_id: str,
+                                     embeddings_model: Embeddings,
+                                     progress: Optional[Callable[[int, int], None]] = None) -> SyncStats:
+        # Already async: blocking steps of a sync run in threads
+        return await self.client.sync_transaction_pages(pages, user_id, embeddings_model, progress)
+
+    async def semantic_search(self, query: str, user_id: str, top_k: int = 5,
+                              embeddings_model: Optional[Embeddings] = None,
+                              filters: Optional[SearchFilters] = None, hybrid: Optional[bool] = None) -> List[Dict]:
+        """See VectorDBClient.semantic_search."""
+        client = self.client
+        embeddings_model, filters = client._search_args(embeddings_model, filters)
+        keyword = []
+        if client._hybrid(hybrid):
+            keyword = await self._offload(client._keyword_hits, query, user_id, top_k, filters)
+        exact = client._exact_hits(keyword, top_k)
+        if exact is not None:
+            return exact
+        depth = max(top_k, HYBRID_CANDIDATES) if keyword else top_k
+        return client._fuse(await self._vector_search(query, user_id, depth, embeddings_model, filters), keyword, top_k)
+
+    async def _vector_search(self, query: str, user_id: str, top_k: int, embeddings_model: Embeddings,
+                             filters: Optional[SearchFilters]) -> List[Dict]:
+        if self._uses_threads():
+            query_vector = await embeddings_model.aembed_query(query)
+            return await self._offload(self.client._search_vector, query_vector, user_id, top_k, filters)
+
+        self.counters["native_calls"] += 1
+        if not await self._has_collection():
+            return []
+        response = await self.qdrant_client.query_points(
+            self.collection_name,
+            query=await embeddings_model.aembed_query(query),
+            query_filter=self.client._qdrant_filter(user_id, filters),
+            search_params=self.client._qdrant_search_params(),
+            limit=top_k,
+            with_payload=True,
+        )
+        return [self.client._qdrant_result(point) for point in response.points]
+
+    async def semantic_search_many(self, queries: List[str], user_id: str, top_k: int = 5,
+                                   embeddings_model: Optional[Embeddings] = None,
+                                   filters: Optional[SearchFilters] = None,
+                                   hybrid: Optional[bool] = None) -> List[List[Dict]]:
+        """See VectorDBClient.semantic_search_many."""
+        client = self.client
+        embeddings_model, filters = client._search_args(embeddings_model, filters)
+        results, keyword = await self._offload(client._keyword_pass, queries, user_id, top_k, filters, hybrid)
+        pending = [i for i, found in enumerate(results) if found is None]
+        if not pending:
+            return results
+        if embeddings_model is None:
+            raise ValueError("semantic_search_many requires the embeddings_model to generate query vectors.")
+        query_vectors = await embeddings_model.aembed_queries([queries[i] for i in pending])
+        depth = max(top_k, HYBRID_CANDIDATES) if any(keyword[i] for i in pending) else top_k
+        if self._uses_threads():
+            found = await self._offload(client._search_vectors, query_vectors, user_id, depth, filters)
+        elif not await self._has_collection():
+            found = [[] for _ in pending]
+        else:
+            self.counters["native_calls"] += 1
+            responses = await self.qdrant_client.query_batch_points(
+                self.collection_name, requests=client._qdrant_requests(query_vectors, user_id, depth, filters)
             )
+            found = [[client._qdrant_result(point) for point in response.points] for response in responses]
+        for i, hits in zip(pending, found):
+            results[i] = client._fuse(hits, keyword[i], top_k)
+        return results
+
+    async def delete_file_vectors(self, file_id: str, file_type: str, user_id: Optional[str] = None) -> int:
+        """See VectorDBClient.delete_file_vectors."""
+        if self._uses_threads():
+            return await self._offload(self.client.delete_file_vectors, file_id, file_type, user_id)
+
+        self.counters["native_calls"] += 1
+        if not await self._has_collection():
+            return 0
+        filter_key = "source_csv_id" if file_type == 'csv' else "bill_file_id"
+        q_filter = self.client._qdrant_file_filter(filter_key, file_id, user_id)
+        deleted = (await self.qdrant_client.count(self.collection_name, count_filter=q_filter, exact=True)).count
+        if deleted:
+            await self.qdrant_client.delete(collection_name=self.collection_name, points_selector=q_filter, wait=True)
+        logger.info("Deleted %d vectors of %s file %s", deleted, file_type, file_id)
+        if deleted:
+            self.client._vectors_changed(user_id)
+        return deleted
+
+    def stats(self) -> dict:
+        return {"stack": self.stack, **self.counters}
+
+    async def close(self) -> None:
+        """Close the async connections; the wrapped VectorDBClient stays open."""
+        if not self._uses_threads():
+            await self.qdrant_client.close()
+
+
+_client: Optional[VectorDBClient] = None
+_client_lock = threading.Lock()
+_client_counters = {"clients_created": 0, "client_reuses": 0}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncVectorDBClient]" = weakref.WeakKeyDictionary()
+
 
 def get_vector_client() -> VectorDBClient:
-    return VectorDBClient()
+    """The process-wide client, created on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = VectorDBClient()
+            _client_counters["clients_created"] += 1
+            logger.info("Vector DB client created (stack=%s)", _client.stack)
+        else:
+            _client_counters["client_reuses"] += 1
+        return _client
+
+
+def close_vector_client() -> None:
+    """Close the shared client; the next get_vector_client() call opens a new one."""
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+
+def get_async_vector_client() -> AsyncVectorDBClient:
+    """The running event loop's async client, wrapping the process-wide client."""
+    loop = asyncio.get_running_loop()
+    client = get_vector_client()
+    async_client = _async_clients.get(loop)
+    if async_client is None or async_client.client is not client:
+        # First use on this loop, or the shared client was closed and replaced since
+        async_client = _async_clients[loop] = AsyncVectorDBClient(client)
+    return async_client
+
+
+async def close_async_vector_client() -> None:
+    """Close the running event loop's async client, if it has one."""
+    async_client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if async_client is not None:
+        await async_client.close()
+
+
+def vector_client_stats() -> dict:
+    return {
+        **_client_counters,
+        "client": _client.stats() if _client else None,
+        "async_clients": [c.stats() for c in list(_async_clients.values())],
+    }
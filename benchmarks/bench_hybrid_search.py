@@ -0,0 +1,125 @@
+"""
+Hybrid (keyword + vector) against pure vector semantic search.
+
+Syncs a synthetic history with real-looking merchant names into an in-memory
+Qdrant, embedded by a fake model that, like real ones, represents a text as a
+blend of its words and so only loosely pins down an exact name. Then runs two
+query sets through semantic_search with hybrid off and on:
+
+- merchant lookups ("Starbucks"): relevant = vectors of that merchant
+- descriptive queries ("groceries purchases"): relevant = that category
+
+and reports median latency (each query embedding costs --embed-ms, standing in
+for the provider round trip), query embeddings made and recall@k. Exits
+non-zero if hybrid recall falls below pure vector recall on either set:
+
+    python benchmarks/bench_hybrid_search.py --rows 5000 --details 2000 --embed-ms 50
+"""
+import argparse
+import hashlib
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Imported first: it points the embedding cache and data versions at a scratch dir
+from bench_vector_sync import CATEGORIES, in_memory_client, make_frames  # noqa: E402
+
+import numpy as np  # noqa: E402
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+from backend.embeddings import CachedEmbeddings, QueryEmbeddingCache  # noqa: E402
+from backend.keyword_index import tokenize  # noqa: E402
+
+MERCHANTS = [
+    "Walmart", "Target", "Costco", "Whole Foods", "Trader Joe's", "Kroger", "Safeway", "Aldi",
+    "Starbucks", "Dunkin", "McDonald's", "Chipotle", "Subway", "Panera Bread", "Taco Bell", "Domino's",
+    "Uber", "Lyft", "Shell", "Chevron", "Exxon", "Delta", "United Airlines", "Amtrak",
+    "Marriott", "Hilton", "Airbnb", "Expedia", "Comcast", "Verizon", "AT&T", "PG&E",
+    "Amazon", "Best Buy", "Home Depot", "IKEA", "Apple Store", "Nike", "Zara", "Sephora",
+    "Netflix", "Spotify", "Hulu", "DoorDash", "Grubhub", "Instacart", "CVS", "Walgreens",
+]
+
+
+class BlendEmbeddings(Embeddings):
+    """Mean of per-word directions plus noise; sleeps embed_ms per query like a provider call."""
+
+    def __init__(self, dim: int, noise: float, embed_ms: float):
+        self.dim, self.noise, self.embed_ms = dim, noise, embed_ms
+        self.queries = 0
+
+    def _embed(self, text: str) -> list:
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+        vector = self.noise * np.random.default_rng(seed).standard_normal(self.dim)
+        for token in tokenize(text):
+            rng = np.random.default_rng(int.from_bytes(hashlib.sha256(token.encode()).digest()[:8], "little"))
+            vector += rng.standard_normal(self.dim) / max(len(tokenize(text)), 1) ** 0.5
+        return (vector / np.linalg.norm(vector)).astype(np.float32).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        self.queries += 1
+        time.sleep(self.embed_ms / 1000)
+        return self._embed(text)
+
+
+def recall(results, relevant, top_k: int) -> float:
+    hits = sum(1 for r in results if relevant(r["metadata"]))
+    return hits / top_k
+
+
+def run(client, queries, top_k: int, hybrid: bool, args):
+    # A fresh model and query cache per run, so no run is served another's query embeddings
+    base = BlendEmbeddings(args.dim, args.noise, args.embed_ms)
+    embeddings = CachedEmbeddings(base, query_cache=QueryEmbeddingCache())
+    timings, recalls = [], []
+    for query, relevant in queries:
+        start = time.perf_counter()
+        results = client.semantic_search(query, "bench-user", top_k, embeddings, hybrid=hybrid)
+        timings.append((time.perf_counter() - start) * 1000)
+        recalls.append(recall(results, relevant, top_k))
+    return statistics.median(timings), base.queries, float(np.mean(recalls))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--details", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=1.5)
+    parser.add_argument("--embed-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    df, details_df = make_frames(args.rows, args.details)
+    df["merchant_name"] = [MERCHANTS[int(m.split()[-1]) % len(MERCHANTS)] for m in df["merchant_name"]]
+    client = in_memory_client()
+    client.sync_transactions(df, details_df, "bench-user", BlendEmbeddings(args.dim, args.noise, args.embed_ms))
+
+    counts = df["merchant_name"].value_counts()
+    lookups = [(m, lambda meta, m=m: meta.get("merchant_name") == m) for m in MERCHANTS if counts.get(m, 0) >= args.top_k]
+    descriptive = [(f"{c.lower()} purchases", lambda meta, c=c: meta.get("category") == c) for c in CATEGORIES]
+
+    client.semantic_search("warm up", "bench-user", args.top_k, BlendEmbeddings(args.dim, args.noise, 0))  # build the keyword index
+    failed = False
+    print(f"documents={len(df) + len(details_df)} top_k={args.top_k} embed latency={args.embed_ms} ms")
+    for name, queries in (("merchant lookups", lookups), ("descriptive", descriptive)):
+        vector_ms, vector_embeds, vector_recall = run(client, queries, args.top_k, False, args)
+        hybrid_ms, hybrid_embeds, hybrid_recall = run(client, queries, args.top_k, True, args)
+        print(f"{name} ({len(queries)} queries)")
+        print(f"  vector: median {vector_ms:7.2f} ms  embeddings {vector_embeds:3d}  recall@{args.top_k} {vector_recall:.3f}")
+        print(f"  hybrid: median {hybrid_ms:7.2f} ms  embeddings {hybrid_embeds:3d}  recall@{args.top_k} {hybrid_recall:.3f}")
+        if hybrid_recall < vector_recall:
+            failed = True
+    print(f"client: {client.stats()}")
+    if failed:
+        print("FAIL: hybrid recall below pure vector recall")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Cold-start import budget for the two entry points that get spawned per job:
+mcp_server (one stdio server per user) and money_rag (every ingestion worker).
+
+Each module is imported in a fresh interpreter several times; the median wall
+time is compared with its budget and the script exits non-zero on regression,
+so it can run in CI:
+
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --runs 7 --budget mcp_server=0.5 --top 10
+
+--top lists the slowest top-level imports (from python -X importtime) to see
+which dependency crept back into module scope.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds, median of fresh-interpreter imports. Generous enough for CI noise,
+# tight enough to catch pandas / plotly / langchain / fastmcp moving back to
+# module scope (each of those alone costs 0.5-2s).
+DEFAULT_BUDGETS = {"mcp_server": 0.5, "money_rag": 1.5}
+
+_TIMER = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def time_import(module: str) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", _TIMER.format(module=module)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module: str, top: int) -> list[tuple[float, str]]:
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Two-space indent = imported directly by the module under test
+        if name.startswith("   ") and not name.startswith("    "):
+            rows.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULE=SECONDS")
+    parser.add_argument("--top", type=int, default=0)
+    args = parser.parse_args()
+
+    budgets = dict(DEFAULT_BUDGETS)
+    for item in args.budget:
+        module, seconds = item.split("=")
+        budgets[module] = float(seconds)
+
+    failed = False
+    for module, budget in budgets.items():
+        time_import(module)  # warm the bytecode and OS file caches
+        samples = [time_import(module) for _ in range(args.runs)]
+        median = statistics.median(samples)
+        ok = median <= budget
+        failed |= not ok
+        print(f"{module:<12} median={median:.3f}s min={min(samples):.3f}s budget={budget:.2f}s {'OK' if ok else 'OVER BUDGET'}")
+        for seconds, name in slowest_imports(module, args.top):
+            print(f"    {seconds:7.3f}s  {name}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Search latency of the local vector store (VECTOR_DB_STACK=local) for one tenant.
+
+Fills a tenant with random unit vectors, then times exact top-k search and,
+for tenants large enough, the inverted-file index with its recall@k against
+the exact result. Exits non-zero if the search a --vectors sized tenant would
+get (exact, or IVF from LOCAL_VECTOR_ANN_MIN up) misses the --budget-ms median:
+
+    python benchmarks/bench_local_search.py --vectors 20000 --dim 768
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from backend import local_vector_store  # noqa: E402
+from backend.local_vector_store import LocalVectorStore  # noqa: E402
+
+
+def clustered(n: int, centers: np.ndarray, rng) -> np.ndarray:
+    """Points around random topic centres: real embeddings cluster, uniform noise doesn't."""
+    picks = centers[rng.integers(len(centers), size=n)]
+    return picks + 0.6 * rng.standard_normal(picks.shape, dtype=np.float32) / np.sqrt(centers.shape[1])
+
+
+def fill(store: LocalVectorStore, vectors: int, centers: np.ndarray, rng) -> None:
+    store.create_collection(centers.shape[1])
+    for start in range(0, vectors, 5000):
+        n = min(5000, vectors - start)
+        store.upsert(
+            [str(uuid.uuid4()) for _ in range(n)],
+            clustered(n, centers, rng),
+            [{"user_id": "bench-user", "page_content": f"doc {start + i}"} for i in range(n)],
+        )
+    store.flush()
+
+
+def time_queries(store: LocalVectorStore, queries, top_k: int):
+    timings, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        hits = store.search("bench-user", q, top_k)
+        timings.append((time.perf_counter() - start) * 1000)
+        results.append({p["page_content"] for _, p in hits})
+    return statistics.median(timings), results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--topics", type=int, default=300)
+    parser.add_argument("--budget-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    with tempfile.TemporaryDirectory() as root:
+        store = LocalVectorStore(root)
+        centers = rng.standard_normal((args.topics, args.dim), dtype=np.float32) / np.sqrt(args.dim)
+        fill(store, args.vectors, centers, rng)
+        # Search from a fresh store so the memory-mapped load path is what gets measured
+        store = LocalVectorStore(root)
+        queries = clustered(args.queries, centers, rng)
+
+        configured_min = local_vector_store.LOCAL_VECTOR_ANN_MIN
+        local_vector_store.LOCAL_VECTOR_ANN_MIN = args.vectors + 1
+        exact_ms, exact = time_queries(store, queries, args.top_k)
+        print(f"vectors={args.vectors} dim={args.dim} exact search median={exact_ms:.3f} ms")
+
+        local_vector_store.LOCAL_VECTOR_ANN_MIN = 0
+        store.search("bench-user", queries[0], args.top_k)  # build the index outside the timings
+        ann_ms, approx = time_queries(store, queries, args.top_k)
+        recall = np.mean([len(a & e) / len(e) for a, e in zip(approx, exact)])
+        print(f"ivf search median={ann_ms:.3f} ms (nprobe={local_vector_store.LOCAL_VECTOR_NPROBE}) recall@{args.top_k}={recall:.2f}")
+        print(f"store: {store.stats()}")
+
+    # Judge the path the store takes for a tenant this size with the configured threshold
+    path, served_ms = ("ivf", ann_ms) if args.vectors >= configured_min else ("exact", exact_ms)
+    if served_ms > args.budget_ms:
+        print(f"FAIL: {path} search median {served_ms:.3f} ms is over the {args.budget_ms} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Recall vs memory of the local store's vector quantization options.
+
+Builds a synthetic transaction corpus (the texts vector sync would embed),
+embeds it with a fake model whose vectors cluster by category and merchant
+like real ones do, then for each VECTOR_QUANTIZATION option reports the
+bytes of vectors each query scans (the quantized copy held in memory, or the
+whole float32 matrix), median search latency and recall@k against exact
+float32 search, all without the IVF index. Exits non-zero if a quantized
+option's recall drops below --min-recall:
+
+    python benchmarks/bench_quantization.py --rows 20000 --dim 768 --oversampling 4
+"""
+import argparse
+import hashlib
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from backend import local_vector_store  # noqa: E402
+from backend.local_vector_store import QUANTIZATIONS, LocalVectorStore  # noqa: E402
+from backend.vector_db_client import build_sync_payloads  # noqa: E402
+from bench_vector_sync import make_frames  # noqa: E402
+
+
+def _direction(label: str, dim: int) -> np.ndarray:
+    rng = np.random.default_rng(int.from_bytes(hashlib.sha256(label.encode()).digest()[:8], "little"))
+    return rng.standard_normal(dim, dtype=np.float32) / np.sqrt(dim)
+
+
+def embed_corpus(metadatas, dim: int, rng) -> np.ndarray:
+    """Category + merchant directions plus per-document noise."""
+    categories, merchants = {}, {}
+    vectors = np.empty((len(metadatas), dim), dtype=np.float32)
+    for i, meta in enumerate(metadatas):
+        category = str(meta.get("category"))
+        merchant = str(meta.get("merchant_name"))
+        if category not in categories:
+            categories[category] = _direction("category:" + category, dim)
+        if merchant not in merchants:
+            merchants[merchant] = _direction("merchant:" + merchant, dim)
+        vectors[i] = categories[category] + 0.8 * merchants[merchant]
+    return (vectors + 0.5 * rng.standard_normal(vectors.shape, dtype=np.float32) / np.sqrt(dim)).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--details", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--oversampling", type=float, default=4.0)
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(11)
+    df, details_df = make_frames(args.rows, args.details)
+    _, metadatas, vector_ids = build_sync_payloads(df, details_df, "bench-user")
+    vectors = embed_corpus(metadatas, args.dim, rng)
+    picks = rng.integers(len(vectors), size=args.queries)
+    queries = vectors[picks] + 0.5 * rng.standard_normal((args.queries, args.dim), dtype=np.float32) / np.sqrt(args.dim)
+    print(f"corpus: {len(vectors)} vectors x {args.dim} dims, top_k={args.top_k}, oversampling={args.oversampling}")
+
+    local_vector_store.LOCAL_VECTOR_ANN_MIN = len(vectors) + 1  # measure quantization on its own
+    full_mb = vectors.nbytes / 2**20
+    exact = None
+    failed = False
+    with tempfile.TemporaryDirectory() as root:
+        writer = LocalVectorStore(root)
+        writer.create_collection(args.dim)
+        writer.upsert(vector_ids, vectors, metadatas)
+        writer.flush()
+
+        for quantization in QUANTIZATIONS:
+            store = LocalVectorStore(root, quantization=quantization, oversampling=args.oversampling)
+            store.search("bench-user", queries[0], args.top_k)  # load + quantize outside the timings
+            timings, results = [], []
+            for q in queries:
+                start = time.perf_counter()
+                hits = store.search("bench-user", q, args.top_k)
+                timings.append((time.perf_counter() - start) * 1000)
+                results.append([p["detail_id"] if "detail_id" in p else p["id"] for _, p in hits])
+            if exact is None:
+                exact = results
+            recall = np.mean([len(set(r) & set(e)) / len(e) for r, e in zip(results, exact)])
+            scanned_mb = store.stats()["vector_bytes"] / 2**20 if quantization != "none" else full_mb
+            print(f"{quantization:>8}: scanned per query {scanned_mb:8.1f} MB  median {statistics.median(timings):6.2f} ms  recall@{args.top_k} {recall:.3f}")
+            if recall < args.min_recall:
+                failed = True
+    print(f"full-precision matrix: {full_mb:.1f} MB (memory-mapped; only shortlisted rows are read when quantized)")
+    if failed:
+        print(f"FAIL: recall below {args.min_recall}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
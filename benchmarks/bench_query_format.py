@@ -0,0 +1,111 @@
+"""
+Compare the old str(row) output of query_database with the bounded CSV formatter.
+
+Reports characters and prompt tokens for a synthetic transactions result set,
+and optionally the latency / billed input tokens of a real model answering a
+question over each rendering:
+
+    python benchmarks/bench_query_format.py --rows 5000
+    python benchmarks/bench_query_format.py --rows 5000 --model google_genai:gemini-2.5-flash
+
+Token counts use tiktoken's cl100k_base when it is available offline and fall
+back to a chars/4 estimate otherwise.
+"""
+import argparse
+import datetime as dt
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp_server import format_rows  # noqa: E402
+
+COLUMNS = ["id", "trans_date", "description", "amount", "category", "merchant"]
+CATEGORIES = ["Groceries", "Dining", "Transport", "Utilities", "Shopping", "Travel"]
+
+
+def make_rows(n: int, seed: int = 7) -> list[tuple]:
+    rng = random.Random(seed)
+    start = dt.date(2024, 1, 1)
+    return [
+        (
+            f"txn-{i:06d}",
+            start + dt.timedelta(days=rng.randrange(365)),
+            f"POS PURCHASE {rng.randrange(10**6):06d}",
+            Decimal(rng.randrange(100, 50000)) / 100,
+            rng.choice(CATEGORIES),
+            f"Merchant {rng.randrange(200)}",
+        )
+        for i in range(n)
+    ]
+
+
+def legacy_format(rows: list, columns: list) -> str:
+    return "\n".join([f"Columns: {', '.join(columns)}"] + [str(row) for row in rows])
+
+
+def token_counter():
+    try:
+        import tiktoken
+
+        enc = tiktoken.get_encoding("cl100k_base")
+        return "tiktoken", lambda text: len(enc.encode(text))
+    except Exception:
+        return "chars/4 estimate", lambda text: len(text) // 4
+
+
+def ask_model(model: str, payload: str, question: str) -> tuple[float, int | None]:
+    from langchain.chat_models import init_chat_model
+
+    llm = init_chat_model(model)
+    start = time.perf_counter()
+    response = llm.invoke(f"Query results:\n{payload}\n\nQuestion: {question}")
+    elapsed = time.perf_counter() - start
+    usage = getattr(response, "usage_metadata", None) or {}
+    return elapsed, usage.get("input_tokens")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--max-rows", type=int, default=100)
+    parser.add_argument("--model", help="provider:model for a live latency comparison (needs API key)")
+    parser.add_argument("--question", default="What is the total amount spent and on which dates?")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    counter_name, count_tokens = token_counter()
+    variants = {
+        "legacy str(row)": legacy_format(rows, COLUMNS),
+        "csv, unbounded": format_rows(rows, COLUMNS, max_rows=len(rows)),
+        f"csv, max_rows={args.max_rows}": format_rows(rows, COLUMNS, max_rows=args.max_rows),
+    }
+
+    print(f"{args.rows} rows, tokens via {counter_name}")
+    print(f"{'format':<24}{'chars':>12}{'tokens':>12}{'format ms':>12}")
+    for name, text in variants.items():
+        start = time.perf_counter()
+        if name.startswith("legacy"):
+            legacy_format(rows, COLUMNS)
+        else:
+            format_rows(rows, COLUMNS, max_rows=len(rows) if "unbounded" in name else args.max_rows)
+        fmt_ms = (time.perf_counter() - start) * 1000
+        print(f"{name:<24}{len(text):>12,}{count_tokens(text):>12,}{fmt_ms:>12.1f}")
+
+    if args.model:
+        print(f"\nModel: {args.model}")
+        for name, text in variants.items():
+            if name == "csv, unbounded":
+                continue
+            try:
+                elapsed, input_tokens = ask_model(args.model, text, args.question)
+                print(f"{name:<24} latency={elapsed:6.2f}s  input_tokens={input_tokens}")
+            except Exception as e:
+                print(f"{name:<24} failed: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Micro-benchmark of vector sync payload construction (no embedding, no DB).
+
+Times build_sync_payloads against the previous iterrows implementation, which
+scanned the whole transaction frame once per line item, and checks that both
+produce the same texts, ids and payload hashes:
+
+    python benchmarks/bench_sync_payloads.py --sizes 10000 100000
+
+The legacy version is quadratic, so it is skipped above --legacy-max-rows.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from backend.vector_db_client import build_sync_payloads, sync_hash  # noqa: E402
+from bench_vector_sync import make_frames  # noqa: E402
+
+
+def legacy_payloads(df: pd.DataFrame, details_df: pd.DataFrame, user_id: str):
+    """The per-row implementation build_sync_payloads replaced, kept for comparison."""
+    texts, metadatas, vector_ids = [], [], []
+    for _, row in df.iterrows():
+        merchant = row.get('merchant_name', '') or row.get('description', '')
+        category = row.get('category', 'Uncategorized')
+        enriched = row.get('enriched_info', '')
+        base_text = f"{merchant} ({category})"
+        texts.append(f"{base_text} — {enriched}" if enriched else base_text)
+        meta_cols = ['id', 'amount', 'category', 'trans_date']
+        if 'merchant_name' in row: meta_cols.append('merchant_name')
+        if 'description' in row: meta_cols.append('description')
+        if 'source_csv_id' in row: meta_cols.append('source_csv_id')
+        meta = {k: row[k] for k in meta_cols if k in row and pd.notna(row[k])}
+        if 'source_bill_file_id' in row and pd.notna(row['source_bill_file_id']):
+            meta['bill_file_id'] = row['source_bill_file_id']
+        meta['user_id'] = user_id
+        meta['transaction_date'] = str(meta.pop('trans_date'))
+        meta['vector_type'] = 'transaction'
+        meta['page_content'] = texts[-1]
+        metadatas.append(meta)
+        vector_ids.append(str(row['id']))
+    if not details_df.empty:
+        for _, d_row in details_df.iterrows():
+            parent_row = df[df['id'] == d_row['transaction_id']].iloc[0]
+            merchant = parent_row.get('merchant_name', parent_row.get('description', ''))
+            texts.append(f"Line item from {merchant}: {d_row['item_description']} — {d_row.get('enriched_info', '')}")
+            meta = {
+                'id': str(parent_row['id']),
+                'detail_id': str(d_row['id']),
+                'amount': float(d_row['item_total_price'] if pd.notna(d_row.get('item_total_price')) else 0),
+                'category': parent_row.get('category', 'Uncategorized'),
+                'user_id': user_id,
+                'transaction_date': str(parent_row['trans_date']),
+                'vector_type': 'line_item',
+                'merchant_name': str(merchant),
+            }
+            if 'source_csv_id' in parent_row and pd.notna(parent_row['source_csv_id']):
+                meta['source_csv_id'] = parent_row['source_csv_id']
+            if 'source_bill_file_id' in parent_row and pd.notna(parent_row['source_bill_file_id']):
+                meta['bill_file_id'] = parent_row['source_bill_file_id']
+            meta['page_content'] = texts[-1]
+            metadatas.append(meta)
+            vector_ids.append(str(d_row['id']))
+    return texts, metadatas, vector_ids
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--details-ratio", type=float, default=0.3, help="line items per transaction")
+    parser.add_argument("--legacy-max-rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8}{'items':>8}{'vectorized s':>14}{'legacy s':>12}{'speedup':>10}  same output")
+    for rows in args.sizes:
+        df, details_df = make_frames(rows, int(rows * args.details_ratio))
+        new_s, new = timed(build_sync_payloads, df, details_df, "bench-user")
+        if rows > args.legacy_max_rows:
+            print(f"{rows:>8}{len(details_df):>8}{new_s:>14.3f}{'skipped':>12}{'':>10}")
+            continue
+        old_s, old = timed(legacy_payloads, df, details_df, "bench-user")
+        same = new[0] == old[0] and new[2] == old[2] and [sync_hash(m) for m in new[1]] == [sync_hash(m) for m in old[1]]
+        print(f"{rows:>8}{len(details_df):>8}{new_s:>14.3f}{old_s:>12.3f}{old_s / new_s:>9.0f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+End-to-end vector sync against an in-memory Qdrant with a counting fake embedder.
+
+Reports how many texts were sent to the embedding model per document synced,
+the wall time of a full sync, and of a repeat sync. The persistent embedding
+cache is off and every document's text is distinct, so the script exits
+non-zero unless exactly one text per document was embedded and an unchanged
+re-sync embedded none:
+
+    python benchmarks/bench_vector_sync.py --rows 5000 --details 2000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# No persistent embedding cache: a second embedding pass would be served from it and go uncounted
+_scratch = tempfile.mkdtemp()
+os.environ["EMBEDDING_CACHE_BACKEND"] = "none"
+os.environ["MODEL_METADATA_PATH"] = os.path.join(_scratch, "model-metadata.json")
+os.environ["DATA_VERSION_DIR"] = os.path.join(_scratch, "data-versions")
+
+import pandas as pd  # noqa: E402
+from langchain_core.embeddings import DeterministicFakeEmbedding  # noqa: E402
+from qdrant_client import QdrantClient  # noqa: E402
+
+from backend.keyword_index import KeywordIndexCache  # noqa: E402
+from backend.vector_db_client import VectorDBClient  # noqa: E402
+
+CATEGORIES = ["Groceries", "Dining", "Transport", "Utilities", "Shopping", "Travel"]
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Deterministic vectors; counts every text sent to embed_documents."""
+    documents_embedded: int = 0
+    document_calls: int = 0
+
+    def embed_documents(self, texts):
+        self.document_calls += 1
+        self.documents_embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+def make_frames(rows: int, details: int, seed: int = 7) -> tuple[pd.DataFrame, pd.DataFrame]:
+    rng = random.Random(seed)
+    ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(rows)]
+    df = pd.DataFrame({
+        "id": ids,
+        "user_id": "bench-user",
+        "trans_date": [f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}" for _ in range(rows)],
+        "description": [f"POS PURCHASE {i}" for i in range(rows)],
+        "merchant_name": [f"Merchant {rng.randrange(500)}" for _ in range(rows)],
+        "amount": [round(rng.uniform(1, 500), 2) for _ in range(rows)],
+        "category": [rng.choice(CATEGORIES) for _ in range(rows)],
+        "enriched_info": [f"A retail business, receipt {i}." for i in range(rows)],
+        "source_csv_id": str(uuid.UUID(int=rng.getrandbits(128))),
+    })
+    details_df = pd.DataFrame({
+        "id": [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(details)],
+        "transaction_id": [rng.choice(ids) for _ in range(details)],
+        "item_description": [f"Item {i}" for i in range(details)],
+        "item_total_price": [round(rng.uniform(1, 50), 2) for _ in range(details)],
+        "enriched_info": [f"A product, line {i}." for i in range(details)],
+    })
+    return df, details_df
+
+
+def in_memory_client() -> VectorDBClient:
+    client = object.__new__(VectorDBClient)
+    client.stack = "qdrant"
+    client.collection_name = "transactions"
+    client._verified_dim = None
+    client._collection_known = False
+    client._lock = threading.Lock()
+    client._setup_lock = threading.Lock()
+    client._stores = {}
+    client._keyword_indexes = KeywordIndexCache()
+    client.counters = dict.fromkeys(
+        ("collection_checks", "collection_setups", "setup_skips", "store_builds", "store_reuses",
+         "keyword_only_searches", "hybrid_searches"), 0
+    )
+    client.qdrant_client = QdrantClient(":memory:")
+    return client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--details", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=64)
+    args = parser.parse_args()
+
+    df, details_df = make_frames(args.rows, args.details)
+    documents = len(df) + len(details_df)
+    client = in_memory_client()
+    embeddings = CountingEmbeddings(size=args.dim)
+
+    start = time.perf_counter()
+    stats = client.sync_transactions(df, details_df, "bench-user", embeddings)
+    full_s = time.perf_counter() - start
+    embedded = embeddings.documents_embedded
+
+    start = time.perf_counter()
+    repeat = client.sync_transactions(df, details_df, "bench-user", embeddings)
+    repeat_s = time.perf_counter() - start
+
+    per_doc = embedded / documents
+    print(f"documents={documents} full sync={full_s:.2f}s {stats}")
+    print(f"repeat sync={repeat_s:.2f}s {repeat}")
+    print(f"texts embedded per document: {per_doc:.2f} (embed_documents calls: {embeddings.document_calls})")
+    print(f"client: {client.stats()}")
+    if embedded != documents or embeddings.documents_embedded != embedded:
+        print("FAIL: documents were not embedded exactly once, or unchanged rows were re-embedded")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
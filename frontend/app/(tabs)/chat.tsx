@@ -21,7 +21,7 @@ const MAX_CHAT_WIDTH = 720;
 
 export default function ChatScreen() {
   log.debug("ChatScreen rendered");
-  const { messages, isStreaming, sendMessage } = useChat();
+  const { messages, isStreaming, streamingText, sendMessage } = useChat();
   const { files } = useFiles();
   const flatListRef = useRef<FlatList>(null);
   const router = useRouter();
@@ -95,6 +95,14 @@ export default function ChatScreen() {
         ListEmptyComponent={
           <SuggestedPrompts onSelectPrompt={sendMessage} />
         }
+        ListFooterComponent={
+          isStreaming && streamingText ? (
+            <ChatMessage message={{ role: "assistant", content: streamingText }} />
+          ) : null
+        }
+        onContentSizeChange={() => {
+          if (isStreaming) flatListRef.current?.scrollToEnd({ animated: false });
+        }}
       />
 
       {/* Streaming indicator */}
@@ -9,6 +9,8 @@ export function useChat() {
   const [messages, setMessages] = useState<ChatMessage[]>([]);
   const [isStreaming, setIsStreaming] = useState(false);
   const [currentToolTraces, setCurrentToolTraces] = useState<ToolEvent[]>([]);
+  // Assistant text streamed so far for the in-flight reply (replaced by the final message)
+  const [streamingText, setStreamingText] = useState("");
 
   const sendMessage = useCallback(
     async (text: string) => {
@@ -28,6 +30,7 @@ export function useChat() {
       setMessages((prev) => [...prev, userMsg]);
       setIsStreaming(true);
       setCurrentToolTraces([]);
+      setStreamingText("");
 
       let toolTraces: ToolEvent[] = [];
 
@@ -53,6 +56,9 @@ export function useChat() {
             toolTraces = [...toolTraces, event];
             setCurrentToolTraces([...toolTraces]);
           },
+          onToken: (data) => {
+            setStreamingText((prev) => prev + data.content);
+          },
           onFinal: (data) => {
             log.info("Final response (hook)", {
               contentLength: data.content?.length,
@@ -70,6 +76,7 @@ export function useChat() {
             };
             setMessages((prev) => [...prev, assistantMsg]);
             setCurrentToolTraces([]);
+            setStreamingText("");
           },
           onDone: () => {
             log.info("Stream done (hook) - setting isStreaming=false");
@@ -83,6 +90,7 @@ export function useChat() {
             };
             setMessages((prev) => [...prev, errorMsg]);
             setIsStreaming(false);
+            setStreamingText("");
           },
         });
       } catch (e: any) {
@@ -93,6 +101,7 @@ export function useChat() {
         };
         setMessages((prev) => [...prev, errorMsg]);
         setIsStreaming(false);
+        setStreamingText("");
       }
     },
     [isStreaming]
@@ -104,5 +113,5 @@ export function useChat() {
     setCurrentToolTraces([]);
   }, []);
 
-  return { messages, isStreaming, currentToolTraces, sendMessage, clearMessages };
+  return { messages, isStreaming, streamingText, currentToolTraces, sendMessage, clearMessages };
 }
@@ -8,6 +8,7 @@ const log = createLogger("ChatService");
 export interface ChatEventCallbacks {
   onToolStart: (data: { name: string; input: string }) => void;
   onToolEnd: (data: { name: string; snippet: string }) => void;
+  onToken: (data: { content: string }) => void;
   onFinal: (data: { content: string; charts: string[]; images: string[]; pendingTransactions?: any[] }) => void;
   onDone: () => void;
   onError: (error: string) => void;
@@ -27,11 +28,16 @@ function processSSEBuffer(
 
     if (eventLine && dataLine) {
       const eventType = eventLine.substring(7);
-      log.debug("SSE frame received", { eventType });
+      if (eventType !== "token") {
+        log.debug("SSE frame received", { eventType });
+      }
       try {
         const data = JSON.parse(dataLine.substring(6));
 
         switch (eventType) {
+          case "token":
+            callbacks.onToken(data);
+            break;
           case "tool_start":
             log.info("Tool started", { name: data.name, input: data.input?.substring(0, 100) });
             callbacks.onToolStart(data);
@@ -1,9 +1,20 @@
-import pandas as pd
-import plotly.express as px
-from fastmcp import FastMCP
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from dotenv import load_dotenv
+import csv
+import datetime as dt
+import functools
+import inspect
+import io
+import json
 import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from decimal import Decimal
 from typing import Optional
 
 from textwrap import dedent
@@ -11,39 +22,452 @@ from textwrap import dedent
 # Load environment variables (API keys, etc.)
 load_dotenv()
 
-# Define paths to your data
-DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "temp_data"))
-
-# Initialize the MCP Server
-mcp = FastMCP("Money RAG Financial Analyst")
-
-from supabase import create_client, Client
+# pandas, plotly, supabase, the embedding stack and fastmcp itself are imported
+# where first used: the API process imports this module for the in-process
+# tools, and each stdio server should reach "ready" as early as possible.
+from backend.data_version import get_data_version
 
 # Database stack detection
 DB_STACK = os.environ.get("POSTGRESSQL_STACK", "supabase").lower()
 
+def _connect_databricks():
+    from databricks import sql
+    return sql.connect(
+        server_hostname=os.environ.get("DATABRICKS_SERVER_HOSTNAME"),
+        http_path=os.environ.get("DATABRICKS_HTTP_PATH"),
+        access_token=os.environ.get("DATABRICKS_TOKEN"),
+    )
+
+def _connect_postgres():
+    import psycopg2
+    db_url = os.environ.get("DATABASE_URL")
+    if not db_url:
+        raise ValueError("DATABASE_URL must be defined to construct raw SQL connections.")
+    conn = psycopg2.connect(db_url)
+    # Tools only read; autocommit keeps pooled connections out of "idle in transaction"
+    # and means a failed query doesn't leave the connection in an aborted state.
+    conn.autocommit = True
+    return conn
+
+_DRIVERS = {"databricks": _connect_databricks, "supabase": _connect_postgres}
+
 def get_db_connection():
-    """Returns a database connection (psycopg2 for Supabase, databricks.sql for Databricks)."""
-    if DB_STACK == "databricks":
-        from databricks import sql
-        return sql.connect(
-            server_hostname=os.environ.get("DATABRICKS_SERVER_HOSTNAME"),
-            http_path=os.environ.get("DATABRICKS_HTTP_PATH"),
-            access_token=os.environ.get("DATABRICKS_TOKEN"),
+    """Returns a new database connection (psycopg2 for Supabase, databricks.sql for Databricks)."""
+    return _DRIVERS.get(DB_STACK, _connect_postgres)()
+
+
+class _PooledConnection:
+    __slots__ = ("raw", "created_at", "last_used")
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections for the SQL tools.
+
+    A Databricks connection is a full session handshake and an agent turn
+    often makes several tool calls, so connections are kept between calls.
+    Connections idle for longer than health_check_after_s are pinged with
+    SELECT 1 before reuse, idle ones beyond min_size are closed after
+    max_idle_s, and every connection is replaced after max_lifetime_s.
+    """
+
+    def __init__(self, factory, min_size: int = 1, max_size: int = 5, max_idle_s: float = 300,
+                 max_lifetime_s: float = 1800, health_check_after_s: float = 30, acquire_timeout_s: float = 30):
+        self._factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle_s = max_idle_s
+        self.max_lifetime_s = max_lifetime_s
+        self.health_check_after_s = health_check_after_s
+        self.acquire_timeout_s = acquire_timeout_s
+        self._idle: deque[_PooledConnection] = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+        self._reaper: Optional[threading.Thread] = None
+        self.counters = {
+            "created": 0,
+            "reused": 0,
+            "waits": 0,
+            "health_check_failures": 0,
+            "recycled_idle": 0,
+            "recycled_lifetime": 0,
+            "discarded_broken": 0,
+        }
+
+    @staticmethod
+    def _close_quietly(conn: _PooledConnection):
+        try:
+            conn.raw.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _ping(conn: _PooledConnection) -> bool:
+        try:
+            if getattr(conn.raw, "closed", 0):
+                return False
+            cursor = conn.raw.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _drop(self, conn: _PooledConnection, counter: str):
+        """Close a connection that is no longer counted as idle and free its slot."""
+        self._close_quietly(conn)
+        with self._cond:
+            self._size -= 1
+            self.counters[counter] += 1
+            self._cond.notify()
+
+    def _acquire(self) -> _PooledConnection:
+        self._start_reaper()
+        deadline = time.monotonic() + self.acquire_timeout_s
+        while True:
+            with self._cond:
+                conn = None
+                if self._idle:
+                    conn = self._idle.pop()  # most recently used first, so extras go idle and get recycled
+                elif self._size < self.max_size:
+                    self._size += 1
+                else:
+                    self.counters["waits"] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait(timeout=remaining):
+                        raise TimeoutError(f"No SQL connection available within {self.acquire_timeout_s:.0f}s")
+                    continue
+
+            if conn is None:
+                try:
+                    raw = self._factory()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self.counters["created"] += 1
+                return _PooledConnection(raw)
+
+            now = time.monotonic()
+            if now - conn.created_at > self.max_lifetime_s:
+                self._drop(conn, "recycled_lifetime")
+                continue
+            if now - conn.last_used > self.health_check_after_s and not self._ping(conn):
+                self._drop(conn, "health_check_failures")
+                continue
+            with self._cond:
+                self.counters["reused"] += 1
+            return conn
+
+    def _release(self, conn: _PooledConnection):
+        conn.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it goes back to the pool unless it turns out to be broken."""
+        conn = self._acquire()
+        try:
+            yield conn.raw
+        except Exception:
+            # Query errors are common (LLM-written SQL); only drop the connection if it's dead
+            if self._ping(conn):
+                self._release(conn)
+            else:
+                self._drop(conn, "discarded_broken")
+            raise
+        else:
+            self._release(conn)
+
+    def recycle_idle(self):
+        """Close connections idle for longer than max_idle_s, keeping min_size warm."""
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            while len(self._idle) > self.min_size and now - self._idle[0].last_used > self.max_idle_s:
+                expired.append(self._idle.popleft())
+        for conn in expired:
+            self._drop(conn, "recycled_idle")
+
+    def _reap_forever(self):
+        while True:
+            time.sleep(max(self.max_idle_s / 2, 1))
+            self.recycle_idle()
+
+    def _start_reaper(self):
+        if self._reaper is None:
+            with self._cond:
+                if self._reaper is None:
+                    self._reaper = threading.Thread(target=self._reap_forever, name="sql-pool-reaper", daemon=True)
+                    self._reaper.start()
+
+    def close_all(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn in idle:
+            self._drop(conn, "recycled_idle")
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                **self.counters,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+            }
+
+
+sql_pool = ConnectionPool(
+    get_db_connection,
+    min_size=int(os.environ.get("SQL_POOL_MIN_SIZE", "1")),
+    max_size=int(os.environ.get("SQL_POOL_MAX_SIZE", "5")),
+    max_idle_s=float(os.environ.get("SQL_POOL_MAX_IDLE_S", "300")),
+    max_lifetime_s=float(os.environ.get("SQL_POOL_MAX_LIFETIME_S", "1800")),
+    health_check_after_s=float(os.environ.get("SQL_POOL_HEALTH_CHECK_S", "30")),
+)
+
+_SQL_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+
+def _normalize_sql(query: str) -> str:
+    """Case/whitespace-insensitive form of a query; quoted literals and identifiers are kept as-is."""
+    parts = _SQL_QUOTED.split(query.strip().rstrip(";").strip())
+    return "".join(
+        part if i % 2 else re.sub(r"\s+", " ", part).lower()
+        for i, part in enumerate(parts)
+    )
+
+
+class QueryResultCache:
+    """
+    LRU cache of SQL results shared by the SQL tools.
+
+    Keys are (user_id, data version, normalized SQL), so a chart that follows
+    a data query reuses its rows, and any ingestion / manual entry / file
+    deletion (which bumps the version) retires the user's old entries. Bounded
+    by entry count and an estimate of the rows' size; entries also expire after
+    ttl_s so queries relative to CURRENT_DATE don't go stale.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 32 * 1024 * 1024, ttl_s: float = 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict[tuple, tuple] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "oversized": 0}
+
+    @staticmethod
+    def _estimate_bytes(rows: list, columns: list) -> int:
+        return sum(len(str(v)) + 8 for row in rows for v in row) + sum(len(c) for c in columns)
+
+    def _remove(self, key):
+        _, _, nbytes, _ = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            rows, columns, _, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl_s:
+                self._remove(key)
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return rows, columns
+
+    def put(self, key, rows: list, columns: list):
+        nbytes = self._estimate_bytes(rows, columns)
+        with self._lock:
+            if nbytes > self.max_bytes // 4:
+                self.counters["oversized"] += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (rows, columns, nbytes, time.monotonic())
+            self._bytes += nbytes
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+            }
+
+
+query_cache = QueryResultCache(
+    max_entries=int(os.environ.get("SQL_CACHE_MAX_ENTRIES", "256")),
+    max_bytes=int(float(os.environ.get("SQL_CACHE_MAX_MB", "32")) * 1024 * 1024),
+    ttl_s=float(os.environ.get("SQL_CACHE_TTL_S", "3600")),
+)
+
+def run_select(user_id: str, query: str):
+    """Run a read query through the result cache and the connection pool. Returns (rows, column_names)."""
+    key = (user_id, get_data_version(user_id), _normalize_sql(query))
+    cached = query_cache.get(key)
+    if cached is not None:
+        return cached
+    with sql_pool.connection() as conn:
+        results, column_names = _execute_query(conn, query)
+    query_cache.put(key, results, column_names)
+    return results, column_names
+
+
+# query_database output bounds: rows shown to the LLM, and whether to push a LIMIT into the SQL itself
+QUERY_MAX_ROWS = int(os.environ.get("QUERY_MAX_ROWS", "100"))
+QUERY_INJECT_LIMIT = os.environ.get("QUERY_INJECT_LIMIT", "false").lower() in ("1", "true", "yes")
+
+_TRAILING_LIMIT = re.compile(r"\blimit\s+\d+(\s+offset\s+\d+)?$|\bfetch\s+first\s+\d+\s+rows?\s+only$")
+
+def with_row_limit(query: str, limit: int) -> str:
+    """Append LIMIT to a query unless it already ends with one."""
+    if _TRAILING_LIMIT.search(_normalize_sql(query)):
+        return query
+    return f"{query.strip().rstrip(';').rstrip()} LIMIT {limit}"
+
+def _format_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (dt.date, dt.datetime)):
+        return value.isoformat()
+    if isinstance(value, float):
+        return f"{value:.10g}"
+    return str(value)
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+
+def summarize_rows(rows: list, columns: list) -> str:
+    """Totals and min/max of numeric columns, and min/max of date columns, over all rows."""
+    parts = []
+    for i, col in enumerate(columns):
+        values = [row[i] for row in rows if row[i] is not None]
+        if not values:
+            continue
+        if all(_is_number(v) for v in values):
+            parts.append(
+                f"{col}: total={_format_value(sum(values))}, min={_format_value(min(values))}, max={_format_value(max(values))}"
+            )
+        elif all(isinstance(v, dt.date) for v in values):
+            parts.append(f"{col}: {_format_value(min(values))} to {_format_value(max(values))}")
+    return "; ".join(parts)
+
+def format_rows(rows: list, columns: list, max_rows: int = QUERY_MAX_ROWS, total_known: bool = True) -> str:
+    """
+    Render query results as compact CSV for the LLM.
+
+    At most max_rows rows are written; when more came back, a one-line
+    summary computed over every row replaces the rest. With total_known=False
+    (LIMIT was injected) the row count is only a lower bound.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(columns)
+    for row in rows[:max_rows]:
+        writer.writerow([_format_value(v) for v in row])
+    out = buf.getvalue().rstrip("\n")
+    if len(rows) <= max_rows:
+        return out
+    if not total_known:
+        return (
+            f"{out}\n... truncated: more than {max_rows} rows match. "
+            "Aggregate (SUM/COUNT/GROUP BY) or filter further instead of listing rows."
         )
-    else:
-        import psycopg2
-        db_url = os.environ.get("DATABASE_URL")
-        if not db_url:
-            raise ValueError("DATABASE_URL must be defined to construct raw SQL connections.")
-        return psycopg2.connect(db_url)
+    summary = summarize_rows(rows, columns)
+    return (
+        f"{out}\n... truncated: showing {max_rows} of {len(rows)} rows."
+        + (f"\nSummary over all {len(rows)} rows: {summary}" if summary else "")
+    )
+
+
+@dataclass(frozen=True)
+class ToolContext:
+    """Per-user identity and embedding settings for tools called in-process (see build_inprocess_tools)."""
+    user_id: str
+    embedding_provider: str = "google"
+    embedding_model: str = "gemini-embedding-001"
+    api_key: Optional[str] = field(default=None, repr=False)
+
+
+_tool_context: ContextVar[Optional[ToolContext]] = ContextVar("tool_context", default=None)
+
+# Artifacts (chart JSON, image URLs, transaction proposals) emitted by the tool
+# call currently running. They travel back as the tool result's artifact and
+# are never shown to the LLM.
+_tool_artifacts: ContextVar[Optional[list]] = ContextVar("tool_artifacts", default=None)
+
 
 def get_current_user_id() -> str:
+    ctx = _tool_context.get()
+    if ctx is not None:
+        return ctx.user_id
     user_id = os.environ.get("CURRENT_USER_ID")
     if not user_id:
         raise ValueError("CURRENT_USER_ID not injected into MCP environment!")
     return user_id
 
+def get_current_embeddings():
+    """The user's embedding client (cached query vectors), from the bound context or the MCP env."""
+    from backend.embeddings import get_query_embeddings
+
+    ctx = _tool_context.get()
+    if ctx is not None:
+        return get_query_embeddings(ctx.embedding_provider, ctx.embedding_model, ctx.api_key)
+    return get_query_embeddings(
+        os.environ.get("EMBEDDING_PROVIDER", "google"),
+        os.environ.get("EMBEDDING_MODEL", "gemini-embedding-001"),
+    )
+
+def emit_artifact(kind: str, data) -> None:
+    """Attach a UI artifact ("chart", "images" or "pending_transaction") to the current tool result."""
+    sink = _tool_artifacts.get()
+    if sink is not None:
+        sink.append({"type": kind, "data": data})
+
+def _call_collecting(fn, *args, **kwargs) -> tuple[str, list]:
+    """Run a tool function and return (text for the LLM, artifacts for the UI)."""
+    sink: list = []
+    token = _tool_artifacts.set(sink)
+    try:
+        return fn(*args, **kwargs), sink
+    finally:
+        _tool_artifacts.reset(token)
+
+async def _acall_collecting(fn, *args, **kwargs) -> tuple[str, list]:
+    """_call_collecting for async tool functions."""
+    sink: list = []
+    token = _tool_artifacts.set(sink)
+    try:
+        return await fn(*args, **kwargs), sink
+    finally:
+        _tool_artifacts.reset(token)
+
 def _quote_table(name: str) -> str:
     """Quote a table name appropriately for the current DB stack."""
     if DB_STACK == "databricks":
@@ -53,9 +477,12 @@ def _quote_table(name: str) -> str:
 def _execute_query(conn, query: str):
     """Execute a query and return (rows, column_names). Works with both psycopg2 and Databricks."""
     cursor = conn.cursor()
-    cursor.execute(query)
-    results = cursor.fetchall()
-    column_names = [desc[0] for desc in cursor.description] if cursor.description else []
+    try:
+        cursor.execute(query)
+        results = cursor.fetchall()
+        column_names = [desc[0] for desc in cursor.description] if cursor.description else []
+    finally:
+        cursor.close()
     return results, column_names
 
 def get_schema_info() -> str:
@@ -93,12 +520,27 @@ def get_schema_info() -> str:
     """)
 
 
-@mcp.resource("schema://database/tables")
 def get_database_schema() -> str:
     """Complete schema information for the money_rag database."""
     return get_schema_info()
 
-@mcp.tool()
+def tool_metrics() -> dict:
+    """Performance counters for the tool layer (also served at /api/v1/metrics in-process)."""
+    from backend.embeddings import embedding_cache_stats
+
+    # Not imported just to report on it: the client only exists once semantic_search has run
+    vector_db_client = sys.modules.get("backend.vector_db_client")
+    return {
+        "sql_pool": sql_pool.stats(),
+        "query_cache": query_cache.stats(),
+        "embeddings": embedding_cache_stats(),
+        "vector_db": vector_db_client.vector_client_stats() if vector_db_client else None,
+    }
+
+def get_tool_metrics() -> str:
+    """Connection pool and cache counters for this tool server."""
+    return json.dumps(tool_metrics())
+
 def query_database(query: str) -> str:
     """
     Execute a raw SQL query against the database.
@@ -125,7 +567,8 @@ def query_database(query: str) -> str:
         query: The SQL SELECT query to execute
 
     Returns:
-        Query results or error message
+        Query results as CSV (header row first) or error message. Long results are
+        truncated with a summary; prefer aggregates over listing many rows.
 
     Important Notes:
     - Only SELECT queries are allowed (read-only)
@@ -152,62 +595,122 @@ def query_database(query: str) -> str:
         return f"Error: You forgot to include the security filter (WHERE user_id = '{user_id}') in your query! Try again."
 
     try:
-        conn = get_db_connection()
-        results, column_names = _execute_query(conn, query)
-        conn.close()
+        injected = False
+        if QUERY_INJECT_LIMIT:
+            # One extra row tells us whether the result was cut off
+            limited = with_row_limit(query, QUERY_MAX_ROWS + 1)
+            injected, query = limited != query, limited
+        results, column_names = run_select(user_id, query)
 
         if not results:
             return "No results found"
 
-        # Format results nicely
-        formatted_results = []
-        formatted_results.append(f"Columns: {', '.join(column_names)}")
-        for row in results:
-            formatted_results.append(str(row))
-
-        return "\n".join(formatted_results)
+        # A query's own LIMIT returns its whole result, so only an injected one leaves the total unknown
+        return format_rows(results, column_names, QUERY_MAX_ROWS, total_known=not injected)
     except Exception as e:
         return f"Database Error: {str(e)}"
 
-@mcp.tool()
-def semantic_search(query: str, top_k: int = 5) -> str:
+# Queries one semantic_search_batch call may carry
+SEMANTIC_BATCH_MAX_QUERIES = int(os.environ.get("SEMANTIC_BATCH_MAX_QUERIES", "10"))
+
+async def semantic_search(query: str, top_k: int = 5, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                    min_amount: Optional[float] = None, max_amount: Optional[float] = None,
+                    category: Optional[str] = None, vector_type: Optional[str] = None,
+                    source_file_id: Optional[str] = None) -> str:
     """
     Search for personal financial transactions semantically.
     
     Use this to find spending when specific merchant names are unknown or ambiguous.
     Examples: "how much did I spend on fast food?", "subscriptions", "travel expenses".
+    Exact merchant or item names ("Walmart", "Uber") are matched by keyword as well as by meaning.
+    Narrow the search with the optional filters instead of asking for a large top_k.
     
     Args:
         query: The description or category of spending to look for.
         top_k: Number of results to return (default 5).
+        date_from: Only transactions on or after this date (YYYY-MM-DD).
+        date_to: Only transactions on or before this date (YYYY-MM-DD).
+        min_amount: Only amounts greater than or equal to this.
+        max_amount: Only amounts less than or equal to this.
+        category: Only this exact category (as stored in the "Transaction" table).
+        vector_type: 'transaction' for whole transactions or 'line_item' for items on bills.
+        source_file_id: Only entries imported from this uploaded CSV or bill file id.
     """
     try:
         user_id = get_current_user_id()
         
-        from backend.vector_db_client import get_vector_client
-        vdb = get_vector_client()
-        embeddings = GoogleGenerativeAIEmbeddings(model="gemini-embedding-001")
-        
-        results = vdb.semantic_search(query, user_id=user_id, top_k=top_k, embeddings_model=embeddings)
+        from backend.vector_db_client import SearchFilters, get_async_vector_client
+        filters = SearchFilters(
+            date_from=date_from, date_to=date_to, min_amount=min_amount, max_amount=max_amount,
+            category=category, vector_type=vector_type, source_file_id=source_file_id,
+        )
+        vdb = get_async_vector_client()
+        embeddings = get_current_embeddings()
         
-        if not results:
-            return "No matching transactions found."
-            
-        output = []
-        for doc in results:
-            meta = doc['metadata']
-            amount = meta.get('amount', 'N/A')
-            date = meta.get('transaction_date', 'N/A')
-            output.append(f"Date: {date} | Match: {doc['page_content']} | Amount: {amount}")
-            
-        return "\n".join(output)
+        results = await vdb.semantic_search(query, user_id=user_id, top_k=top_k, embeddings_model=embeddings, filters=filters)
+        return _format_search_results(results)
         
     except Exception as e:
         import traceback
         return f"Error performing search: {str(e)}\n{traceback.format_exc()}"
 
 
-@mcp.tool()
+def _format_search_results(results: list) -> str:
+    if not results:
+        return "No matching transactions found."
+    output = []
+    for doc in results:
+        meta = doc['metadata']
+        amount = meta.get('amount', 'N/A')
+        date = meta.get('transaction_date', 'N/A')
+        output.append(f"Date: {date} | Match: {doc['page_content']} | Amount: {amount}")
+    return "\n".join(output)
+
+
+async def semantic_search_batch(queries: list[str], top_k: int = 5, date_from: Optional[str] = None,
+                                date_to: Optional[str] = None, min_amount: Optional[float] = None,
+                                max_amount: Optional[float] = None, category: Optional[str] = None,
+                                vector_type: Optional[str] = None, source_file_id: Optional[str] = None) -> str:
+    """
+    Run several semantic searches in one call, e.g. ["coffee", "restaurants", "food delivery"].
+
+    Prefer this over consecutive semantic_search calls for related concepts: the
+    results come back grouped under each query. The filters apply to every query.
+    
+    Args:
+        queries: The descriptions or categories of spending to look for (at most 10).
+        top_k: Number of results per query (default 5).
+        date_from: Only transactions on or after this date (YYYY-MM-DD).
+        date_to: Only transactions on or before this date (YYYY-MM-DD).
+        min_amount: Only amounts greater than or equal to this.
+        max_amount: Only amounts less than or equal to this.
+        category: Only this exact category (as stored in the "Transaction" table).
+        vector_type: 'transaction' for whole transactions or 'line_item' for items on bills.
+        source_file_id: Only entries imported from this uploaded CSV or bill file id.
+    """
+    try:
+        if not queries:
+            return "Error: pass at least one query."
+        if len(queries) > SEMANTIC_BATCH_MAX_QUERIES:
+            return f"Error: at most {SEMANTIC_BATCH_MAX_QUERIES} queries per call."
+        user_id = get_current_user_id()
+
+        from backend.vector_db_client import SearchFilters, get_async_vector_client
+        filters = SearchFilters(
+            date_from=date_from, date_to=date_to, min_amount=min_amount, max_amount=max_amount,
+            category=category, vector_type=vector_type, source_file_id=source_file_id,
+        )
+        vdb = get_async_vector_client()
+        results = await vdb.semantic_search_many(
+            queries, user_id=user_id, top_k=top_k, embeddings_model=get_current_embeddings(), filters=filters
+        )
+        return "\n\n".join(f"### {query}\n{_format_search_results(found)}" for query, found in zip(queries, results))
+
+    except Exception as e:
+        import traceback
+        return f"Error performing search: {str(e)}\n{traceback.format_exc()}"
+
+
 def generate_interactive_chart(sql_query: str, chart_type: str, x_col: str, y_col: str, title: str, color_col: Optional[str] = None) -> str:
     """
     Generate an interactive Plotly chart using SQL data.
@@ -230,9 +733,10 @@ def generate_interactive_chart(sql_query: str, chart_type: str, x_col: str, y_co
         if user_id not in sql_query:
             return f'{{"error": "You forgot the WHERE user_id = \\"{user_id}\\" security clause!"}}'
             
-        conn = get_db_connection()
-        results, columns = _execute_query(conn, sql_query)
-        conn.close()
+        import pandas as pd
+        import plotly.express as px
+
+        results, columns = run_select(user_id, sql_query)
         df = pd.DataFrame(results, columns=columns)
         if df.empty:
             return '{"error": "No data found for this query."}'
@@ -273,11 +777,9 @@ def generate_interactive_chart(sql_query: str, chart_type: str, x_col: str, y_co
                 pull=0.02,
             )
 
-        # Write the huge JSON to a temp file instead of returning it directly to LLM context
-        chart_path = os.path.join(DATA_DIR, "latest_chart.json")
-        with open(chart_path, "w") as f:
-            f.write(fig.to_json())
-            
+        # Hand the huge JSON to the UI as an artifact instead of returning it to the LLM context
+        emit_artifact("chart", fig.to_json())
+
         # Summarise the data so the LLM can write a useful text analysis
         summary_parts = [f"Chart generated ({chart_type}): '{title}'"]
         summary_parts.append(f"Data: {len(df)} rows, columns={list(df.columns)}")
@@ -294,7 +796,7 @@ def generate_interactive_chart(sql_query: str, chart_type: str, x_col: str, y_co
         
     except Exception as e:
         return f'{{"error": "Failed to generate chart: {str(e)}"}}'
-@mcp.tool()
+
 def get_bill_images(sql_query: str) -> str:
     """
     Get image URLs for specific uploaded bills and receipts so they can be displayed to the user in the UI.
@@ -318,13 +820,13 @@ def get_bill_images(sql_query: str) -> str:
         if user_id not in sql_query:
             return f'{{"error": "You forgot the WHERE user_id = \\"{user_id}\\" security clause!"}}'
             
-        conn = get_db_connection()
-        results, _ = _execute_query(conn, sql_query)
-        conn.close()
+        results, _ = run_select(user_id, sql_query)
 
         if not results:
             return '{"error": "No bills found for this query."}'
 
+        from supabase import create_client
+
         url = os.environ.get("SUPABASE_URL")
         key = os.environ.get("SUPABASE_KEY")
         supabase = create_client(url, key)
@@ -338,19 +840,14 @@ def get_bill_images(sql_query: str) -> str:
         if not urls:
             return '{"error": "No image keys found in result set."}'
             
-        import json
-        
-        # Write image URLs to a temp file that the main UI can pick up and render alongside the chat
-        chart_path = os.path.join(DATA_DIR, "latest_images.json")
-        with open(chart_path, "w") as f:
-            json.dump(urls, f)
-            
+        # Hand the image URLs to the UI so it can render them alongside the chat
+        emit_artifact("images", urls)
+
         return "Images retrieved successfully! I have sent the image URLs to the user's UI. You can tell the user the receipt is attached."
         
     except Exception as e:
         return f'{{"error": "Failed to retrieve images: {str(e)}"}}'
 
-@mcp.tool()
 def propose_transaction(
     description: str,
     amount: float,
@@ -375,9 +872,8 @@ def propose_transaction(
         merchant_name: Clean merchant/recipient name. Defaults to description.
 
     Returns:
-        JSON string with the proposed transaction details for UI confirmation.
+        The proposed transaction details; the UI shows them in a confirmation card.
     """
-    import json
     from datetime import date as date_type
 
     # Default date to today if not provided
@@ -403,15 +899,114 @@ def propose_transaction(
         "merchant_name": merchant_name or description,
     }
 
-    result = json.dumps(proposal)
+    emit_artifact("pending_transaction", proposal)
 
     return (
-        f"===CONFIRM_TX==={result}===ENDCONFIRM_TX===\n\n"
+        f"Proposed transaction: {json.dumps(proposal)}\n\n"
         "I've prepared this transaction for your review. "
         "Please check the details in the confirmation card and tap Confirm to save it."
     )
 
 
+TOOLS = [query_database, semantic_search, semantic_search_batch, generate_interactive_chart, get_bill_images,
+         propose_transaction]
+
+
+def _tool_result(text: str, artifacts: list):
+    from fastmcp.tools.tool import ToolResult
+
+    if not artifacts:
+        return text
+    return ToolResult(content=text, structured_content={"artifacts": artifacts})
+
+
+def _mcp_tool(fn):
+    """
+    MCP wrapper: artifacts ride along as structured content next to the text.
+
+    Async tools stay async so FastMCP awaits them instead of running them
+    inline on its event loop.
+    """
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def awrapped(*args, **kwargs):
+            return _tool_result(*await _acall_collecting(fn, *args, **kwargs))
+        return awrapped
+
+    @functools.wraps(fn)
+    def wrapped(*args, **kwargs):
+        return _tool_result(*_call_collecting(fn, *args, **kwargs))
+    return wrapped
+
+
+_server = None
+
+def create_server():
+    """The FastMCP server with the schema/metrics resources and TOOLS registered (built once)."""
+    global _server
+    if _server is None:
+        from fastmcp import FastMCP
+
+        server = FastMCP("Money RAG Financial Analyst")
+        server.resource("schema://database/tables")(get_database_schema)
+        server.resource("metrics://tools")(get_tool_metrics)
+        for fn in TOOLS:
+            server.tool(output_schema=None)(_mcp_tool(fn))
+        _server = server
+    return _server
+
+def __getattr__(name):
+    # Keeps `mcp_server:mcp` working for fastmcp's CLI without importing fastmcp eagerly
+    if name == "mcp":
+        return create_server()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _bind_context(fn, ctx: ToolContext):
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def abound(*args, **kwargs):
+            token = _tool_context.set(ctx)
+            try:
+                return await _acall_collecting(fn, *args, **kwargs)
+            finally:
+                _tool_context.reset(token)
+        return abound
+
+    @functools.wraps(fn)
+    def bound(*args, **kwargs):
+        token = _tool_context.set(ctx)
+        try:
+            return _call_collecting(fn, *args, **kwargs)
+        finally:
+            _tool_context.reset(token)
+    return bound
+
+
+def build_inprocess_tools(user_id: str, embedding_provider: str = "google",
+                          embedding_model: str = "gemini-embedding-001", api_key: Optional[str] = None) -> list:
+    """
+    Wrap TOOLS as LangChain tools that run in the calling process.
+
+    Same names, signatures and docstrings as the MCP tools, but no stdio
+    JSON-RPC hop; the user's identity is bound here rather than read from
+    the CURRENT_USER_ID env var. Artifacts come back as ToolMessage.artifact.
+    Async tools are registered as coroutines, so the agent awaits them on the
+    app's event loop rather than in an executor thread.
+    """
+    from langchain_core.tools import StructuredTool
+
+    ctx = ToolContext(user_id, embedding_provider, embedding_model, api_key)
+    tools = []
+    for fn in TOOLS:
+        bound = _bind_context(fn, ctx)
+        if inspect.iscoroutinefunction(fn):
+            tools.append(StructuredTool.from_function(coroutine=bound, response_format="content_and_artifact"))
+        else:
+            tools.append(StructuredTool.from_function(bound, response_format="content_and_artifact"))
+    return tools
+
+
 if __name__ == "__main__":
     # Runs the server over stdio
-    mcp.run(transport="stdio")
+    create_server().run(transport="stdio")
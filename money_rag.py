@@ -1,35 +1,88 @@
 import os
 import sys
+import time
 import uuid
 import asyncio
-import pandas as pd
+import itertools
 import sqlite3
 import shutil
 import tempfile
-from typing import List, Optional
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
 
-from langchain.chat_models import init_chat_model
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_core.tools import tool
-from langchain_community.utilities import SQLDatabase
-from langgraph.runtime import get_runtime
-from langgraph.checkpoint.memory import InMemorySaver
-from langchain.agents import create_agent
-from langchain_community.tools import DuckDuckGoSearchRun
-from langchain_mcp_adapters.client import MultiServerMCPClient  
-from backend.vector_db_client import get_vector_client
-
-# Import specific embeddings
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_openai import OpenAIEmbeddings
+from backend.data_version import bump_data_version
+from backend.embeddings import get_embeddings, normalize_provider
 
 from supabase import create_client, ClientOptions
 
+# pandas, the agent/graph stack, the MCP client, web search and the vector DB
+# client are imported on first use: ingestion workers never build an agent,
+# and chat turns never touch pandas.
+if TYPE_CHECKING:
+    import pandas as pd
+    from langchain_community.utilities import SQLDatabase
+    from langchain_mcp_adapters.client import MultiServerMCPClient
+
 from dotenv import load_dotenv
 load_dotenv()
 
+# Transactions read per page during vector sync; keep it under PostgREST's max-rows (1000 by default)
+SYNC_PAGE_SIZE = int(os.environ.get("SYNC_PAGE_SIZE", "500"))
+# Only the columns vector sync turns into embedding text and payloads
+SYNC_TRANSACTION_COLUMNS = (
+    "id,trans_date,description,merchant_name,amount,category,enriched_info,source_csv_id,source_bill_file_id"
+)
+SYNC_DETAIL_COLUMNS = "id,transaction_id,item_description,item_total_price,enriched_info"
+# Postgres / PostgREST error codes and Databricks error classes for a column or table that doesn't exist
+_MISSING_SCHEMA_ERRORS = (
+    "42703", "42P01", "PGRST204", "PGRST205", "UNRESOLVED_COLUMN", "TABLE_OR_VIEW_NOT_FOUND",
+)
+
+
+def _is_missing_schema(error: Exception) -> bool:
+    """Whether a DB error means a column or table is missing (as opposed to a transient failure)."""
+    code = str(getattr(error, "code", "") or "")
+    return code in _MISSING_SCHEMA_ERRORS or any(marker in str(error) for marker in _MISSING_SCHEMA_ERRORS)
+
+SYSTEM_PROMPT = (
+    "You are a financial analyst. Use the provided tools to query the database "
+    "and perform semantic searches. Spending is POSITIVE (>0). "
+    "IMPORTANT: Whenever possible and relevant (e.g. when discussing trends, comparing categories, or showing breakdowns), "
+    "you MUST proactively use the 'generate_interactive_chart' tool to generate visual plots (bar, pie, or line charts) to accompany your analysis. "
+    "CRITICAL RULE FOR RESPONSES: After calling any chart or data tool, you MUST write a detailed text analysis "
+    "that includes: (1) a summary of the key numbers, (2) the top and bottom items, (3) any notable patterns or insights. "
+    "The chart appears below your text automatically — your text analysis is the PRIMARY response the user reads. "
+    "Never respond with just a single sentence when data is available. "
+    "WARNING: You MUST use the actual tool call to generate the chart. DO NOT output raw chart JSON in your text.\n"
+    "MANUAL TRANSACTIONS: When the user describes a transaction they made (e.g., 'I gave X $100', "
+    "'I spent $50 at Target', 'paid rent $1200'), you MUST use the 'propose_transaction' tool. "
+    "Extract the amount, description, date (default today), category, and merchant name from the user's message. "
+    "Do NOT insert transactions directly — always let the user confirm via the UI card, "
+    "which is shown automatically after the tool call."
+)
+
+
+def _tool_artifacts(output) -> list:
+    """UI artifacts attached to a tool result (see mcp_server.emit_artifact).
+
+    In-process tools put the list straight on ToolMessage.artifact; over MCP it
+    arrives as {"structured_content": {"artifacts": [...]}}.
+    """
+    artifact = getattr(output, "artifact", None)
+    if isinstance(artifact, dict):
+        artifact = (artifact.get("structured_content") or {}).get("artifacts")
+    return artifact if isinstance(artifact, list) else []
+
+
+def _init_chat_model(provider_name: str, model_name: str):
+    """Chat model for the provider, importing only that provider's LangChain package."""
+    if provider_name == "google_genai":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(model=model_name)
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=model_name)
+
+
 class MoneyRAG:
     def __init__(self, llm_provider: str, model_name: str, embedding_model_name: str, api_key: str, user_id: str, access_token: str = None):
         self.llm_provider = llm_provider.lower()
@@ -37,6 +90,8 @@ class MoneyRAG:
         self.embedding_model_name = embedding_model_name
         self.user_id = user_id
         self._db_stack = os.environ.get("POSTGRESSQL_STACK", "supabase").lower()
+        # "mcp" = tools served by mcp_server.py over stdio, "inprocess" = same functions called directly
+        self.tool_transport = os.environ.get("CHAT_TOOL_TRANSPORT", "mcp").lower()
 
         # Initialize Supabase Client (always needed for auth, storage; also for data if stack=supabase)
         url = os.environ.get("SUPABASE_URL")
@@ -60,34 +115,51 @@ class MoneyRAG:
             )
         
         # Set API Keys
+        self._api_key = api_key
         if self.llm_provider == "google":
             os.environ["GOOGLE_API_KEY"] = api_key
-            self.embeddings = GoogleGenerativeAIEmbeddings(model=embedding_model_name)
             provider_name = "google_genai"
         else:
             os.environ["OPENAI_API_KEY"] = api_key
-            self.embeddings = OpenAIEmbeddings(model=embedding_model_name)
             provider_name = "openai"
+        # Shared per process: instances for the same provider/model/key reuse one client
+        self.embeddings = get_embeddings(self.llm_provider, embedding_model_name, api_key)
 
         # Initialize LLM
-        self.llm = init_chat_model(
-            self.model_name,
-            model_provider=provider_name,
-        )
+        self.llm = _init_chat_model(provider_name, self.model_name)
 
         # Temporary paths for this session
         self.temp_dir = tempfile.mkdtemp()
-        os.environ["DATA_DIR"] = self.temp_dir # Harmonize with mcp_server.py 
         self.db_path = os.path.join(self.temp_dir, "money_rag.db")
         self.db_path = os.path.join(self.temp_dir, "money_rag.db")
         
-        self.db: Optional[SQLDatabase] = None
-        self.vector_store_client = None
+        self.db: Optional["SQLDatabase"] = None
+        self.last_sync_stats = None
         self.agent = None
-        self.mcp_client: Optional[MultiServerMCPClient] = None
-        self.search_tool = DuckDuckGoSearchRun()
+        self.mcp_client: Optional["MultiServerMCPClient"] = None
+        self._inprocess_tools: Optional[list] = None
+        self._agent_tools: list = []
+        self.perf_counters = {"agent_builds": 0, "agent_reuses": 0, "agent_build_ms_total": 0.0}
+        self._search_tool = None
         self.merchant_cache = {}  # Session-based cache for merchant enrichment
-        self.memory = InMemorySaver()  # Session-based cache for chat memory
+        self._memory = None  # Session-based cache for chat memory
+        self._background_tasks = set()  # Vector purges started by delete_file
+
+    @property
+    def search_tool(self):
+        """Web search used for merchant enrichment (ingestion only)."""
+        if self._search_tool is None:
+            from langchain_community.tools import DuckDuckGoSearchRun
+            self._search_tool = DuckDuckGoSearchRun()
+        return self._search_tool
+
+    @property
+    def memory(self):
+        """Chat checkpointer, kept for the life of the instance across agent rebuilds."""
+        if self._memory is None:
+            from langgraph.checkpoint.memory import InMemorySaver
+            self._memory = InMemorySaver()
+        return self._memory
 
     # --- Database abstraction helpers (Supabase vs Databricks) ---
 
@@ -116,6 +188,52 @@ class MoneyRAG:
             res = q.execute()
             return res.data or []
 
+    def _db_select_page(self, table: str, columns: str, filters: dict = None, after_id: Optional[str] = None,
+                        limit: int = SYNC_PAGE_SIZE, in_filter: Optional[Tuple[str, list]] = None) -> List[dict]:
+        """SELECT up to limit rows ordered by id, starting after after_id (keyset pagination)."""
+        if self._db_stack == "databricks":
+            where_parts = []
+            values = []
+            for k, v in (filters or {}).items():
+                where_parts.append(f"{k} = ?")
+                values.append(v)
+            if in_filter:
+                where_parts.append(f"{in_filter[0]} IN ({','.join(['?'] * len(in_filter[1]))})")
+                values.extend(in_filter[1])
+            if after_id is not None:
+                where_parts.append("id > ?")
+                values.append(after_id)
+            where = " AND ".join(where_parts) if where_parts else "1=1"
+            with self._databricks_conn.cursor() as cur:
+                cur.execute(f"SELECT {columns} FROM {table} WHERE {where} ORDER BY id LIMIT {int(limit)}", values)
+                rows = cur.fetchall()
+                if not rows:
+                    return []
+                col_names = [desc[0] for desc in cur.description]
+                return [dict(zip(col_names, r)) for r in rows]
+        else:
+            q = self.supabase.table(table).select(columns)
+            for k, v in (filters or {}).items():
+                q = q.eq(k, v)
+            if in_filter:
+                q = q.in_(in_filter[0], in_filter[1])
+            if after_id is not None:
+                q = q.gt("id", after_id)
+            res = q.order("id").limit(limit).execute()
+            return res.data or []
+
+    def _db_pages(self, table: str, columns: str, filters: dict = None, page_size: int = SYNC_PAGE_SIZE,
+                  in_filter: Optional[Tuple[str, list]] = None) -> Iterator[List[dict]]:
+        """Every matching row, page_size at a time; unlike _db_select, never cut off by a server row cap."""
+        after_id = None
+        while True:
+            rows = self._db_select_page(table, columns, filters, after_id, page_size, in_filter)
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            after_id = str(rows[-1]["id"])
+
     def _db_select_in(self, table: str, columns: str, field: str, values_list: list) -> List[dict]:
         """SELECT rows WHERE field IN (...)."""
         if not values_list:
@@ -224,10 +342,13 @@ class MoneyRAG:
                     all_duplicates.extend(dups)
             except Exception as e:
                 raise RuntimeError(f"Failed to ingest '{file_name}': {e}") from e
+            finally:
+                bump_data_version(self.user_id)
 
         try:
+            from langchain_community.utilities import SQLDatabase
             self.db = SQLDatabase.from_uri(f"sqlite:///{self.db_path}")
-            self.vector_store_client = self._sync_to_vectordb()
+            self.last_sync_stats = await self._sync_to_vectordb()
         except Exception as e:
             raise RuntimeError(f"Failed to sync to vector store: {e}") from e
         return all_duplicates
@@ -235,6 +356,9 @@ class MoneyRAG:
     async def _ingest_csv(self, file_path, csv_id=None):
         import hashlib
         import json
+        import pandas as pd
+        from langchain_core.output_parsers import JsonOutputParser
+        from langchain_core.prompts import ChatPromptTemplate
 
         filename = os.path.basename(file_path)
 
@@ -416,6 +540,8 @@ Return ONLY valid JSON with exactly these two fields:
         import base64
         import hashlib
         import json
+        from langchain_core.output_parsers import JsonOutputParser
+        from langchain_core.prompts import ChatPromptTemplate
         from langchain_core.messages import HumanMessage
         
         print(f"   📸 Processing bill image: {os.path.basename(file_path)}...")
@@ -586,93 +712,177 @@ Return ONLY valid JSON with exactly these two fields:
 
         return duplicates
 
-    def _sync_to_vectordb(self):
-        # Fetch only THIS USER'S transactions to sync into VectorDB
-        rows = self._db_select("Transaction", "*", {"user_id": self.user_id})
-        df = pd.DataFrame(rows)
+    def _sync_pages(self) -> Iterator[Tuple["pd.DataFrame", Optional["pd.DataFrame"]]]:
+        """
+        THIS USER'S transactions for vector sync, SYNC_PAGE_SIZE at a time, each page with its line items.
+
+        Blocking (run each step in a thread). Only SYNC_TRANSACTION_COLUMNS /
+        SYNC_DETAIL_COLUMNS are read, falling back to every column on schemas
+        that lack one of them; any other read error fails the sync. Without a
+        line items table, pages carry None instead of line items (so the sync
+        keeps their vectors).
+        """
+        import pandas as pd
 
-        # Try to fetch TransactionDetail
+        filters = {"user_id": self.user_id}
+        pages = self._db_pages("Transaction", SYNC_TRANSACTION_COLUMNS, filters)
         try:
-            detail_rows = self._db_select("TransactionDetail", "*", {"user_id": self.user_id})
-            details_df = pd.DataFrame(detail_rows)
-            if not details_df.empty and not df.empty:
-                details_df = details_df[details_df['transaction_id'].isin(df['id'])]
-        except Exception:
-            details_df = pd.DataFrame()
+            first = next(pages, None)
+        except Exception as e:
+            # e.g. no merchant_name before the migration; anything else (network, auth) is not a schema problem
+            if not _is_missing_schema(e):
+                raise
+            print(f"   ⚠️ Could not select sync columns ({e}); reading all columns")
+            pages = self._db_pages("Transaction", "*", filters)
+            first = next(pages, None)
+        if first is None:
+            return
+
+        detail_columns = SYNC_DETAIL_COLUMNS
+        for rows in itertools.chain([first], pages):
+            df = pd.DataFrame(rows)
+            detail_rows = []
+            # Line items of this page only, looked up 100 parent ids at a time to keep request URLs short
+            ids = df['id'].astype(str).tolist()
+            for i in range(0, len(ids), 100):
+                while detail_columns is not None:
+                    try:
+                        batch = [row for detail_page in self._db_pages("TransactionDetail", detail_columns, filters,
+                                                                       in_filter=("transaction_id", ids[i:i+100]))
+                                 for row in detail_page]
+                        detail_rows.extend(batch)
+                        break
+                    except Exception as e:
+                        if not _is_missing_schema(e):
+                            raise
+                        # Retry with every column, then give up on line items (table might not exist)
+                        print(f"   ⚠️ Could not read line items with columns {detail_columns} ({e})")
+                        detail_columns = "*" if detail_columns != "*" else None
+            yield df, pd.DataFrame(detail_rows) if detail_columns is not None else None
+
+    async def _sync_to_vectordb(self):
+        from backend.vector_db_client import get_vector_client
 
         vdb = get_vector_client()
-        return vdb.sync_transactions(df, details_df, self.user_id, self.embeddings)
+        return await vdb.sync_transaction_pages(self._sync_pages(), self.user_id, self.embeddings)
 
-    async def delete_file(self, file_id: str, file_type: str = 'csv'):
-        """Force delete a file and all its transactions from the database and vector store."""
-        try:
-            if file_type == 'csv':
-                self._db_delete("Transaction", {"source_csv_id": file_id})
-                self._db_delete("CSVFile", {"id": file_id})
-            else:
-                self._db_delete("TransactionDetail", {"bill_file_id": file_id})
-                self._db_delete("BillFile", {"id": file_id})
+    def _delete_file_rows(self, file_id: str, file_type: str):
+        if file_type == 'csv':
+            self._db_delete("Transaction", {"source_csv_id": file_id})
+            self._db_delete("CSVFile", {"id": file_id})
+        else:
+            self._db_delete("TransactionDetail", {"bill_file_id": file_id})
+            self._db_delete("BillFile", {"id": file_id})
+
+    async def delete_file(self, file_id: str, file_type: str = 'csv') -> Optional[asyncio.Task]:
+        """
+        Force delete a file and all its transactions from the database and vector store.
 
-            # Delete from Vector Database
-            vdb = get_vector_client()
-            vdb.delete_file_vectors(file_id, file_type)
+        The database rows are gone when this returns; the vectors are purged by
+        the returned background task (awaited by cleanup()), so callers don't
+        wait on the vector DB.
+        """
+        try:
+            await asyncio.to_thread(self._delete_file_rows, file_id, file_type)
+            bump_data_version(self.user_id)
         except Exception as e:
             print(f"Error purging file data: {e}")
+            return None
+
+        task = asyncio.create_task(self._delete_file_vectors(file_id, file_type), name=f"delete-vectors-{file_id}")
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    async def _delete_file_vectors(self, file_id: str, file_type: str) -> int:
+        from backend.vector_db_client import get_async_vector_client
 
-    async def chat(self, query: str):
-        """Async generator that yields status events + final response."""
+        try:
+            vdb = get_async_vector_client()
+            deleted = await vdb.delete_file_vectors(file_id, file_type, self.user_id)
+            print(f"   🗑️ Removed {deleted} vectors of {file_type} file {file_id}")
+            return deleted
+        except Exception as e:
+            print(f"Error purging file vectors: {e}")
+            return 0
+
+    def mcp_connection(self) -> dict:
+        """stdio connection config for this user's mcp_server.py process."""
         server_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcp_server.py")
-        
-        mcp_client = MultiServerMCPClient(
-            {
-                "money_rag": {
-                    "transport": "stdio",
-                    "command": sys.executable,
-                    "args": [server_path],
-                    "env": {**os.environ.copy(), "CURRENT_USER_ID": self.user_id},
-                }
-            }
+        return {
+            "transport": "stdio",
+            "command": sys.executable,
+            "args": [server_path],
+            "env": {
+                **os.environ.copy(),
+                "CURRENT_USER_ID": self.user_id,
+                "EMBEDDING_PROVIDER": normalize_provider(self.llm_provider),
+                "EMBEDDING_MODEL": self.embedding_model_name,
+                # os.environ holds whichever user's key was set last; pin this user's
+                "GOOGLE_API_KEY" if self.llm_provider == "google" else "OPENAI_API_KEY": self._api_key,
+            },
+        }
+
+    def inprocess_tools(self) -> list:
+        """mcp_server.py tool functions bound to this user, without the stdio hop."""
+        if self._inprocess_tools is None:
+            from mcp_server import build_inprocess_tools
+            self._inprocess_tools = build_inprocess_tools(
+                self.user_id, normalize_provider(self.llm_provider), self.embedding_model_name, self._api_key
+            )
+        return self._inprocess_tools
+
+    def _get_agent(self, tools: list):
+        """Compiled agent graph, rebuilt only when the tool objects change."""
+        same_tools = len(tools) == len(self._agent_tools) and all(a is b for a, b in zip(tools, self._agent_tools))
+        if self.agent is not None and same_tools:
+            self.perf_counters["agent_reuses"] += 1
+            return self.agent
+
+        from langchain.agents import create_agent
+
+        start = time.perf_counter()
+        self.agent = create_agent(
+            model=self.llm,
+            tools=tools,
+            system_prompt=SYSTEM_PROMPT,
+            checkpointer=self.memory,
         )
+        self._agent_tools = list(tools)
+        build_ms = (time.perf_counter() - start) * 1000
+        self.perf_counters["agent_builds"] += 1
+        self.perf_counters["agent_build_ms_total"] += build_ms
+        print(f"   🔧 Compiled chat agent with {len(tools)} tools in {build_ms:.1f}ms")
+        return self.agent
+
+    async def chat(self, query: str, tools: Optional[list] = None):
+        """Async generator that yields status events + final response.
+
+        Pass `tools` from RAGManager.get_tools (warm MCP session or in-process)
+        to skip spawning mcp_server.py for this turn.
+        """
+        mcp_client = None
+        if tools is None:
+            if self.tool_transport == "inprocess":
+                tools = self.inprocess_tools()
+            else:
+                from langchain_mcp_adapters.client import MultiServerMCPClient
+                mcp_client = MultiServerMCPClient({"money_rag": self.mcp_connection()})
 
         try:
-            mcp_tools = await mcp_client.get_tools()
-
-            system_prompt = (
-                "You are a financial analyst. Use the provided tools to query the database "
-                "and perform semantic searches. Spending is POSITIVE (>0). "
-                "IMPORTANT: Whenever possible and relevant (e.g. when discussing trends, comparing categories, or showing breakdowns), "
-                "you MUST proactively use the 'generate_interactive_chart' tool to generate visual plots (bar, pie, or line charts) to accompany your analysis. "
-                "CRITICAL RULE FOR RESPONSES: After calling any chart or data tool, you MUST write a detailed text analysis "
-                "that includes: (1) a summary of the key numbers, (2) the top and bottom items, (3) any notable patterns or insights. "
-                "The chart appears below your text automatically — your text analysis is the PRIMARY response the user reads. "
-                "Never respond with just a single sentence when data is available. "
-                "WARNING: You MUST use the actual tool call to generate the chart. DO NOT output raw chart JSON in your text.\n"
-                "MANUAL TRANSACTIONS: When the user describes a transaction they made (e.g., 'I gave X $100', "
-                "'I spent $50 at Target', 'paid rent $1200'), you MUST use the 'propose_transaction' tool. "
-                "Extract the amount, description, date (default today), category, and merchant name from the user's message. "
-                "Do NOT insert transactions directly — always let the user confirm via the UI card. "
-                "CRITICAL: You MUST include the ===CONFIRM_TX=== marker output from the tool in your response EXACTLY as returned. "
-                "Do not remove or modify the marker content."
-            )
-            
-            agent = create_agent(
-                model=self.llm,
-                tools=mcp_tools,
-                system_prompt=system_prompt,
-                checkpointer=self.memory,
-            )
+            if mcp_client is not None:
+                tools = await mcp_client.get_tools()
+
+            agent = self._get_agent(tools)
 
             config = {"configurable": {"thread_id": "session_1"}}
-            
-            chart_path = os.path.join(self.temp_dir, "latest_chart.json")
-            if os.path.exists(chart_path):
-                os.remove(chart_path)
-                
-            images_path = os.path.join(self.temp_dir, "latest_images.json")
-            if os.path.exists(images_path):
-                os.remove(images_path)
-
-            # Stream events so we can yield live tool-call updates
+
+            # UI artifacts produced by tools during this turn only
+            charts: list[str] = []
+            images: list[str] = []
+            pending_transactions: list[dict] = []
+
+            # Stream events so we can yield live tool-call updates and text deltas
             # Accumulate all AI text tokens across the full agent run
             ai_text_chunks: list[str] = []
             async for event in agent.astream_events(
@@ -695,44 +905,58 @@ Return ONLY valid JSON with exactly these two fields:
                 elif kind == "on_tool_end":
                     tool_name = event.get("name", "tool")
                     output = event.get("data", {}).get("output", "")
-                    snippet = str(output)[:200].replace("\n", " ")
+                    for artifact in _tool_artifacts(output):
+                        if artifact.get("type") == "chart":
+                            charts.append(artifact["data"])
+                        elif artifact.get("type") == "images":
+                            images.extend(artifact["data"])
+                        elif artifact.get("type") == "pending_transaction":
+                            pending_transactions.append(artifact["data"])
+                    text = getattr(output, "content", output)
+                    if isinstance(text, list):
+                        # MCP tools return content blocks
+                        text = " ".join(b.get("text", "") for b in text if isinstance(b, dict))
+                    snippet = str(text)[:200].replace("\n", " ")
                     yield {"type": "tool_end", "name": tool_name, "snippet": snippet}
 
                 elif kind == "on_chat_model_stream":
-                    # Collect streamed AI text tokens
+                    # Forward streamed AI text as it arrives, and keep it for the final event
                     chunk = event.get("data", {}).get("chunk")
                     if chunk and hasattr(chunk, "content"):
                         raw = chunk.content
+                        deltas = []
                         if isinstance(raw, str) and raw:
-                            ai_text_chunks.append(raw)
+                            deltas.append(raw)
                         elif isinstance(raw, list):
                             for block in raw:
                                 if isinstance(block, dict) and block.get("type") == "text" and block.get("text"):
-                                    ai_text_chunks.append(block["text"])
+                                    deltas.append(block["text"])
+                        for delta in deltas:
+                            ai_text_chunks.append(delta)
+                            yield {"type": "token", "content": delta}
 
             final_content = "".join(ai_text_chunks).strip()
 
-            # Build final response (with optional chart and images)
-            if os.path.exists(chart_path):
-                with open(chart_path, "r") as f:
-                    chart_json = f.read()
-                final_content = f"{final_content}\n\n===CHART===\n{chart_json}\n===ENDCHART==="
-                
-            if os.path.exists(images_path):
-                with open(images_path, "r") as f:
-                    images_json = f.read()
-                final_content = f"{final_content}\n\n===IMAGES===\n{images_json}\n===ENDIMAGES==="
-                
-            yield {"type": "final", "content": final_content}
+            yield {
+                "type": "final",
+                "content": final_content,
+                "charts": charts,
+                "images": images,
+                "pendingTransactions": pending_transactions,
+            }
             
         finally:
-            try:
-                await mcp_client.__aexit__(None, None, None)
-            except Exception as close_e:
-                print(f"Warning on closing MCP Client: {close_e}")
+            if mcp_client is not None:
+                try:
+                    await mcp_client.__aexit__(None, None, None)
+                except Exception as close_e:
+                    print(f"Warning on closing MCP Client: {close_e}")
 
     async def cleanup(self):
         """Delete temporary session files and close MCP client."""
+        if self._background_tasks:
+            # Let pending vector purges finish rather than leave orphans behind
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
         if os.path.exists(self.temp_dir):
             try:
                 shutil.rmtree(self.temp_dir)
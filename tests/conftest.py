@@ -0,0 +1,100 @@
+"""
+Shared fixtures: VectorDBClient built through its own __init__ against in-memory
+backends, with data versions, model metadata and embedding caches kept out of
+the host's temp dir.
+"""
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import qdrant_client  # noqa: E402
+
+from backend import data_version, embeddings, model_metadata, vector_db_client  # noqa: E402
+from backend.config import Settings  # noqa: E402
+from backend.vector_db_client import VectorDBClient  # noqa: E402
+
+
+class _Field:
+    def __init__(self, key):
+        self.key = key
+
+    def eq(self, value):
+        return self.key, value
+
+
+class _Filter:
+    def __init__(self, conditions=()):
+        self.conditions = list(conditions)
+
+    def must(self, condition):
+        return _Filter(self.conditions + [condition])
+
+
+class _Record:
+    def __init__(self, id, payload):
+        self.id = id
+        self.payload = payload
+
+
+class FakeCortex:
+    """Minimal Actian Cortex client: records in insertion order, queried with limit/offset unless honour_offset is off."""
+
+    def __init__(self, records, honour_offset=True):
+        self.records = records
+        self.honour_offset = honour_offset
+        self.queries = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def has_collection(self, collection_name):
+        return True
+
+    def get_or_create_collection(self, name, dimension, distance_metric):
+        self.dimension = getattr(self, "dimension", dimension)
+
+    def query(self, collection_name, filter, limit, offset=0):
+        self.queries += 1
+        matching = [
+            _Record(i, p) for i, p in self.records.items() if all(p.get(k) == v for k, v in filter.conditions)
+        ]
+        start = offset if self.honour_offset else 0
+        return matching[start:start + limit]
+
+
+@pytest.fixture(autouse=True)
+def scratch_state(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_version, "DATA_VERSION_DIR", str(tmp_path / "data-versions"))
+    monkeypatch.setattr(model_metadata, "MODEL_METADATA_PATH", str(tmp_path / "model-metadata.json"))
+    monkeypatch.setattr(model_metadata, "_learned", None)
+    # No persistent embedding cache: what a fake model counts is exactly what a provider would be sent
+    monkeypatch.setattr(embeddings, "EMBEDDING_CACHE_BACKEND", "none")
+
+
+@pytest.fixture
+def make_client(monkeypatch):
+    """make_client(stack, cortex=None): a VectorDBClient on in-memory Qdrant, or on the given FakeCortex."""
+    in_memory = qdrant_client.QdrantClient
+
+    def make(stack: str = "qdrant", cortex: FakeCortex = None) -> VectorDBClient:
+        settings = Settings(
+            VECTOR_DB_STACK=stack, SUPABASE_URL="x", SUPABASE_KEY="x", QDRANT_URL="x", QDRANT_API_KEY="x",
+            DATABASE_URL="x",
+        )
+        monkeypatch.setattr(vector_db_client, "get_settings", lambda: settings)
+        monkeypatch.setattr(qdrant_client, "QdrantClient", lambda **_: in_memory(":memory:"))
+        if cortex is not None:
+            monkeypatch.setitem(sys.modules, "cortex", types.SimpleNamespace(
+                CortexClient=lambda **_: cortex, Filter=_Filter, Field=_Field,
+                DistanceMetric=types.SimpleNamespace(COSINE="cosine"),
+            ))
+        return VectorDBClient()
+
+    return make
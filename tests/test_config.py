@@ -0,0 +1,25 @@
+"""
+Settings only require the credentials of the vector stack in use.
+"""
+import pytest
+from pydantic import ValidationError
+
+from backend.config import Settings
+
+# _env_file=None: a developer's .env must not leak in
+REQUIRED = {"SUPABASE_URL": "x", "SUPABASE_KEY": "x", "DATABASE_URL": "x", "_env_file": None}
+
+
+@pytest.fixture(autouse=True)
+def no_qdrant_env(monkeypatch):
+    monkeypatch.delenv("QDRANT_URL", raising=False)
+    monkeypatch.delenv("QDRANT_API_KEY", raising=False)
+
+
+def test_local_stack_needs_no_qdrant_credentials():
+    assert Settings(VECTOR_DB_STACK="local", **REQUIRED).QDRANT_URL is None
+
+
+def test_qdrant_stack_requires_its_url():
+    with pytest.raises(ValidationError, match="QDRANT_URL"):
+        Settings(VECTOR_DB_STACK="qdrant", **REQUIRED)
@@ -0,0 +1,80 @@
+"""
+BM25 keyword index behind semantic_search's hybrid mode.
+"""
+import pandas as pd
+
+from backend.keyword_index import KeywordIndex
+from backend.vector_db_client import build_sync_payloads
+
+
+def test_raw_bank_description_is_searchable():
+    df = pd.DataFrame({
+        "id": ["00000000-0000-0000-0000-000000000001", "00000000-0000-0000-0000-000000000002"],
+        "trans_date": "2024-05-01",
+        "description": ["SQ *BLUE BOTTLE #0412", "AMZN MKTP US*2K4"],
+        "merchant_name": ["Blue Bottle Coffee", "Amazon"],
+        "amount": [5.5, 30.0],
+        "category": ["Dining", "Shopping"],
+    })
+    _, payloads, _ = build_sync_payloads(df, pd.DataFrame(), "u1")
+    index = KeywordIndex(payloads)
+
+    (doc, _, exact), = index.search("SQ 0412", 5)
+    assert payloads[doc]["merchant_name"] == "Blue Bottle Coffee" and exact
+    assert payloads[index.search("amzn mktp", 5)[0][0]]["merchant_name"] == "Amazon"
+
+
+def doc(id, text, merchant=None, vector_type="transaction", category="Dining"):
+    return {"id": id, "page_content": text, "merchant_name": merchant, "vector_type": vector_type, "category": category}
+
+
+def test_documents_with_every_query_word_rank_first():
+    docs = [
+        doc("1", "Whole Foods (Groceries)", "Whole Foods"),
+        doc("2", "Foods Co (Groceries)", "Foods Co"),
+        doc("3", "Line item from Trader Joe's: whole milk", "Trader Joe's", vector_type="line_item"),
+    ]
+    hits = KeywordIndex(docs).search("how much did I spend at whole foods", 5)
+    assert [(docs[d]["id"], exact) for d, _, exact in hits] == [("1", True), ("2", False), ("3", False)]
+
+
+def test_merchant_matches_outrank_item_descriptions():
+    docs = [
+        doc("1", "Line item from Target: Starbucks coffee beans", "Target", vector_type="line_item"),
+        doc("2", "Starbucks (Dining)", "Starbucks"),
+    ]
+    assert [docs[d]["id"] for d, _, _ in KeywordIndex(docs).search("starbucks", 5)] == ["2", "1"]
+
+
+def test_where_stopwords_and_unknown_words():
+    docs = [doc("1", "Uber (Transport)", "Uber", category="Transport"), doc("2", "Uber Eats (Dining)", "Uber Eats")]
+    index = KeywordIndex(docs)
+    assert [docs[d]["id"] for d, _, _ in index.search("uber", 5, where=lambda p: p["category"] == "Dining")] == ["2"]
+    assert index.search("what did I spend", 5) == []
+    assert index.search("lyft", 5) == []
+    assert KeywordIndex([]).search("uber", 5) == []
+
+
+def result(id, vector_type="transaction", detail_id=None):
+    return {"page_content": id, "metadata": {"id": id, "vector_type": vector_type, "detail_id": detail_id}}
+
+
+def test_fuse_ranks_documents_found_by_both_searches_first(make_client):
+    client = make_client("qdrant")
+    vector = [result("a"), result("b"), result("c")]
+    keyword = [(result("c"), True), (result("d"), False)]
+    fused = client._fuse(vector, keyword, 4)
+    # b and d tie (second in one ranking each); ties keep the vector ranking's order
+    assert [r["metadata"]["id"] for r in fused] == ["c", "a", "b", "d"]
+    assert client.counters["hybrid_searches"] == 1
+
+
+def test_fuse_keeps_line_items_apart_from_their_transaction(make_client):
+    client = make_client("qdrant")
+    vector = [result("t1"), result("t1", "line_item", "i1")]
+    fused = client._fuse(vector, [(result("t1", "line_item", "i1"), True)], 5)
+    assert [(r["metadata"]["vector_type"], r["metadata"]["id"]) for r in fused] == [
+        ("line_item", "t1"), ("transaction", "t1"),
+    ]
+    # Without keyword hits the vector ranking is returned untouched
+    assert client._fuse(vector, [], 1) == vector[:1]
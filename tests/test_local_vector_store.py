@@ -0,0 +1,37 @@
+"""
+LocalVectorStore instances sharing one directory, as the API process and stdio
+MCP servers do.
+
+Run from the repository root:
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.local_vector_store import LocalVectorStore  # noqa: E402
+
+
+def upsert(store, user_id, ids):
+    store.upsert(ids, [[1.0, float(i)] for i, _ in enumerate(ids)], [{"user_id": user_id, "id": vid} for vid in ids])
+
+
+def test_flush_keeps_another_stores_writes(tmp_path):
+    first, second = LocalVectorStore(str(tmp_path)), LocalVectorStore(str(tmp_path))
+    first.create_collection(2)
+    upsert(first, "u1", ["a", "b"])
+    first.flush()
+    assert set(second.payloads("u1")) == {"a", "b"}
+
+    # Both change the tenant from the same generation; the second flush must not drop the first's writes
+    upsert(first, "u1", ["c"])
+    upsert(second, "u1", ["d"])
+    second.delete("u1", ["a"])
+    first.flush()
+    second.flush()
+
+    assert set(LocalVectorStore(str(tmp_path)).payloads("u1")) == {"b", "c", "d"}
+    assert set(first.payloads("u1")) == {"b", "c", "d"}
+    assert sorted(f for f in os.listdir(next(tmp_path.glob("*/"))) if f.endswith(".npy")) == ["vectors-3.npy"]
@@ -0,0 +1,92 @@
+"""
+MCPSessionPool never shuts down a session a chat turn is still using.
+"""
+import asyncio
+import time
+
+import pytest
+
+from backend.services import mcp_pool
+from backend.services.mcp_pool import MCPSessionPool
+
+
+class FakeSession:
+    """Stands in for MCPSession: no subprocess, pings succeed after a short wait."""
+
+    def __init__(self, user_id, connection):
+        self.user_id = user_id
+        self.tools = [object()]
+        self.last_used = time.monotonic()
+        self.in_use = 0
+        self.startup_ms = 1.0
+        self.closed = False
+
+    async def start(self):
+        pass
+
+    async def ping(self):
+        await asyncio.sleep(0.01)
+        return not self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_sessions(monkeypatch):
+    monkeypatch.setattr(mcp_pool, "MCPSession", FakeSession)
+
+
+def test_idle_eviction_skips_sessions_in_use():
+    async def run():
+        pool = MCPSessionPool(idle_timeout_s=0.01)
+        tools = await pool.acquire("u1", {})
+        session = pool._sessions["u1"]
+        await asyncio.sleep(0.02)
+        await pool.evict_idle()
+        assert not session.closed
+
+        await pool.release("u1", tools)
+        await pool.evict_idle()  # the idle clock restarted at release
+        assert not session.closed
+        await asyncio.sleep(0.02)
+        await pool.evict_idle()
+        assert session.closed and pool.stats()["active_sessions"] == 0
+
+    asyncio.run(run())
+
+
+def test_close_waits_for_turns_in_progress():
+    async def run():
+        pool = MCPSessionPool()
+        tools = await pool.acquire("u1", {})
+        old = pool._sessions["u1"]
+
+        await pool.close("u1")
+        assert not old.closed
+        # The next turn gets a new server straight away
+        new_tools = await pool.acquire("u1", {})
+        assert new_tools is not tools
+
+        await pool.release("u1", tools)
+        assert old.closed and not pool._sessions["u1"].closed
+        assert pool.stats()["retired_sessions"] == 0
+
+        await pool.release("u1", new_tools)
+        await pool.close("u1")
+        assert pool._sessions == {}
+
+    asyncio.run(run())
+
+
+def test_user_locks_are_dropped_once_unused():
+    async def run():
+        pool = MCPSessionPool()
+        first, second = await asyncio.gather(pool.acquire("u1", {}), pool.acquire("u1", {}))
+        # Serialised by the user's lock: one session, acquired twice
+        assert first is second and pool._sessions["u1"].in_use == 2
+        assert pool._locks == {}
+        await pool.close("u1")
+        assert pool._locks == {}
+
+    asyncio.run(run())
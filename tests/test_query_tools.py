@@ -0,0 +1,126 @@
+"""
+query_database's helpers: the SQL result cache, LIMIT injection and row formatting.
+"""
+import datetime as dt
+from contextlib import contextmanager
+
+import pytest
+
+import mcp_server
+from backend.data_version import bump_data_version
+from mcp_server import QueryResultCache, format_rows, with_row_limit
+
+
+class FakePool:
+    """Stands in for sql_pool; every query returns one row per call so far."""
+
+    def __init__(self):
+        self.queries = []
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = FakePool()
+
+    def execute(conn, query):
+        conn.queries.append(query)
+        return [(len(conn.queries),)], ["n"]
+
+    monkeypatch.setattr(mcp_server, "sql_pool", pool)
+    monkeypatch.setattr(mcp_server, "_execute_query", execute)
+    monkeypatch.setattr(mcp_server, "query_cache", QueryResultCache())
+    return pool
+
+
+def test_cached_rows_are_served_until_the_users_data_version_changes(pool):
+    sql = "SELECT COUNT(*) FROM Transaction WHERE user_id = 'u1'"
+    assert mcp_server.run_select("u1", sql) == ([(1,)], ["n"])
+    # Case and spacing differences hit the same entry
+    assert mcp_server.run_select("u1", "select count(*)  from transaction where user_id = 'u1';") == ([(1,)], ["n"])
+    assert mcp_server.run_select("u2", sql.replace("u1", "u2")) == ([(2,)], ["n"])
+
+    bump_data_version("u1")
+    assert mcp_server.run_select("u1", sql) == ([(3,)], ["n"])
+    assert mcp_server.run_select("u2", sql.replace("u1", "u2")) == ([(2,)], ["n"])
+    assert len(pool.queries) == 3
+
+
+def test_quoted_literals_keep_their_case(pool):
+    mcp_server.run_select("u1", "SELECT 1 WHERE merchant_name = 'Uber' AND user_id = 'u1'")
+    mcp_server.run_select("u1", "SELECT 1 WHERE merchant_name = 'UBER' AND user_id = 'u1'")
+    assert len(pool.queries) == 2
+
+
+def test_cache_evicts_least_recently_used_and_expires(monkeypatch):
+    cache = QueryResultCache(max_entries=2, ttl_s=60)
+    cache.put("a", [(1,)], ["n"])
+    cache.put("b", [(2,)], ["n"])
+    cache.get("a")
+    cache.put("c", [(3,)], ["n"])
+    assert cache.get("b") is None and cache.get("a") is not None
+
+    now = mcp_server.time.monotonic()
+    monkeypatch.setattr(mcp_server.time, "monotonic", lambda: now + 61)
+    assert cache.get("a") is None
+    assert cache.counters["expired"] == 1
+
+
+def test_cache_skips_results_too_large_to_keep():
+    cache = QueryResultCache(max_bytes=1000)
+    cache.put("big", [("x" * 100,)] * 10, ["n"])
+    assert cache.get("big") is None
+    assert cache.counters["oversized"] == 1
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("SELECT * FROM t", "SELECT * FROM t LIMIT 101"),
+    ("SELECT * FROM t;  ", "SELECT * FROM t LIMIT 101"),
+    ("SELECT * FROM t LIMIT 5", "SELECT * FROM t LIMIT 5"),
+    ("select * from t limit 5 offset 10;", "select * from t limit 5 offset 10;"),
+    ("SELECT * FROM t FETCH FIRST 3 ROWS ONLY", "SELECT * FROM t FETCH FIRST 3 ROWS ONLY"),
+    # A LIMIT inside a subquery does not bound the outer query
+    ("SELECT * FROM (SELECT * FROM t LIMIT 5) s WHERE x > 1", "SELECT * FROM (SELECT * FROM t LIMIT 5) s WHERE x > 1 LIMIT 101"),
+])
+def test_with_row_limit(query, expected):
+    assert with_row_limit(query, 101) == expected
+
+
+def test_format_rows_short_result_is_plain_csv():
+    assert format_rows([(dt.date(2024, 5, 1), 1.5, None)], ["d", "amount", "note"], 10) == "d,amount,note\n2024-05-01,1.5,"
+
+
+def test_format_rows_truncates_with_a_summary_over_every_row():
+    rows = [(dt.date(2024, 5, i), float(i)) for i in range(1, 11)]
+    out = format_rows(rows, ["d", "amount"], 3)
+    assert out.count("\n") == 5
+    assert "showing 3 of 10 rows" in out
+    assert "amount: total=55, min=1, max=10" in out
+    assert "d: 2024-05-01 to 2024-05-10" in out
+
+
+def test_format_rows_with_an_unknown_total_only_gives_a_lower_bound():
+    out = format_rows([(i,) for i in range(5)], ["n"], 4, total_known=False)
+    assert "more than 4 rows match" in out
+    assert "Summary" not in out
+
+
+@pytest.mark.parametrize("query, truncation", [
+    ("SELECT amount FROM Transaction WHERE user_id = 'u1'", "more than 100 rows match"),
+    # The agent's own LIMIT: every row it asked for came back, so the total is known
+    ("SELECT amount FROM Transaction WHERE user_id = 'u1' LIMIT 500", "showing 100 of 500 rows"),
+])
+def test_query_database_reports_totals_only_when_known(monkeypatch, query, truncation):
+    def run_select(user_id, sql):
+        return [(1.0,)] * (101 if sql.endswith("LIMIT 101") else 500), ["amount"]
+
+    monkeypatch.setattr(mcp_server, "QUERY_INJECT_LIMIT", True)
+    monkeypatch.setattr(mcp_server, "QUERY_MAX_ROWS", 100)
+    monkeypatch.setattr(mcp_server, "run_select", run_select)
+    monkeypatch.setattr(mcp_server, "get_current_user_id", lambda: "u1")
+    out = mcp_server.query_database(query)
+    assert truncation in out
+    assert ("Summary over all 500 rows" in out) == query.endswith("500")
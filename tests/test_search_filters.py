@@ -0,0 +1,86 @@
+"""
+SearchFilters: the same conditions checked on payloads (Actian post-filter),
+as local store column masks, and as a Qdrant filter must select the same vectors.
+"""
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from backend.local_vector_store import _Tenant
+from backend.vector_db_client import SearchFilters, VectorDBClient
+
+PAYLOADS = [
+    {"id": "a", "user_id": "u1", "transaction_date": "2024-04-30", "amount": 5.0, "category": "Dining",
+     "vector_type": "transaction", "source_csv_id": "csv-1"},
+    {"id": "b", "user_id": "u1", "transaction_date": "2024-05-01", "amount": 10.0, "category": "Dining",
+     "vector_type": "transaction", "source_csv_id": "csv-1"},
+    # Stored dates can carry a time of day
+    {"id": "c", "user_id": "u1", "transaction_date": "2024-05-31T18:30:00", "amount": 20.0, "category": "Groceries",
+     "vector_type": "transaction", "bill_file_id": "bill-1"},
+    {"id": "d", "user_id": "u1", "transaction_date": "2024-06-01", "amount": 25.0, "category": "Groceries",
+     "vector_type": "line_item", "bill_file_id": "bill-1"},
+    {"id": "e", "user_id": "u1", "transaction_date": "2024-05-15", "category": "Dining",
+     "vector_type": "line_item", "source_csv_id": "csv-2"},
+]
+
+CASES = [
+    (SearchFilters(date_from="2024-05-01", date_to="2024-05-31"), {"b", "c", "e"}),
+    (SearchFilters(date_to="2024-05-31T00:00:00"), {"a", "b", "c", "e"}),
+    (SearchFilters(min_amount=10, max_amount=20), {"b", "c"}),
+    (SearchFilters(category="Dining"), {"a", "b", "e"}),
+    # Equalities are exact: categories are stored as the ingestion step wrote them
+    (SearchFilters(category="dining"), set()),
+    (SearchFilters(vector_type="line_item", source_file_id="bill-1"), {"d"}),
+    (SearchFilters(source_file_id="csv-1", min_amount=6), {"b"}),
+    (SearchFilters(date_from="2024-05-31", min_amount=0), {"c", "d"}),
+]
+
+
+def ids(payloads):
+    return {p["id"] for p in payloads}
+
+
+@pytest.fixture(scope="module")
+def qdrant():
+    client = QdrantClient(":memory:")
+    client.create_collection("t", vectors_config=models.VectorParams(size=2, distance=models.Distance.COSINE))
+    other_user = {**PAYLOADS[1], "id": "other", "user_id": "u2"}
+    client.upsert("t", [
+        models.PointStruct(id=i, vector=[1.0, 0.0], payload={"metadata": p})
+        for i, p in enumerate(PAYLOADS + [other_user])
+    ])
+    return client
+
+
+@pytest.mark.parametrize("filters, expected", CASES)
+def test_payload_match(filters, expected):
+    assert ids(p for p in PAYLOADS if filters.matches(p)) == expected
+
+
+@pytest.mark.parametrize("filters, expected", CASES)
+def test_local_store_mask(filters, expected):
+    tenant = _Tenant(2)
+    tenant.payloads = PAYLOADS
+    mask = filters.mask(tenant.column)
+    assert ids(p for p, keep in zip(PAYLOADS, mask) if keep) == expected
+
+
+@pytest.mark.parametrize("filters, expected", CASES)
+def test_qdrant_filter(qdrant, filters, expected):
+    points, _ = qdrant.scroll("t", scroll_filter=VectorDBClient._qdrant_filter("u1", filters), limit=100)
+    assert {p.payload["metadata"]["id"] for p in points} == expected
+
+
+def test_equalities_are_what_gets_pushed_down():
+    filters = SearchFilters(category="Dining", vector_type="transaction")
+    assert filters.equalities() == {"category": "Dining", "vector_type": "transaction"}
+    assert filters.only_equalities()
+    assert not SearchFilters(category="Dining", max_amount=5).only_equalities()
+    assert SearchFilters(category="", date_from=None).is_empty()
+
+
+def test_invalid_vector_type_and_date_are_rejected():
+    with pytest.raises(ValueError):
+        SearchFilters(vector_type="receipt")
+    with pytest.raises(ValueError):
+        SearchFilters(date_from="May 2024")
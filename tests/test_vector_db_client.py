@@ -0,0 +1,58 @@
+"""
+VectorDBClient against a minimal in-memory stand-in for the Actian Cortex SDK.
+
+Run from the repository root:
+
+    python -m pytest -q tests
+"""
+import pytest
+
+from backend import vector_db_client
+from conftest import FakeCortex
+
+
+@pytest.fixture(autouse=True)
+def actian_page_size(monkeypatch):
+    monkeypatch.setattr(vector_db_client, "ACTIAN_QUERY_PAGE", 1000)
+
+
+def records(user_id, n, start=0, vector_type="transaction"):
+    return {
+        start + i: {"user_id": user_id, "sync_hash": f"h{start + i}", "vector_type": vector_type} for i in range(n)
+    }
+
+
+def test_user_payloads_reads_every_page(make_client):
+    cortex = FakeCortex({**records("u1", 2500), **records("u2", 700, start=10_000)})
+    payloads = make_client("actian", cortex)._user_payloads("u1")
+    assert len(payloads) == 2500
+    assert set(payloads) == set(range(2500))
+    assert cortex.queries == 3
+
+
+def test_existing_hashes_cover_vectors_past_the_first_page(make_client):
+    cortex = FakeCortex({**records("u1", 1500), **records("u1", 500, start=1500, vector_type="line_item")})
+    hashes, line_items = make_client("actian", cortex)._existing_hashes("u1")
+    assert len(hashes) == 2000
+    assert hashes[1999] == "h1999"
+    assert line_items == set(range(1500, 2000))
+    # An exact multiple of the page size needs one empty page to know it is done
+    assert cortex.queries == 3
+
+
+def test_sdk_ignoring_offset_is_an_error_not_a_truncated_read(make_client):
+    cortex = FakeCortex(records("u1", 2500), honour_offset=False)
+    with pytest.raises(RuntimeError):
+        make_client("actian", cortex)._user_payloads("u1")
+
+
+def test_actian_collection_dimension_is_checked_before_upserting(make_client):
+    cortex = FakeCortex({})
+    make_client("actian", cortex)._prepare_collection(768)
+    assert cortex.dimension == 768
+
+    # A later process switching to a model with another output size
+    client = make_client("actian", cortex)
+    with pytest.raises(ValueError, match="768-dimensional"):
+        client._prepare_collection(3072)
+    client._prepare_collection(768)
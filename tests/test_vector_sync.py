@@ -0,0 +1,62 @@
+"""
+Vector sync embeds each changed document once and nothing on an unchanged re-sync.
+
+The counting model sits directly under a store-less cache (see conftest), so a
+second embedding pass over the same texts would be counted, not served.
+"""
+import pandas as pd
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    texts_embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.texts_embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+def frames(rows: int, details: int):
+    ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(rows)]
+    df = pd.DataFrame({
+        "id": ids,
+        "user_id": "u1",
+        "trans_date": "2024-05-01",
+        "description": [f"POS PURCHASE {i}" for i in range(rows)],
+        "merchant_name": [f"Merchant {i}" for i in range(rows)],
+        "amount": [float(i) for i in range(rows)],
+        "category": "Groceries",
+    })
+    details_df = pd.DataFrame({
+        "id": [f"11111111-0000-0000-0000-{i:012d}" for i in range(details)],
+        "transaction_id": ids[:details],
+        "item_description": [f"Item {i}" for i in range(details)],
+        "item_total_price": 1.0,
+    })
+    return df, details_df
+
+
+def test_sync_embeds_each_document_exactly_once(make_client):
+    client = make_client("qdrant")
+    model = CountingEmbeddings(size=16)
+    df, details_df = frames(300, 120)
+
+    stats = client.sync_transactions(df, details_df, "u1", model)
+    assert stats.embedded == 420
+    assert model.texts_embedded == 420
+
+    repeat = client.sync_transactions(df, details_df, "u1", model)
+    assert (repeat.embedded, repeat.skipped, repeat.deleted) == (0, 420, 0)
+    assert model.texts_embedded == 420
+
+
+def test_sync_embeds_only_changed_rows_and_deletes_removed_ones(make_client):
+    client = make_client("qdrant")
+    model = CountingEmbeddings(size=16)
+    df, details_df = frames(50, 0)
+    client.sync_transactions(df, details_df, "u1", model)
+
+    df.loc[0, "category"] = "Dining"
+    stats = client.sync_transactions(df.iloc[:40], details_df, "u1", model)
+    assert (stats.embedded, stats.skipped, stats.deleted) == (1, 39, 10)
+    assert model.texts_embedded == 51